@@ -3,7 +3,7 @@ Flask Backend Server for Browser Extension
 Handles frame analysis requests from the browser extension
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import cv2
 import numpy as np
@@ -13,14 +13,24 @@ import base64
 import torch
 import torch.nn.functional as F
 import os
+import time
+import threading
+
+# The .env.example placeholder would guard the admin routes with a public token
+if os.environ.get('ADMIN_TOKEN') == 'change-me':
+    raise SystemExit("❌ ADMIN_TOKEN is still the 'change-me' placeholder: set a secret, "
+                     "or leave it empty to accept admin requests from localhost only")
 
 print("=" * 60)
 print("🚀 Starting Backend Server...")
 print("=" * 60)
 print("Loading models (this may take 10-30 seconds)...")
 
-from deepfake_detection import DeepfakeDetector, mtcnn, model, DEVICE
+from deepfake_detection import DeepfakeDetector, mtcnn, DEVICE, FAKE_THRESHOLD, SERVING_MODEL
 from face_detection import detect_bounding_box
+from forensic_analysis import ForensicWorkerPool
+from model_reload import ModelReloader
+from mlops.monitoring.monitor import ProductionMonitor
 
 print("✓ Models loaded successfully!")
 print("=" * 60)
@@ -39,16 +49,125 @@ CORS(app, resources={
 print("Initializing detector...")
 detector = DeepfakeDetector(enable_gradcam=False)
 print("✓ Detector initialized!")
+
+# Layer 3 forensic workers run full TTA / frequency / GradCAM in the background
+forensic_pool = ForensicWorkerPool(
+    detector,
+    num_workers=int(os.environ.get('FORENSIC_WORKERS', 1)),
+    queue_size=int(os.environ.get('FORENSIC_QUEUE_SIZE', 4))
+)
+forensic_pool.start()
+detector.forensic_pool = forensic_pool
+print("✓ Forensic workers started!")
+
+registry_dir = os.environ.get('MODEL_REGISTRY_DIR', 'mlops/registry')
+
+# Prediction log: queued in memory, written in batches by a background thread
+# into hourly segments (finished hours compacted to columnar .npz)
+monitor = None
+if os.environ.get('PREDICTION_LOGGING', '1') != '0':
+    monitor = ProductionMonitor(
+        os.environ.get('PREDICTION_LOG_DIR', 'mlops/monitoring/logs'),
+        async_logging=True,
+        columnar=os.environ.get('PREDICTION_LOG_COLUMNAR', '1') != '0'
+    )
+    # Drift is measured against the histograms stored with the production model
+    if monitor.load_reference_from_registry(registry_dir):
+        print("✓ Drift reference loaded!")
+    print("✓ Prediction logging enabled!")
+
+# Hot reload: new weights are loaded and warmed up in the background, then
+# swapped in between batches (POST /admin/reload, or MODEL_RELOAD_INTERVAL
+# seconds > 0 to follow the registry's production version)
+def on_model_swap(version):
+    # Drift is measured against the histograms of the model now serving
+    if monitor is not None and reloader.registry_dir is not None:
+        monitor.load_reference_from_registry(registry_dir, version)
+
+reloader = ModelReloader(
+    detector,
+    SERVING_MODEL,
+    registry_dir=registry_dir if os.path.exists(os.path.join(registry_dir, 'registry.json')) else None,
+    poll_interval=float(os.environ.get('MODEL_RELOAD_INTERVAL', 0)),
+    on_swap=on_model_swap
+)
+if reloader.registry_dir and reloader.poll_interval > 0:
+    reloader.start_watching()
+    print(f"✓ Watching {registry_dir} for production model changes!")
 print("=" * 60)
 
+# Startup warmup: the first passes through the cascade, MTCNN and the model
+# pay for oneDNN primitive creation and allocator growth. /ready stays 503
+# until they have run, so a load balancer only routes traffic once warm.
+# A failed warmup means the inference path is broken: /ready stays 503 and
+# /health reports unhealthy (503) so the instance gets restarted.
+warmup_status = {'ready': False, 'warmup': None, 'error': None}
+
+def run_startup_warmup():
+    try:
+        warmup_status['warmup'] = detector.warmup()
+        print(f"✓ Warmup done in {warmup_status['warmup']['total_ms']:.0f} ms")
+    except Exception as e:
+        warmup_status['error'] = f"{type(e).__name__}: {e}"
+        print(f"⚠️  Warmup failed: {e}")
+        return
+    warmup_status['ready'] = True
+
+if os.environ.get('STARTUP_WARMUP', '1') != '0':
+    threading.Thread(target=run_startup_warmup, name="startup-warmup", daemon=True).start()
+else:
+    warmup_status['ready'] = True
+
+def is_admin_request():
+    """ADMIN_TOKEN header if configured, otherwise local requests only"""
+    token = os.environ.get('ADMIN_TOKEN')
+    if token:
+        return request.headers.get('X-Admin-Token') == token
+    return request.remote_addr in ('127.0.0.1', '::1')
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint: 503 once the startup warmup has failed"""
+    healthy = warmup_status['error'] is None
     return jsonify({
-        'status': 'healthy',
-        'model_loaded': model is not None,
+        'status': 'healthy' if healthy else 'unhealthy',
+        'model_loaded': detector.model is not None,
+        'model_version': detector.model_version,
+        'model_reload': reloader.get_status(),
+        'warmup_error': warmup_status['error'],
         'device': DEVICE
-    }), 200
+    }), 200 if healthy else 503
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once startup warmup has succeeded, 503 before or after a failure"""
+    return jsonify({
+        'ready': warmup_status['ready'],
+        'warmup': warmup_status['warmup'],
+        'error': warmup_status['error']
+    }), 200 if warmup_status['ready'] else 503
+
+@app.route('/admin/reload', methods=['POST'])
+def reload_model():
+    """
+    Load a model in the background and swap it in once warmed up
+    Optional JSON body: {"version": "v1.2.0"} (default: registry production
+    version, or the deployed weights file when there is no registry)
+    Returns: 202 when the reload started; progress is reported by /health
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    version = (request.get_json(silent=True) or {}).get('version')
+    if version is not None and reloader.registry_dir is None:
+        return jsonify({'error': 'No model registry configured'}), 400
+    if not reloader.reload_async(version):
+        return jsonify({'error': 'A model reload is already in progress'}), 409
+    return jsonify({
+        'success': True,
+        'message': 'Model reload started',
+        'serving_version': detector.model_version
+    }), 202
 
 @app.route('/reset', methods=['POST'])
 def reset_detector():
@@ -72,6 +191,7 @@ def analyze_frame():
     Expects: multipart/form-data with 'frame' field containing image
     Returns: JSON with detection results
     """
+    start_time = time.perf_counter()
     try:
         # Check if frame is in request
         if 'frame' not in request.files:
@@ -87,50 +207,50 @@ def analyze_frame():
         if frame is None:
             return jsonify({'error': 'Invalid image format'}), 400
         
-        # Detect faces
-        faces = detect_bounding_box(frame)
+        # Detect and score the first face (shared batched API, same as desktop)
+        result = detector.score_frames([frame], max_faces_per_frame=1)[0]
         
-        if len(faces) == 0:
+        if result['faces_detected'] == 0:
             return jsonify({
                 'faces_detected': 0,
                 'message': 'No faces detected in frame'
             }), 200
         
-        # Analyze first face (can be extended to analyze all faces)
-        x, y, w, h = faces[0]
-        face_region = frame[y:y + h, x:x + w]
-        
-        # Get prediction
-        fake_prob, real_score, gradcam = detector.analyze_face(face_region)
-        
-        # Debug logging
-        print(f"[DEBUG] Raw fake_prob: {fake_prob}, real_score: {real_score}")
-        
-        if fake_prob is None:
+        if not result['faces']:
             return jsonify({
-                'faces_detected': len(faces),
+                'faces_detected': result['faces_detected'],
                 'error': 'Face analysis failed'
             }), 200
         
+        face = result['faces'][0]
+        x, y, w, h = face['bbox']
+        fake_prob = face['fake_probability']
+        
         # Update temporal tracker
         detector.temporal_tracker.update(fake_prob)
         confidence_level = detector.temporal_tracker.get_confidence_level()
         temporal_avg = detector.temporal_tracker.get_temporal_average()
         stability = detector.temporal_tracker.get_stability_score()
         
+        # Queue Layer 3 analysis in the background (never blocks this request)
+        forensic_job_id = None
+        if detector.temporal_tracker.should_trigger_forensic_analysis():
+            forensic_job_id = forensic_pool.submit(frame, (x, y, w, h))
+        
         # Increment frame count
         detector.frame_count += 1
         
         # Prepare response
         response = {
             'success': True,
-            'faces_detected': len(faces),
+            'faces_detected': result['faces_detected'],
             'fake_probability': float(fake_prob),
             'real_probability': float(1 - fake_prob),
             'confidence_level': confidence_level,
             'temporal_average': float(temporal_avg),
             'stability_score': float(stability),
             'frame_count': detector.frame_count,
+            'forensic_job_id': forensic_job_id,
             'face_bbox': {
                 'x': int(x),
                 'y': int(y),
@@ -139,14 +259,86 @@ def analyze_frame():
             }
         }
         
+        if monitor is not None:
+            monitor.log_prediction({
+                # Same per-frame threshold as every verdict the service reports
+                'prediction': 'fake' if fake_prob > FAKE_THRESHOLD else 'real',
+                'confidence': float(max(fake_prob, 1 - fake_prob)),
+                'fake_probability': float(fake_prob),
+                'raw_probability': float(face['raw_probability']),
+                'face_size': float(np.sqrt(w * h)),
+                'frame_width': int(frame.shape[1]),
+                'frame_height': int(frame.shape[0]),
+                'latency_ms': (time.perf_counter() - start_time) * 1000,
+                'model_version': detector.model_version
+            })
+        
         return jsonify(response), 200
         
     except Exception as e:
         print(f"Error analyzing frame: {e}")
         import traceback
         traceback.print_exc()
+        if monitor is not None:
+            monitor.log_prediction({
+                'error': str(e),
+                'latency_ms': (time.perf_counter() - start_time) * 1000,
+                'model_version': detector.model_version
+            })
         return jsonify({'error': str(e)}), 500
 
+@app.route('/explain', methods=['POST'])
+def explain_frame():
+    """
+    GradCAM explanation for the first face in a frame
+    Expects: multipart/form-data with 'frame' field containing image
+    Returns: PNG heatmap overlay (224x224) of the aligned face
+    """
+    try:
+        if 'frame' not in request.files:
+            return jsonify({'error': 'No frame provided'}), 400
+        
+        nparr = np.frombuffer(request.files['frame'].read(), np.uint8)
+        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        
+        if frame is None:
+            return jsonify({'error': 'Invalid image format'}), 400
+        
+        faces = detect_bounding_box(frame)
+        if len(faces) == 0:
+            return jsonify({
+                'faces_detected': 0,
+                'message': 'No faces detected in frame'
+            }), 200
+        
+        x, y, w, h = faces[0]
+        face_region = detector.preprocess_face_quality(frame[y:y + h, x:x + w])
+        png, cache_hit = detector.explain_face(face_region)
+        
+        if png is None:
+            return jsonify({
+                'faces_detected': len(faces),
+                'error': 'Face alignment failed'
+            }), 200
+        
+        response = Response(png, mimetype='image/png')
+        response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+        response.headers['X-Face-BBox'] = f"{int(x)},{int(y)},{int(w)},{int(h)}"
+        return response
+        
+    except Exception as e:
+        print(f"Error explaining frame: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/forensics/<job_id>', methods=['GET'])
+def get_forensics(job_id):
+    """Get status and result of a background forensic analysis job"""
+    job = forensic_pool.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown forensic job'}), 404
+    job['job_id'] = job_id
+    return jsonify(job), 200
+
 @app.route('/stats', methods=['GET'])
 def get_stats():
     """Get current detection statistics"""
@@ -156,7 +348,12 @@ def get_stats():
             'temporal_average': float(detector.temporal_tracker.get_temporal_average()),
             'stability_score': float(detector.temporal_tracker.get_stability_score()),
             'confidence_level': detector.temporal_tracker.get_confidence_level(),
-            'history_length': len(detector.temporal_tracker.score_history)
+            'history_length': len(detector.temporal_tracker.score_history),
+            'forensics': forensic_pool.get_stats(),
+            'prediction_log': monitor.get_logging_stats() if monitor is not None else None,
+            'prediction_windows': monitor.get_window_stats() if monitor is not None else None,
+            'alerts': monitor.alerts if monitor is not None else None,
+            'drift': monitor.get_drift() if monitor is not None else None
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -169,7 +366,7 @@ if __name__ == '__main__':
     print("🎭 Deepfake Detection Backend Server")
     print("=" * 60)
     print(f"✓ Device: {DEVICE}")
-    print(f"✓ Model loaded: {model is not None}")
+    print(f"✓ Model loaded: {detector.model is not None}")
     print(f"✓ Detector ready: {detector is not None}")
     print(f"\n🌐 Server running on http://0.0.0.0:{port}")
     print("=" * 60)
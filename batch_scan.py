@@ -0,0 +1,215 @@
+"""
+Offline Batch Scanner
+Scans a folder of videos and images and writes one verdict per file
+
+Decoding is spread over a process pool; all decoded frames feed a single
+batched inference loop in the main process. The report doubles as the
+checkpoint: files already in it are skipped, so an interrupted scan
+resumes where it stopped.
+
+Usage:
+    python batch_scan.py /path/to/clips --output scan_report.jsonl
+"""
+
+import os
+import csv
+import json
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from pathlib import Path
+
+import cv2
+
+from video_io import is_image, is_video, limit_size, sample_video_frames
+
+REPORT_FIELDS = ['file', 'type', 'verdict', 'avg_fake_probability', 'fake_percentage',
+                 'frames_sampled', 'frames_with_faces', 'error']
+
+
+def find_media_files(input_dir):
+    """All videos and images under input_dir, sorted"""
+    return sorted(p for p in Path(input_dir).rglob('*') if p.is_file() and (is_video(p) or is_image(p)))
+
+
+def _init_decode_worker():
+    # One process per core already; keep OpenCV from spawning its own threads
+    cv2.setNumThreads(1)
+
+
+def decode_media(path, frames_per_video, max_side):
+    """
+    Decode the frames to score for one file (runs in a worker process)
+
+    Returns:
+        tuple: (path, list of BGR frames, error message or None)
+    """
+    try:
+        if is_video(path):
+            frames = [frame for _, frame in sample_video_frames(path, frames_per_video, max_side)]
+        else:
+            frame = cv2.imread(str(path))
+            frames = [] if frame is None else [limit_size(frame, max_side)]
+        if not frames:
+            return path, [], 'Could not decode file'
+        return path, frames, None
+    except Exception as e:
+        return path, [], str(e)
+
+
+class ScanReport:
+    """Append-only JSONL/CSV report that is also the resume checkpoint"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.is_csv = self.path.suffix.lower() == '.csv'
+        self.completed = self._load_completed()
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, 'a', newline='')
+        if self.is_csv:
+            self._writer = csv.DictWriter(self._file, fieldnames=REPORT_FIELDS)
+            if new_file:
+                self._writer.writeheader()
+
+    def _load_completed(self):
+        if not self.path.exists():
+            return set()
+        completed = set()
+        with open(self.path, 'r', newline='') as f:
+            if self.is_csv:
+                for row in csv.DictReader(f):
+                    completed.add(row['file'])
+            else:
+                for line in f:
+                    try:
+                        completed.add(json.loads(line)['file'])
+                    except (ValueError, KeyError):
+                        continue  # Partially written last line from an interrupted run
+        return completed
+
+    def write(self, record):
+        if self.is_csv:
+            self._writer.writerow(record)
+        else:
+            self._file.write(json.dumps(record) + '\n')
+        # Flush per file so a crash never loses finished work
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.completed.add(record['file'])
+
+    def close(self):
+        self._file.close()
+
+
+def scan_directory(input_dir, output_path, frames_per_video=16, num_workers=None,
+                   batch_size=32, max_side=1280):
+    """
+    Scan all media files under input_dir
+
+    Args:
+        input_dir: Folder to scan recursively
+        output_path: Report path (.jsonl or .csv); existing entries are skipped
+        frames_per_video: Frames sampled per video
+        num_workers: Decode processes (default: CPU count)
+        batch_size: Frames per model pass
+        max_side: Downscale decoded frames to this longest side
+
+    Returns:
+        Dict with scan statistics
+    """
+    # Heavy import kept here so spawned decode workers never load the model
+    from deepfake_detection import detector, summarize_frame_scores
+
+    input_dir = Path(input_dir)
+    report = ScanReport(output_path)
+    files = [p for p in find_media_files(input_dir) if str(p.relative_to(input_dir)) not in report.completed]
+    num_workers = num_workers or os.cpu_count() or 1
+    print(f"Found {len(files) + len(report.completed)} files, {len(report.completed)} already scanned, "
+          f"{len(files)} to go ({num_workers} decode workers)")
+
+    pending_frames = []          # (file key, frame) waiting for the next batch
+    file_state = {}              # file key -> {'remaining', 'scores', ...}
+    stats = {'files': 0, 'frames': 0, 'errors': 0}
+    start = time.time()
+
+    def finish(key):
+        state = file_state.pop(key)
+        verdict, avg_prob, fake_pct = summarize_frame_scores(state['scores'])
+        if state['error']:
+            verdict = 'ERROR'
+        elif verdict is None:
+            verdict = 'NO_FACE'
+        record = {
+            'file': key,
+            'type': 'video' if is_video(key) else 'image',
+            'verdict': verdict,
+            'avg_fake_probability': round(float(avg_prob), 4),
+            'fake_percentage': round(float(fake_pct), 2),
+            'frames_sampled': state['frames'],
+            'frames_with_faces': len(state['scores']),
+            'error': state['error']
+        }
+        report.write(record)
+        stats['files'] += 1
+        stats['errors'] += bool(state['error'])
+        print(f"[{stats['files']}/{len(files)}] {key}: {record['verdict']}")
+
+    def run_batch():
+        batch = pending_frames[:batch_size]
+        del pending_frames[:batch_size]
+        results = detector.score_frames([frame for _, frame in batch], max_faces_per_frame=1)
+        for (key, _), result in zip(batch, results):
+            state = file_state[key]
+            if result['faces']:
+                state['scores'].append(result['faces'][0]['fake_probability'])
+            state['remaining'] -= 1
+            if state['remaining'] == 0:
+                finish(key)
+        stats['frames'] += len(batch)
+
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(num_workers, initializer=_init_decode_worker) as pool:
+        queued = deque(files)
+        in_flight = deque()
+        # Bound the decode look-ahead so memory stays flat on huge folders
+        max_in_flight = num_workers * 2
+
+        while queued or in_flight or pending_frames:
+            while queued and len(in_flight) < max_in_flight:
+                in_flight.append(pool.apply_async(decode_media, (queued.popleft(), frames_per_video, max_side)))
+
+            if in_flight and (len(pending_frames) < batch_size or in_flight[0].ready()):
+                path, frames, error = in_flight.popleft().get()
+                key = str(Path(path).relative_to(input_dir))
+                file_state[key] = {'remaining': len(frames), 'scores': [], 'frames': len(frames), 'error': error}
+                if not frames:
+                    finish(key)
+                pending_frames.extend((key, frame) for frame in frames)
+
+            if len(pending_frames) >= batch_size or (not in_flight and pending_frames):
+                run_batch()
+
+    report.close()
+    elapsed = time.time() - start
+    stats['elapsed_s'] = elapsed
+    stats['frames_per_s'] = stats['frames'] / elapsed if elapsed > 0 else 0.0
+    print(f"\n✅ Scanned {stats['files']} files ({stats['frames']} frames, {stats['frames_per_s']:.1f} frames/s, "
+          f"{stats['errors']} errors) in {elapsed:.1f}s")
+    print(f"   Report: {output_path}")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scan a folder of videos/images for deepfakes')
+    parser.add_argument('input_dir', type=str, help='Folder to scan (recursive)')
+    parser.add_argument('--output', type=str, default='scan_report.jsonl', help='Report path (.jsonl or .csv)')
+    parser.add_argument('--frames_per_video', type=int, default=16, help='Frames sampled per video')
+    parser.add_argument('--workers', type=int, default=None, help='Decode processes (default: CPU count)')
+    parser.add_argument('--batch_size', type=int, default=32, help='Frames per model pass')
+    parser.add_argument('--max_side', type=int, default=1280, help='Downscale frames to this longest side')
+
+    args = parser.parse_args()
+
+    scan_directory(args.input_dir, args.output, args.frames_per_video, args.workers,
+                   args.batch_size, args.max_side)
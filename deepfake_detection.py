@@ -1,12 +1,8 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from facenet_pytorch import MTCNN
+import torchvision
 from efficientnet_pytorch import EfficientNet
-from pytorch_grad_cam import GradCAM
-from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
-from pytorch_grad_cam.utils.image import show_cam_on_image
-from PIL import Image
 import numpy as np 
 import cv2
 from collections import deque
@@ -16,100 +12,91 @@ import pickle
 import os
 
 from face_detection import detect_bounding_box
+from face_alignment import align_face, create_mtcnn, enhance_face_contrast
+from model_weights import normalize_state_dict
+from inference_graph import optimize_for_inference
+from gradcam_explainer import GradCAMExplainer
+from deepfake_models import (ARTIFACTS_DIR, DEVICE, SERVING_MODELS, WARMUP_BATCH_SIZES, DeepfakeEfficientNet,
+                             DeepfakeStudent, PrecisionMixin, build_model, cpu_bf16_supported, load_engine,
+                             serving_weights_path, warmup_model)
 
-DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
+# Per-frame decision threshold shared by the server and desktop verdicts
+FAKE_THRESHOLD = 0.35
+
+# ImageNet normalization, built once instead of per face
+NORM_MEAN = torch.tensor([0.485, 0.456, 0.406], device=DEVICE).view(1, 3, 1, 1)
+NORM_STD = torch.tensor([0.229, 0.224, 0.225], device=DEVICE).view(1, 3, 1, 1)
 
 # Initialize models
-mtcnn = MTCNN(
-    select_largest=False,
-    post_process=False,
-    device=DEVICE
-).to(DEVICE).eval()
+mtcnn = create_mtcnn(DEVICE)
 
-# Create EfficientNet-B0 model with custom classifier for binary deepfake detection
-class DeepfakeEfficientNet(nn.Module):
-    """EfficientNet-B0 backbone with binary classification head"""
-    def __init__(self, pretrained=True, dropout=0.5):
-        super(DeepfakeEfficientNet, self).__init__()
-        # Load pretrained EfficientNet-B0
-        if pretrained:
-            self.efficientnet = EfficientNet.from_pretrained('efficientnet-b0')
-        else:
-            self.efficientnet = EfficientNet.from_name('efficientnet-b0')
-        
-        # Get the number of features from the last layer
-        num_features = self.efficientnet._fc.in_features
-        
-        # Replace the classifier with GENERALIZED architecture
-        # This matches the train_generalized_colab.py model
-        # More layers with BatchNorm for better generalization
-        self.efficientnet._fc = nn.Sequential(
-            nn.Dropout(dropout),
-            nn.Linear(num_features, 512),
-            nn.BatchNorm1d(512),
-            nn.ReLU(),
-            nn.Dropout(dropout * 0.7),
-            nn.Linear(512, 256),
-            nn.BatchNorm1d(256),
-            nn.ReLU(),
-            nn.Dropout(dropout * 0.5),
-            nn.Linear(256, 1)
-        )
+
+def load_model(kind='efficientnet', engine='eager'):
+    """
+    Build a serving model and load its trained weights from weights/ if present
     
-    def forward(self, x):
-        return self.efficientnet(x)
+    weights/<name>.safetensors (written by mlops/deployment/deploy.py) is
+    memory-mapped into a model built on the meta device, or replaced by a
+    prebuilt engine from weights/artifacts (see load_engine). A legacy
+    weights/<name>.pth checkpoint is still accepted, loaded tensors-only.
+    ImageNet weights are only used when neither file exists.
     
-    def get_feature_extractor(self):
-        """Get the last convolutional layer for GradCAM"""
-        return self.efficientnet._conv_head
-
-# Initialize model
-print("Initializing EfficientNet-B0 for deepfake detection...")
-model = DeepfakeEfficientNet(pretrained=True)
-
-# Load trained deepfake detection weights if available
-import os
-
-weights_paths = [
-    os.path.join(os.path.dirname(__file__), "weights", "best_model.pth")
-]
-
-model_loaded = False
-for weights_path in weights_paths:
-    if os.path.exists(weights_path):
-        print(f"Loading trained model from {weights_path}")
+    Args:
+        kind: Key of SERVING_MODELS ('efficientnet' or 'student')
+        engine: Engine to serve when its artifact is available (see load_engine)
+    
+    Returns:
+        Model in eval mode on DEVICE
+    
+    Raises:
+        RuntimeError: A legacy checkpoint exists but is corrupt or does not
+            match the architecture
+    """
+    safetensors_path = serving_weights_path(kind)
+    legacy_path = os.path.splitext(safetensors_path)[0] + ".pth"
+    pretrained = SERVING_MODELS[kind][2]
+    
+    if os.path.exists(safetensors_path):
+        print(f"Loading trained model from {safetensors_path}")
+        net = load_engine(kind, safetensors_path, engine)
+        print("✓ Trained model loaded successfully (memory-mapped)")
+        return net
+    
+    if os.path.exists(legacy_path):
+        print(f"Loading trained model from {legacy_path}")
+        net = build_model(kind)
         try:
-            checkpoint = torch.load(weights_path, map_location=DEVICE)
-            # Handle potential state dict key mismatches
-            if "model_state_dict" in checkpoint:
-                state_dict = checkpoint["model_state_dict"]
-            else:
-                state_dict = checkpoint
-            
-            # Fix key mismatch (net. -> efficientnet.)
-            new_state_dict = {}
-            for key, value in state_dict.items():
-                if key.startswith('net.'):
-                    new_key = key.replace('net.', 'efficientnet.')
-                    new_state_dict[new_key] = value
-                else:
-                    new_state_dict[key] = value
-            
-            model.load_state_dict(new_state_dict, strict=False)
-            print("✓ Trained model loaded successfully")
-            model_loaded = True
-            break
+            checkpoint = torch.load(legacy_path, map_location=DEVICE, weights_only=True)
+            net.load_state_dict(normalize_state_dict(checkpoint), strict=True)
         except Exception as e:
-            print(f"⚠️  Warning: Could not load {weights_path}: {e}")
-            continue
+            # Serving untrained ImageNet weights instead would look healthy but be wrong
+            raise RuntimeError(f"Could not load {legacy_path} as a {kind} model: {e}") from e
+        print("✓ Trained model loaded successfully")
+        print(f"   Convert it for faster, shared loading: python model_weights.py {legacy_path} "
+              f"--architecture {kind}")
+    else:
+        net = build_model(kind, pretrained=pretrained)
+        print(f"⚠️  Warning: No trained model found")
+        print("Using pretrained ImageNet weights")
+        print("NOTE: Model needs to be retrained for optimal deepfake detection")
+    
+    optimize_for_inference(net.to(DEVICE))
+    
+    return net
+
 
-if not model_loaded:
-    print(f"⚠️  Warning: No trained model found")
-    print("Using pretrained ImageNet weights from EfficientNet-B0")
-    print("NOTE: Model needs to be retrained for optimal deepfake detection")
+# Initialize model
+SERVING_MODEL = os.environ.get('DEEPFAKE_SERVING_MODEL', 'efficientnet').lower()
+print(f"Initializing {SERVING_MODEL} model for deepfake detection...")
+# INFERENCE_PRECISION=bf16 enables bf16 autocast + channels_last on supported CPUs
+requested_precision = os.environ.get('INFERENCE_PRECISION', 'fp32').lower()
+# SERVING_ENGINE: auto (prebuilt TorchScript when deployed), eager, torchscript, int8
+# or onnx; prebuilt engines are fp32, so bf16 always serves the eager model
+SERVING_ENGINE = os.environ.get('SERVING_ENGINE', 'auto').lower() if requested_precision == 'fp32' else 'eager'
+model = load_model(SERVING_MODEL, SERVING_ENGINE)
 
-model.to(DEVICE)
-model.eval()
+SERVING_PRECISION = model.configure_precision(requested_precision)
+print(f"✓ Inference precision: {SERVING_PRECISION}")
 
 
 class TemporalTracker:
@@ -149,8 +136,8 @@ class TemporalTracker:
             variance = np.var(recent)
             self.variance_history.append(variance)
         
-        # Classify this frame: fake if probability > 0.4, else real
-        frame_class = 'FAKE' if fake_probability > 0.35 else 'REAL'
+        # Classify this frame: fake if probability > FAKE_THRESHOLD, else real
+        frame_class = 'FAKE' if fake_probability > FAKE_THRESHOLD else 'REAL'
         
         # Add to voting window
         self.frame_classifications.append(frame_class)
@@ -278,6 +265,9 @@ class DeepfakeDetector:
     
     def __init__(self, enable_gradcam=False, use_tta=True, num_tta_augmentations=3):
         self.enable_gradcam = enable_gradcam
+        # Serving model; replaced in one assignment by swap_model (hot reload)
+        self.model = model
+        self.model_version = SERVING_MODEL
         self.use_tta = use_tta  # Test-Time Augmentation
         self.num_tta_augmentations = num_tta_augmentations
         self.temporal_tracker = TemporalTracker(
@@ -287,6 +277,11 @@ class DeepfakeDetector:
         )
         self.frame_count = 0
         
+        # Layer 3: optional background forensic pool (see forensic_analysis.py)
+        self.forensic_pool = None
+        self.last_forensic_job_id = None
+        self._explainer = None
+        
         # Load calibrator if available
         self.calibrator = None
         calibrator_path = os.path.join(os.path.dirname(__file__), "weights", "calibrator.pkl")
@@ -303,51 +298,165 @@ class DeepfakeDetector:
         self.temporal_tracker.reset()
         self.frame_count = 0
         print("Detector reset - starting from frame 0")
+    
+    def swap_model(self, net, version):
+        """
+        Serve a new model from the next batch on
+        
+        Batches already running keep the model they started with, since
+        every inference path reads self.model once. The GradCAM explainer
+        wraps a copy of the old model, so it is stopped and rebuilt on the
+        next explanation.
+        
+        Returns:
+            The model that was replaced
+        """
+        old_model, self.model, self.model_version = self.model, net, version
+        explainer, self._explainer = self._explainer, None
+        if explainer is not None:
+            explainer.close()
+        return old_model
+        
+    def warmup(self, batch_sizes=WARMUP_BATCH_SIZES, frame_shape=(480, 640, 3)):
+        """
+        Run each inference stage once on synthetic inputs
+        
+        Covers the Haar cascade, CLAHE, all three MTCNN stages (random
+        crops contain no face, so R-Net / O-Net are called directly with
+        their candidate batch shapes) and the model at each batch size.
         
+        Returns:
+            Dict of per-stage and total times in ms
+        """
+        timings = {}
+        
+        start = time.perf_counter()
+        detect_bounding_box(np.full(frame_shape, 128, dtype=np.uint8))
+        timings['face_detection_ms'] = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        crop = np.random.default_rng(0).integers(0, 256, (224, 224, 3), dtype=np.uint8)
+        self._prepare_face_tensor(self.preprocess_face_quality(crop))
+        with torch.no_grad():
+            for batch_size in batch_sizes:
+                mtcnn.rnet(torch.zeros(batch_size, 3, 24, 24, device=DEVICE))
+                mtcnn.onet(torch.zeros(batch_size, 3, 48, 48, device=DEVICE))
+        timings['alignment_ms'] = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        warmup_model(self.model, batch_sizes)
+        timings['model_ms'] = (time.perf_counter() - start) * 1000
+        
+        timings['total_ms'] = sum(timings.values())
+        return timings
+    
     def preprocess_face_quality(self, face_region):
         """Lightweight preprocessing for real-time performance"""
         # Skip expensive quality checks for speed
-        processed = face_region.copy()
-        
         # Only apply CLAHE for contrast enhancement (fast and effective)
-        lab = cv2.cvtColor(processed, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        l = clahe.apply(l)
-        processed = cv2.merge([l, a, b])
-        processed = cv2.cvtColor(processed, cv2.COLOR_LAB2BGR)
+        return enhance_face_contrast(face_region)
+    
+    def _prepare_face_tensor(self, face_region):
+        """Align face with MTCNN and return a normalized (1, 3, 224, 224) tensor"""
+        input_face = align_face(face_region, mtcnn)
+        if input_face is None:
+            return None
+        
+        input_face = input_face.to(DEVICE).to(torch.float32) / 255.0
+        return (input_face - NORM_MEAN) / NORM_STD
+    
+    def _predict_batch(self, inputs, max_batch_size=16):
+        """Raw fake probabilities for a list of (1, 3, 224, 224) face tensors"""
+        net = self.model
+        probabilities = []
+        with torch.no_grad():
+            for i in range(0, len(inputs), max_batch_size):
+                logits = net(torch.cat(inputs[i:i + max_batch_size])).view(-1)
+                probabilities.extend(torch.sigmoid(logits).tolist())
+        return probabilities
+    
+    def score_faces(self, face_regions):
+        """
+        Score a batch of BGR face crops with one model pass
+        
+        Applies the same CLAHE preprocessing, calibration and heuristics as
+        analyze_face (without TTA).
+        
+        Returns:
+            List of (raw_probability, fake_probability) tuples, with
+            (None, None) for crops MTCNN could not align
+        """
+        inputs, aligned = [], []
+        for i, face_region in enumerate(face_regions):
+            input_face = self._prepare_face_tensor(self.preprocess_face_quality(face_region))
+            if input_face is not None:
+                inputs.append(input_face)
+                aligned.append(i)
+        
+        scores = [(None, None)] * len(face_regions)
+        if not inputs:
+            return scores
+        
+        for i, raw_prob in zip(aligned, self._predict_batch(inputs)):
+            fake_prob = self.apply_heuristics(self.apply_calibration(raw_prob), face_regions[i])
+            scores[i] = (raw_prob, float(fake_prob))
+        return scores
+    
+    def score_frames(self, frames, max_faces_per_frame=None):
+        """
+        Detect and score faces in a list of BGR frames with batched inference
         
-        return processed
+        Stateless (does not touch the temporal tracker), so it can be called
+        from several threads.
+        
+        Args:
+            frames: List of BGR frames
+            max_faces_per_frame: Only score the first N detected faces per frame
+        
+        Returns:
+            One dict per frame:
+                {'faces_detected': int,
+                 'faces': [{'bbox': (x, y, w, h), 'raw_probability': float,
+                            'fake_probability': float}, ...]}
+            'faces' only lists faces that could be aligned and scored.
+        """
+        results, crops, owners = [], [], []
+        for frame_index, frame in enumerate(frames):
+            faces = detect_bounding_box(frame)
+            results.append({'faces_detected': len(faces), 'faces': []})
+            for (x, y, w, h) in faces[:max_faces_per_frame]:
+                crops.append(frame[y:y + h, x:x + w])
+                owners.append((frame_index, (int(x), int(y), int(w), int(h))))
+        
+        for (frame_index, bbox), (raw_prob, fake_prob) in zip(owners, self.score_faces(crops)):
+            if fake_prob is not None:
+                results[frame_index]['faces'].append({
+                    'bbox': bbox,
+                    'raw_probability': raw_prob,
+                    'fake_probability': fake_prob
+                })
+        return results
     
     def _single_prediction(self, face_region):
         """Single prediction without augmentation"""
         try:
-            # Preprocess face
-            input_face = Image.fromarray(cv2.cvtColor(face_region, cv2.COLOR_BGR2RGB))
-            input_face = mtcnn(input_face)
+            input_face = self._prepare_face_tensor(face_region)
             
             if input_face is None:
                 return None
             
-            input_face = input_face.unsqueeze(0)
-            input_face = F.interpolate(input_face, size=(224, 224), mode="bilinear", align_corners=False)
-            input_face = input_face.to(DEVICE).to(torch.float32) / 255.0
-            
-            # Normalize
-            mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1).to(DEVICE)
-            std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1).to(DEVICE)
-            input_face = (input_face - mean) / std
-            
             # Get prediction
             with torch.no_grad():
-                logit = model(input_face).squeeze(0)
+                logit = self.model(input_face).squeeze(0)
                 output = torch.sigmoid(logit)
                 return output.item()
         except:
             return None
     
-    def analyze_face_with_tta(self, face_region):
+    def analyze_face_with_tta(self, face_region, num_augmentations=None):
         """Analyze face with Test-Time Augmentation for better accuracy"""
+        if num_augmentations is None:
+            num_augmentations = self.num_tta_augmentations
         predictions = []
         
         # Original prediction
@@ -356,7 +465,7 @@ class DeepfakeDetector:
             predictions.append(pred)
         
         # Augmented predictions
-        for _ in range(self.num_tta_augmentations - 1):
+        for _ in range(num_augmentations - 1):
             aug_face = face_region.copy()
             
             # Random horizontal flip
@@ -452,7 +561,8 @@ class DeepfakeDetector:
             if self.use_tta:
                 fake_probability = self.analyze_face_with_tta(preprocessed)
             else:
-                fake_probability = self._single_prediction(preprocessed)
+                input_face = self._prepare_face_tensor(preprocessed)
+                fake_probability = self._predict_batch([input_face])[0] if input_face is not None else None
             
             if fake_probability is None:
                 return None, None, None
@@ -463,8 +573,10 @@ class DeepfakeDetector:
             # Apply heuristics (frequency analysis, quality checks)
             fake_probability = self.apply_heuristics(fake_probability, face_region)
             
-            # GradCAM disabled for TTA mode (too slow)
+            # GradCAM only when explicitly enabled (PNG overlay, cached by face hash)
             gradcam_img = None
+            if self.enable_gradcam:
+                gradcam_img, _ = self.explain_face(preprocessed)
             
             return fake_probability, fake_probability, gradcam_img
             
@@ -472,6 +584,24 @@ class DeepfakeDetector:
             print(f"Face analysis error: {e}")
             return None, None, None
     
+    def get_explainer(self):
+        """GradCAM explainer, created on first use"""
+        # Prebuilt engines have no hookable layers; explain with their eager twin
+        net = getattr(self.model, 'eager', self.model)
+        explainer = self._explainer
+        if explainer is None or explainer.model is not net:
+            explainer = self._explainer = GradCAMExplainer(net, self._prepare_face_tensor)
+        return explainer
+    
+    def explain_face(self, face_region):
+        """
+        GradCAM overlay for a face crop (batched and cached, see gradcam_explainer.py)
+        
+        Returns:
+            tuple: (PNG bytes or None if no face could be aligned, cache_hit)
+        """
+        return self.get_explainer().explain(face_region)
+    
     def get_box_color(self, confidence_level):
         """Get color based on voting verdict"""
         if confidence_level == 'FAKE':
@@ -534,7 +664,11 @@ class DeepfakeDetector:
             # Check if we should trigger Layer 3
             if self.temporal_tracker.should_trigger_forensic_analysis():
                 trigger_forensic = True
-                forensic_frame = frame.copy()
+                if self.forensic_pool is not None:
+                    # Hand off to Layer 3 workers without blocking this frame
+                    self.last_forensic_job_id = self.forensic_pool.submit(frame, (x, y, w, h))
+                else:
+                    forensic_frame = frame.copy()
             
             # Draw overlay
             frame = self.draw_detection_overlay(frame, x, y, w, h, fake_prob, confidence_level)
@@ -549,6 +683,25 @@ class DeepfakeDetector:
         return frame, trigger_forensic, forensic_frame
 
 
+def summarize_frame_scores(fake_probabilities):
+    """
+    Video-level verdict by majority vote over per-frame fake probabilities
+    
+    Returns:
+        tuple: (final_classification or None if empty, avg_fake_probability, fake_percentage)
+    """
+    if len(fake_probabilities) == 0:
+        return None, 0.0, 0.0
+    
+    fake_count = sum(1 for p in fake_probabilities if p > FAKE_THRESHOLD)
+    real_count = len(fake_probabilities) - fake_count
+    fake_percentage = (fake_count / len(fake_probabilities)) * 100
+    avg_confidence = sum(fake_probabilities) / len(fake_probabilities)
+    
+    final_classification = "FAKE" if fake_count > real_count else "REAL"
+    return final_classification, avg_confidence, fake_percentage
+
+
 # Global detector instance with enhanced features
 detector = DeepfakeDetector(
     use_tta=False,             # Disabled for real-time speed
@@ -0,0 +1,235 @@
+"""
+Deepfake Models
+Serving architectures and loading of their deployed weights
+
+Kept free of import-time side effects (no face detector, no serving model
+loaded) so registration, export, artifact builds and benchmarks can build
+model skeletons and load weights without booting deepfake_detection.
+"""
+
+import os
+
+import torch
+import torch.nn as nn
+import torchvision
+from efficientnet_pytorch import EfficientNet
+
+from model_weights import WEIGHTS_SUFFIX, file_sha256, load_weights
+from serving_artifacts import load_artifact, load_folded_weights
+from inference_graph import optimize_for_inference
+
+DEVICE = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+# Batch sizes pushed through a model before it takes traffic: single-face
+# /analyze requests and batch_scan / forensic batches
+WARMUP_BATCH_SIZES = (1, 4, 1)
+
+class PrecisionMixin:
+    """fp32 / bf16 (channels_last) inference switch shared by the serving models"""
+    
+    precision = 'fp32'
+    
+    def _forward_with_precision(self, net, x):
+        if self.precision == 'bf16':
+            x = x.contiguous(memory_format=torch.channels_last)
+            with torch.autocast('cpu', dtype=torch.bfloat16):
+                return net(x).float()
+        return net(x)
+    
+    def configure_precision(self, precision='fp32', force=False):
+        """
+        Select the inference precision
+        
+        Args:
+            precision: 'fp32' or 'bf16' (CPU bf16 autocast with channels_last layout)
+            force: Use bf16 even if the CPU has no native bf16 support
+                (emulated and slow, only useful for accuracy checks)
+        
+        Returns:
+            The precision actually in use
+        """
+        if precision == 'bf16' and not (force or cpu_bf16_supported()):
+            print("⚠️  bf16 not supported on this host, falling back to fp32")
+            precision = 'fp32'
+        
+        if precision == 'bf16':
+            self.to(memory_format=torch.channels_last)
+        else:
+            self.to(memory_format=torch.contiguous_format)
+        self.precision = precision
+        return precision
+
+
+# Create EfficientNet-B0 model with custom classifier for binary deepfake detection
+class DeepfakeEfficientNet(PrecisionMixin, nn.Module):
+    """EfficientNet-B0 backbone with binary classification head"""
+    def __init__(self, pretrained=True, dropout=0.5):
+        super(DeepfakeEfficientNet, self).__init__()
+        # Load pretrained EfficientNet-B0
+        if pretrained:
+            self.efficientnet = EfficientNet.from_pretrained('efficientnet-b0')
+        else:
+            self.efficientnet = EfficientNet.from_name('efficientnet-b0')
+        
+        # Get the number of features from the last layer
+        num_features = self.efficientnet._fc.in_features
+        
+        # Replace the classifier with GENERALIZED architecture
+        # This matches the train_generalized_colab.py model
+        # More layers with BatchNorm for better generalization
+        self.efficientnet._fc = nn.Sequential(
+            nn.Dropout(dropout),
+            nn.Linear(num_features, 512),
+            nn.BatchNorm1d(512),
+            nn.ReLU(),
+            nn.Dropout(dropout * 0.7),
+            nn.Linear(512, 256),
+            nn.BatchNorm1d(256),
+            nn.ReLU(),
+            nn.Dropout(dropout * 0.5),
+            nn.Linear(256, 1)
+        )
+    
+    def forward(self, x):
+        return self._forward_with_precision(self.efficientnet, x)
+    
+    def get_feature_extractor(self):
+        """Get the last convolutional layer for GradCAM"""
+        return self.efficientnet._conv_head
+
+
+class DeepfakeStudent(PrecisionMixin, nn.Module):
+    """
+    MobileNetV3-small with a single-logit head, distilled from DeepfakeEfficientNet
+    (see mlops/training/distill.py) for cheaper CPU serving
+    """
+    def __init__(self, pretrained=False):
+        super(DeepfakeStudent, self).__init__()
+        weights = None
+        if pretrained:
+            weights = torchvision.models.MobileNet_V3_Small_Weights.IMAGENET1K_V1
+        try:
+            self.mobilenet = torchvision.models.mobilenet_v3_small(weights=weights)
+        except Exception as e:
+            print(f"⚠️  Warning: Could not load ImageNet weights for the student ({e}), using random init")
+            self.mobilenet = torchvision.models.mobilenet_v3_small(weights=None)
+        
+        # Replace the 1000-class layer with the binary fake logit
+        self.mobilenet.classifier[-1] = nn.Linear(self.mobilenet.classifier[-1].in_features, 1)
+    
+    def forward(self, x):
+        return self._forward_with_precision(self.mobilenet, x)
+    
+    def get_feature_extractor(self):
+        """Get the last convolutional block for GradCAM"""
+        return self.mobilenet.features[-1]
+
+
+# DEEPFAKE_SERVING_MODEL selects the architecture, its weights file name in
+# weights/ and whether to start from ImageNet weights when none is deployed
+SERVING_MODELS = {
+    'efficientnet': (DeepfakeEfficientNet, 'best_model', True),
+    'student': (DeepfakeStudent, 'student_model', False),
+}
+
+
+def build_model(kind, pretrained=False):
+    """Instantiate a serving architecture (key of SERVING_MODELS)"""
+    if kind not in SERVING_MODELS:
+        raise ValueError(f"Unknown serving model '{kind}' (expected one of {sorted(SERVING_MODELS)})")
+    return SERVING_MODELS[kind][0](pretrained=pretrained)
+
+
+def serving_weights_path(kind):
+    """weights/<name>.safetensors that deploy.py writes for a serving architecture"""
+    if kind not in SERVING_MODELS:
+        raise ValueError(f"Unknown serving model '{kind}' (expected one of {sorted(SERVING_MODELS)})")
+    return os.path.join(os.path.dirname(__file__), "weights", SERVING_MODELS[kind][1] + WEIGHTS_SUFFIX)
+
+
+# Prebuilt engines deployed next to the weights (see serving_artifacts.py)
+ARTIFACTS_DIR = os.path.join(os.path.dirname(__file__), "weights", "artifacts")
+
+
+def load_engine(kind, weights_path, engine='auto', artifacts_dir=ARTIFACTS_DIR, expected_sha256=None):
+    """
+    Serving model for a safetensors weights file
+    
+    Args:
+        kind: Key of SERVING_MODELS
+        weights_path: .safetensors file
+        engine: 'eager', a prebuilt engine ('torchscript', 'int8', 'onnx')
+            or 'auto' (torchscript when built, else eager)
+        artifacts_dir: Artifact cache holding prebuilt engines
+        expected_sha256: Optional hash to check the weights file against
+    
+    Returns:
+        Model in eval mode on DEVICE. Falls back to eager when the engine
+        was not built for these weights and this torch version. Eager
+        models are BatchNorm-folded (see inference_graph.py): memory-mapped
+        from the prebuilt folded weights when they exist, so worker
+        processes share them, otherwise folded here into private memory.
+    """
+    def load_eager():
+        with torch.device('meta'):
+            net = build_model(kind)
+        sha256 = file_sha256(weights_path)
+        if expected_sha256 is not None and sha256 != expected_sha256:
+            raise ValueError(f"{weights_path} does not match its recorded sha256")
+        try:
+            return load_folded_weights(artifacts_dir, sha256, net).to(DEVICE)
+        except LookupError:
+            pass
+        except ValueError as e:
+            print(f"⚠️  Warning: {e}; folding the weights at load")
+            with torch.device('meta'):
+                net = build_model(kind)
+        # Strict: a deployed file that does not match the architecture is an error
+        load_weights(net, weights_path)
+        return optimize_for_inference(net.to(DEVICE))
+    
+    if engine == 'eager' or DEVICE != "cpu":
+        return load_eager()
+    
+    wanted = 'torchscript' if engine == 'auto' else engine
+    try:
+        net = load_artifact(artifacts_dir, expected_sha256 or file_sha256(weights_path), wanted, load_eager)
+    except LookupError as e:
+        if engine != 'auto':
+            print(f"⚠️  Warning: {e}; serving the eager model")
+        return load_eager()
+    except (ValueError, ImportError) as e:
+        print(f"⚠️  Warning: {e}; serving the eager model")
+        return load_eager()
+    print(f"✓ Prebuilt {wanted} engine loaded ({net.key})")
+    return net
+
+
+def cpu_bf16_supported():
+    """Check for native CPU bf16 support (AVX512-BF16 / AMX) via oneDNN"""
+    if DEVICE != "cpu" or not torch.backends.mkldnn.is_available():
+        return False
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+def warmup_model(net, batch_sizes=WARMUP_BATCH_SIZES):
+    """
+    Run synthetic batches through a model
+    
+    The first passes pay for allocator growth and oneDNN primitive
+    creation; running them ahead of time keeps that cost off real requests.
+    
+    Args:
+        net: Model in eval mode on DEVICE
+        batch_sizes: Batch size of each synthetic pass
+    
+    Raises:
+        RuntimeError: The model produced non-finite outputs
+    """
+    with torch.no_grad():
+        for batch_size in batch_sizes:
+            output = net(torch.randn(batch_size, 3, 224, 224, device=DEVICE))
+            if not torch.isfinite(output).all():
+                raise RuntimeError("Model produced non-finite outputs during warmup")
@@ -3,12 +3,41 @@ Extract frames from your videos to create test images
 This lets us test the model on image-level (like it was trained)
 """
 
+import os
 import cv2
-import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from tqdm import tqdm
 
-def extract_frames_to_images(video_folder, output_folder, frames_per_video=50):
+from video_io import read_frames, sample_frame_indices, video_frame_count
+
+# (input subfolder, output subfolder, filename prefix)
+CLASSES = [
+    ("real_videos", "Real", "real"),
+    ("fake_videos", "Fake", "fake"),
+]
+
+def _extract_video(video, output_dir, prefix, frame_indices, writer_threads):
+    """
+    Decode one video in a single forward pass and write the sampled frames
+    
+    Runs in a worker process; JPEG encoding and writing happen on a thread
+    pool so decoding never waits on disk. Frames are written under
+    temporary names, numbered by the caller once it knows how many frames
+    each earlier video actually read.
+    
+    Returns:
+        List of (temporary file, written) for every frame that was read
+    """
+    cv2.setNumThreads(1)
+    with ThreadPoolExecutor(max_workers=writer_threads) as writers:
+        frames = []
+        for local, (_, frame) in enumerate(read_frames(video, frame_indices)):
+            temp_file = Path(output_dir) / f".{prefix}_{Path(video).stem}_read_{local:04d}.jpg"
+            frames.append((temp_file, writers.submit(cv2.imwrite, str(temp_file), frame)))
+        return [(temp_file, bool(future.result())) for temp_file, future in frames]
+
+def extract_frames_to_images(video_folder, output_folder, frames_per_video=50, num_workers=None, writer_threads=4):
     """
     Extract frames from videos and save as images
     
@@ -16,74 +45,42 @@ def extract_frames_to_images(video_folder, output_folder, frames_per_video=50):
         video_folder: Folder with real_videos/ and fake_videos/
         output_folder: Where to save extracted images
         frames_per_video: Number of frames to extract per video
+        num_workers: Number of videos decoded in parallel (default: CPU count)
+        writer_threads: JPEG writer threads per worker
     """
     
     video_path = Path(video_folder)
     output_path = Path(output_folder)
-    
-    # Create output directories
-    (output_path / "Real").mkdir(parents=True, exist_ok=True)
-    (output_path / "Fake").mkdir(parents=True, exist_ok=True)
+    num_workers = num_workers or os.cpu_count() or 1
     
     print("="*70)
     print("EXTRACTING FRAMES FROM VIDEOS")
     print("="*70)
     
-    # Process real videos
-    real_videos = list((video_path / "real_videos").glob("*.mp4"))
-    print(f"\nFound {len(real_videos)} real videos")
-    
-    frame_count = 0
-    for video in tqdm(real_videos, desc="Real videos"):
-        cap = cv2.VideoCapture(str(video))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        if total_frames == 0:
-            cap.release()
-            continue
-        
-        # Extract evenly spaced frames
-        frame_indices = np.linspace(0, total_frames - 1, min(frames_per_video, total_frames), dtype=int)
-        
-        for idx in frame_indices:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if ret:
-                # Save frame
-                output_file = output_path / "Real" / f"real_{video.stem}_frame_{frame_count:04d}.jpg"
-                cv2.imwrite(str(output_file), frame)
-                frame_count += 1
-        
-        cap.release()
-    
-    print(f"✓ Extracted {frame_count} real frames")
-    
-    # Process fake videos
-    fake_videos = list((video_path / "fake_videos").glob("*.mp4"))
-    print(f"\nFound {len(fake_videos)} fake videos")
-    
-    frame_count = 0
-    for video in tqdm(fake_videos, desc="Fake videos"):
-        cap = cv2.VideoCapture(str(video))
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        
-        if total_frames == 0:
-            cap.release()
-            continue
-        
-        frame_indices = np.linspace(0, total_frames - 1, min(frames_per_video, total_frames), dtype=int)
-        
-        for idx in frame_indices:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if ret:
-                output_file = output_path / "Fake" / f"fake_{video.stem}_frame_{frame_count:04d}.jpg"
-                cv2.imwrite(str(output_file), frame)
-                frame_count += 1
-        
-        cap.release()
-    
-    print(f"✓ Extracted {frame_count} fake frames")
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        for input_dir, output_dir, prefix in CLASSES:
+            (output_path / output_dir).mkdir(parents=True, exist_ok=True)
+            videos = sorted((video_path / input_dir).glob("*.mp4"))
+            print(f"\nFound {len(videos)} {prefix} videos")
+            
+            futures = []
+            for video in videos:
+                frame_indices = sample_frame_indices(video_frame_count(video), frames_per_video)
+                if frame_indices:
+                    futures.append((video, pool.submit(_extract_video, str(video), str(output_path / output_dir),
+                                                       prefix, frame_indices, writer_threads)))
+            
+            # Frame numbers run on across the videos of a class and count only
+            # frames that were read, so results are numbered in video order
+            frame_count = 0
+            for video, future in tqdm(futures, desc=f"{prefix.capitalize()} videos"):
+                for temp_file, written in future.result():
+                    if written:
+                        output_file = output_path / output_dir / f"{prefix}_{video.stem}_frame_{frame_count:04d}.jpg"
+                        temp_file.replace(output_file)
+                    frame_count += 1
+            
+            print(f"✓ Extracted {frame_count} {prefix} frames")
     
     print(f"\n✅ Test images created at: {output_path}")
     print(f"   Real: {len(list((output_path / 'Real').glob('*')))} images")
@@ -100,7 +97,12 @@ if __name__ == "__main__":
                        help='Where to save extracted images')
     parser.add_argument('--frames_per_video', type=int, default=50,
                        help='Frames to extract per video')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Videos decoded in parallel (default: CPU count)')
+    parser.add_argument('--writer_threads', type=int, default=4,
+                       help='JPEG writer threads per worker')
     
     args = parser.parse_args()
     
-    extract_frames_to_images(args.video_folder, args.output_folder, args.frames_per_video)
+    extract_frames_to_images(args.video_folder, args.output_folder, args.frames_per_video,
+                             args.workers, args.writer_threads)
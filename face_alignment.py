@@ -0,0 +1,70 @@
+"""
+Face Alignment Module
+CLAHE enhancement and MTCNN alignment shared by inference and preprocessing
+"""
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+from facenet_pytorch import MTCNN
+from PIL import Image
+
+FACE_SIZE = 224
+
+
+def create_mtcnn(device="cpu"):
+    """MTCNN configured the way the detector uses it"""
+    return MTCNN(
+        select_largest=False,
+        post_process=False,
+        device=device
+    ).to(device).eval()
+
+
+def enhance_face_contrast(face_region):
+    """Apply CLAHE to the lightness channel of a BGR face crop"""
+    lab = cv2.cvtColor(face_region, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    l = clahe.apply(l)
+    return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
+
+
+def align_face(face_region, mtcnn, size=FACE_SIZE):
+    """
+    Align a BGR face crop with MTCNN and resize it for the model
+
+    Returns:
+        Float tensor (1, 3, size, size) with RGB values in [0, 255], or None
+        if MTCNN finds no face
+    """
+    input_face = Image.fromarray(cv2.cvtColor(face_region, cv2.COLOR_BGR2RGB))
+    input_face = mtcnn(input_face)
+
+    if input_face is None:
+        return None
+
+    input_face = input_face.unsqueeze(0)
+    return F.interpolate(input_face, size=(size, size), mode="bilinear", align_corners=False)
+
+
+def aligned_to_uint8(aligned):
+    """(1, 3, H, W) aligned tensor -> (H, W, 3) uint8 RGB array"""
+    return aligned[0].round().clamp(0, 255).to(torch.uint8).permute(1, 2, 0).cpu().numpy()
+
+
+def uint8_to_input(crops, mean, std, device="cpu"):
+    """
+    Normalize uint8 RGB face crops for the model
+
+    Args:
+        crops: Array/tensor (N, H, W, 3) uint8
+        mean, std: Normalization tensors shaped (1, 3, 1, 1)
+
+    Returns:
+        Float tensor (N, 3, H, W)
+    """
+    # Converting to float32 copies out of (read-only) shard memory maps once
+    batch = torch.from_numpy(np.asarray(crops, dtype=np.float32)).to(device).permute(0, 3, 1, 2) / 255.0
+    return (batch - mean) / std
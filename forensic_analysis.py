@@ -0,0 +1,162 @@
+"""
+Layer 3: Background Forensic Analysis
+Runs the expensive analyses (full TTA, frequency analysis, GradCAM) off the
+real-time request path on a small pool of worker threads
+"""
+
+import base64
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from frame_buffer import FrameRingBuffer
+
+
+class ForensicWorkerPool:
+    """
+    Bounded queue of forensic jobs processed by background worker threads.
+
+    Frames are copied into a preallocated FrameRingBuffer; when every slot is
+    busy new jobs are rejected instead of delaying the caller.
+    """
+
+    def __init__(self, detector, num_workers=1, queue_size=4, max_height=1080, max_width=1920,
+                 num_tta_augmentations=8, max_results=256):
+        """
+        Args:
+            detector: DeepfakeDetector used for the analyses
+            num_workers: Number of worker threads
+            queue_size: Maximum number of jobs waiting to be processed
+            max_height: Frame slot height (larger frames are downscaled)
+            max_width: Frame slot width (larger frames are downscaled)
+            num_tta_augmentations: Number of TTA passes for the full analysis
+            max_results: Number of job results kept before the oldest are evicted
+        """
+        self.detector = detector
+        self.num_workers = num_workers
+        self.num_tta_augmentations = num_tta_augmentations
+        self.max_results = max_results
+        # One extra slot per worker so a full queue never starves a running job
+        self.buffer = FrameRingBuffer(queue_size + num_workers, max_height, max_width)
+        self.jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._workers = []
+
+    def start(self):
+        """Start the worker threads"""
+        if self._workers:
+            return
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"forensic-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self, timeout=5):
+        """Stop the worker threads (pending jobs are abandoned)"""
+        self.buffer.close()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def submit(self, frame, face_bbox):
+        """
+        Queue a frame for forensic analysis without blocking
+
+        Args:
+            frame: BGR frame
+            face_bbox: Tuple (x, y, w, h) of the face to analyze
+
+        Returns:
+            Job id, or None if the queue is full
+        """
+        job_id = uuid.uuid4().hex
+        h, w = frame.shape[:2]
+        meta = {'job_id': job_id, 'bbox': tuple(int(v) for v in face_bbox), 'frame_shape': (h, w)}
+
+        with self._jobs_lock:
+            self.jobs[job_id] = {'status': 'queued', 'submitted_at': time.time()}
+            self._evict_old_jobs()
+
+        if self.buffer.put(frame, meta) is None:
+            with self._jobs_lock:
+                self.jobs.pop(job_id, None)
+            return None
+        return job_id
+
+    def get_job(self, job_id):
+        """Get a job's status and result, or None if unknown"""
+        with self._jobs_lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def get_stats(self):
+        """Queue statistics"""
+        return {
+            'workers': len(self._workers),
+            'pending': self.buffer.pending_count(),
+            'dropped': self.buffer.dropped,
+            'jobs_tracked': len(self.jobs)
+        }
+
+    def _evict_old_jobs(self):
+        """Drop the oldest finished jobs once max_results is exceeded"""
+        while len(self.jobs) > self.max_results:
+            for job_id, job in self.jobs.items():
+                if job['status'] in ('done', 'failed'):
+                    del self.jobs[job_id]
+                    break
+            else:
+                break
+
+    def _update_job(self, job_id, **fields):
+        with self._jobs_lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def _worker_loop(self):
+        while True:
+            item = self.buffer.get()
+            if item is None:
+                return
+            slot, frame, meta = item
+            job_id = meta['job_id']
+            self._update_job(job_id, status='running', started_at=time.time())
+            try:
+                result = self._analyze(frame, meta)
+                self._update_job(job_id, status='done', completed_at=time.time(), result=result)
+            except Exception as e:
+                print(f"Forensic analysis error: {e}")
+                self._update_job(job_id, status='failed', completed_at=time.time(), error=str(e))
+            finally:
+                self.buffer.release(slot)
+
+    def _analyze(self, frame, meta):
+        """Run the full forensic analysis on one face"""
+        x, y, w, h = meta['bbox']
+        # Rescale the bbox if the ring buffer had to downscale the frame
+        scale = frame.shape[0] / meta['frame_shape'][0]
+        if scale != 1.0:
+            x, y, w, h = (int(round(v * scale)) for v in (x, y, w, h))
+        face_region = frame[y:y + h, x:x + w]
+
+        start = time.time()
+        preprocessed = self.detector.preprocess_face_quality(face_region)
+        tta_probability = self.detector.analyze_face_with_tta(preprocessed, self.num_tta_augmentations)
+        if tta_probability is not None:
+            tta_probability = float(self.detector.apply_calibration(tta_probability))
+        frequency_adjustment = float(self.detector.analyze_frequency_domain(face_region))
+
+        gradcam_png, _ = self.detector.explain_face(preprocessed)
+        if gradcam_png is not None:
+            gradcam_png = base64.b64encode(gradcam_png).decode('ascii')
+
+        return {
+            'face_bbox': dict(zip(('x', 'y', 'width', 'height'), meta['bbox'])),
+            'tta_fake_probability': tta_probability,
+            'tta_augmentations': self.num_tta_augmentations,
+            'frequency_adjustment': frequency_adjustment,
+            'low_high_frequency_energy': frequency_adjustment > 0,
+            'gradcam_png': gradcam_png,
+            'analysis_time_ms': (time.time() - start) * 1000
+        }
@@ -0,0 +1,118 @@
+"""
+Frame Ring Buffer
+Fixed pool of preallocated frame slots shared between a producer and consumers
+"""
+
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    Bounded buffer of preallocated uint8 frame slots.
+
+    Producers copy frames into a free slot with put(); consumers take the
+    oldest pending slot with get() and hand it back with release() once they
+    are done with the view. No frame memory is allocated after construction.
+    """
+
+    def __init__(self, capacity, max_height, max_width, channels=3):
+        """
+        Args:
+            capacity: Number of frame slots
+            max_height: Height of each slot (larger frames are downscaled)
+            max_width: Width of each slot (larger frames are downscaled)
+            channels: Number of colour channels per frame
+        """
+        self.capacity = capacity
+        self.max_height = max_height
+        self.max_width = max_width
+        self._frames = np.zeros((capacity, max_height, max_width, channels), dtype=np.uint8)
+        self._shapes = [None] * capacity
+        self._meta = [None] * capacity
+        self._free = deque(range(capacity))
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def _store(self, slot, frame):
+        """Copy frame into slot, downscaling if it does not fit"""
+        h, w = frame.shape[:2]
+        if h > self.max_height or w > self.max_width:
+            scale = min(self.max_height / h, self.max_width / w)
+            h, w = max(1, int(h * scale)), max(1, int(w * scale))
+            frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+        self._frames[slot, :h, :w] = frame.reshape(h, w, -1)
+        self._shapes[slot] = (h, w)
+
+    def put(self, frame, meta=None, drop_oldest=False):
+        """
+        Copy a frame into the buffer
+
+        Args:
+            frame: BGR frame (H, W, C) uint8
+            meta: Arbitrary object returned alongside the frame by get()
+            drop_oldest: When full, overwrite the oldest pending frame instead
+                of rejecting the new one
+
+        Returns:
+            Slot index, or None if the frame was dropped
+        """
+        with self._cond:
+            if self._closed:
+                return None
+            if self._free:
+                slot = self._free.popleft()
+            elif drop_oldest and self._pending:
+                slot = self._pending.popleft()
+                self.dropped += 1
+            else:
+                self.dropped += 1
+                return None
+
+        self._store(slot, frame)
+        self._meta[slot] = meta
+
+        with self._cond:
+            self._pending.append(slot)
+            self._cond.notify()
+        return slot
+
+    def get(self, timeout=None):
+        """
+        Take the oldest pending frame
+
+        Returns:
+            tuple: (slot, frame_view, meta), or None on timeout/close.
+            frame_view stays valid until release(slot) is called.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending or self._closed, timeout):
+                return None
+            if not self._pending:
+                return None
+            slot = self._pending.popleft()
+
+        h, w = self._shapes[slot]
+        return slot, self._frames[slot, :h, :w], self._meta[slot]
+
+    def release(self, slot):
+        """Return a slot obtained from get() to the free pool"""
+        with self._cond:
+            self._meta[slot] = None
+            self._free.append(slot)
+
+    def pending_count(self):
+        """Number of frames waiting to be consumed"""
+        with self._cond:
+            return len(self._pending)
+
+    def close(self):
+        """Wake up all waiting consumers and reject further frames"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
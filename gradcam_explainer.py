@@ -0,0 +1,205 @@
+"""
+GradCAM Explanations
+Computes GradCAM heatmaps on demand, batching concurrent requests and
+caching the resulting PNG overlays by face-crop hash. Identical requests
+that arrive while one is being computed wait for it instead of queueing a
+second pass; failures are not cached.
+"""
+
+import copy
+import hashlib
+import queue
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import torch
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# Cached marker for face crops that MTCNN could not align
+_NO_FACE = b''
+
+
+class GradCAMExplainer:
+    """
+    Lazily-initialized GradCAM over DeepfakeEfficientNet._conv_head.
+
+    pytorch_grad_cam is only imported, and the model only copied, on the
+    first explain() call. Requests arriving while a batch is running are
+    grouped into the next batch, and requests for a face already in flight
+    share its result.
+    """
+
+    def __init__(self, model, prepare_face, cache_size=128, max_batch_size=8, batch_wait_ms=5):
+        """
+        Args:
+            model: Serving model exposing get_feature_extractor()
+            prepare_face: Callable mapping a BGR face crop to a normalized
+                (1, 3, 224, 224) tensor, or None if no face is found
+            cache_size: Number of overlays kept in the LRU cache
+            max_batch_size: Maximum number of faces per GradCAM pass
+            batch_wait_ms: How long to wait for more requests before running a batch
+        """
+        self.model = model
+        self.prepare_face = prepare_face
+        self.cache_size = cache_size
+        self.max_batch_size = max_batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.coalesced = 0
+        self._cache = OrderedDict()
+        # Face hash -> request being computed; guarded by _cache_lock
+        self._inflight = {}
+        self._cache_lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._cam = None
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @staticmethod
+    def face_hash(face_region):
+        """Content hash of a face crop"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(face_region.shape).encode())
+        digest.update(np.ascontiguousarray(face_region).data)
+        return digest.hexdigest()
+
+    def explain(self, face_region, timeout=30):
+        """
+        Get a GradCAM overlay for a BGR face crop
+
+        Returns:
+            tuple: (png_bytes or None if no face could be aligned, cache_hit),
+            cache_hit also being True when an identical in-flight request
+            computed the overlay
+        """
+        key = self.face_hash(face_region)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return self._cache[key] or None, True
+            request = self._inflight.get(key)
+            shared = request is not None
+            if shared:
+                self.coalesced += 1
+            else:
+                self.cache_misses += 1
+                request = self._inflight[key] = {'key': key, 'input': None, 'done': threading.Event(),
+                                                 'png': None, 'error': None}
+
+        if not shared:
+            try:
+                input_face = self.prepare_face(face_region)
+            except Exception as e:
+                self._finish(request, error=e)
+                raise
+            if input_face is None:
+                self._finish(request, png=_NO_FACE)
+                return None, False
+            request['input'] = input_face
+            self._ensure_worker()
+            self._requests.put(request)
+
+        if not request['done'].wait(timeout):
+            raise TimeoutError("GradCAM explanation timed out")
+        if request['error'] is not None:
+            raise request['error']
+        return request['png'] or None, shared
+
+    def get_stats(self):
+        """Cache statistics"""
+        with self._cache_lock:
+            return {
+                'cached': len(self._cache),
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._inflight)
+            }
+
+    def _finish(self, request, png=None, error=None):
+        """Cache a successful result, then release the request and everyone waiting on it"""
+        request['png'], request['error'] = png, error
+        with self._cache_lock:
+            if error is None:
+                self._cache[request['key']] = png
+                self._cache.move_to_end(request['key'])
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            del self._inflight[request['key']]
+        request['done'].set()
+
+    def close(self):
+        """Stop the worker once the requests already queued are done"""
+        with self._worker_lock:
+            if self._worker is not None:
+                self._requests.put(None)
+                self._worker = None
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._worker_loop, name="gradcam-worker", daemon=True)
+                self._worker.start()
+
+    def _get_cam(self):
+        """Build GradCAM on a private model copy (hooks never touch serving)"""
+        if self._cam is None:
+            from pytorch_grad_cam import GradCAM
+
+            cam_model = copy.deepcopy(self.model).eval()
+            self._cam = GradCAM(model=cam_model, target_layers=[cam_model.get_feature_extractor()])
+        return self._cam
+
+    def _worker_loop(self):
+        while True:
+            batch = [self._requests.get()]
+            if batch[0] is None:
+                return
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self._requests.get(timeout=self.batch_wait_ms / 1000)
+                except queue.Empty:
+                    break
+                if request is None:
+                    # Finish this batch first, then stop
+                    self._requests.put(None)
+                    break
+                batch.append(request)
+
+            try:
+                pngs = self._explain_batch(torch.cat([r['input'] for r in batch]))
+            except Exception as e:
+                for request in batch:
+                    self._finish(request, error=e)
+                continue
+            for request, png in zip(batch, pngs):
+                if png is None:
+                    self._finish(request, error=RuntimeError("Could not encode the GradCAM overlay as PNG"))
+                else:
+                    self._finish(request, png=png)
+
+    def _explain_batch(self, inputs):
+        """Run GradCAM on a batch and encode the overlays as PNG"""
+        from pytorch_grad_cam.utils.image import show_cam_on_image
+        from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
+
+        # Single-logit head: target index 0 highlights evidence for FAKE
+        cams = self._get_cam()(input_tensor=inputs, targets=[ClassifierOutputTarget(0)] * len(inputs))
+
+        mean = torch.tensor(IMAGENET_MEAN, device=inputs.device).view(1, 3, 1, 1)
+        std = torch.tensor(IMAGENET_STD, device=inputs.device).view(1, 3, 1, 1)
+        faces = (inputs * std + mean).clamp(0, 1).permute(0, 2, 3, 1).cpu().numpy().astype(np.float32)
+
+        pngs = []
+        for face, cam in zip(faces, cams):
+            # Overlay in BGR so cv2 encodes the colours correctly
+            overlay = show_cam_on_image(np.ascontiguousarray(face[..., ::-1]), cam, use_rgb=False)
+            ok, encoded = cv2.imencode('.png', overlay, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+            pngs.append(encoded.tobytes() if ok else None)
+        return pngs
@@ -0,0 +1,106 @@
+"""
+Inference Graph Optimization
+Folds BatchNorm into the preceding convolution / linear layer, strips
+dropout and identity ops and switches swish to the fused SiLU kernel
+
+At inference BatchNorm is a fixed per-channel affine transform, so it can
+be folded into the weights and bias of the layer before it; dropout is
+the identity in eval mode. Removing both takes one memory pass per
+layer out of every forward. The result is inference-only: its state dict
+no longer matches the training architecture.
+
+EfficientNet blocks call their BatchNorms by attribute rather than through
+a Sequential, so those are folded by name (NAMED_CONV_BN) and replaced by
+nn.Identity. The layer GradCAM hooks (get_feature_extractor) is left as it
+is by default, so explanations see the same activations as before.
+"""
+
+from collections import OrderedDict
+
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval, fuse_linear_bn_eval
+
+# (layer, BatchNorm) attribute pairs called in sequence by EfficientNet's
+# stem / head and MBConvBlock
+NAMED_CONV_BN = (
+    ('_conv_stem', '_bn0'),
+    ('_conv_head', '_bn1'),
+    ('_expand_conv', '_bn0'),
+    ('_depthwise_conv', '_bn1'),
+    ('_project_conv', '_bn2'),
+)
+
+DROPOUT_TYPES = (nn.Dropout, nn.Dropout1d, nn.Dropout2d, nn.AlphaDropout)
+
+
+def fuse_pair(layer, bn):
+    """Layer with the BatchNorm after it folded in, or None if the pair cannot be folded"""
+    if isinstance(layer, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d) and layer.out_channels == bn.num_features:
+        return fuse_conv_bn_eval(layer, bn)
+    if isinstance(layer, nn.Linear) and isinstance(bn, nn.BatchNorm1d) and layer.out_features == bn.num_features:
+        return fuse_linear_bn_eval(layer, bn)
+    return None
+
+
+def _optimize_sequential(seq, keep):
+    layers = list(seq)
+    optimized = []
+    i = 0
+    while i < len(layers):
+        layer = layers[i]
+        following = layers[i + 1] if i + 1 < len(layers) else None
+        fused = fuse_pair(layer, following) if following is not None and layer not in keep else None
+        if fused is not None:
+            optimized.append(fused)
+            i += 2
+            continue
+        if not isinstance(layer, DROPOUT_TYPES + (nn.Identity,)):
+            optimized.append(layer)
+        i += 1
+    seq._modules = OrderedDict((str(index), layer) for index, layer in enumerate(optimized))
+
+
+def optimize_for_inference(net, explainable=True):
+    """
+    Fold BatchNorm, strip dropout / identity ops and use SiLU for swish, in place
+
+    Safe to run again on an optimized model (e.g. with explainable=False
+    before tracing).
+
+    Args:
+        net: Serving model (put in eval mode here)
+        explainable: Leave the GradCAM layer (get_feature_extractor) unfolded
+
+    Returns:
+        net
+    """
+    net.eval()
+    keep = set()
+    if explainable and hasattr(net, 'get_feature_extractor'):
+        keep.add(net.get_feature_extractor())
+
+    for module in list(net.modules()):
+        # Plain Sequentials run their children in order; subclasses with
+        # their own forward may address children by position or name
+        if isinstance(module, nn.Sequential) and type(module).forward is nn.Sequential.forward:
+            _optimize_sequential(module, keep)
+
+        for layer_name, bn_name in NAMED_CONV_BN:
+            layer, bn = getattr(module, layer_name, None), getattr(module, bn_name, None)
+            if layer is None or bn is None or layer in keep:
+                continue
+            fused = fuse_pair(layer, bn)
+            if fused is not None:
+                setattr(module, layer_name, fused)
+                setattr(module, bn_name, nn.Identity())
+
+        for name, child in list(module.named_children()):
+            if isinstance(child, DROPOUT_TYPES):
+                setattr(module, name, nn.Identity())
+
+        # EfficientNet's swish (x * sigmoid(x), or its memory-efficient
+        # autograd variant) is SiLU; the fused kernel is one pass
+        if hasattr(module, '_swish'):
+            module._swish = nn.SiLU()
+
+    return net
@@ -3,62 +3,104 @@ Model Deployment Script
 Deploys models to staging or production
 """
 
+import os
 import sys
 import argparse
 import shutil
 from pathlib import Path
 
-# Add parent to path
+# Add repository root and mlops to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
 sys.path.append(str(Path(__file__).parent.parent))
 
+from model_weights import file_sha256
 from registry.model_registry import ModelRegistry
+from serving_artifacts import artifact_key, copy_artifacts
 
+# Weights file the backend loads for each architecture (DEEPFAKE_SERVING_MODEL)
+WEIGHTS_FILES = {
+    'efficientnet': 'best_model.safetensors',
+    'student': 'student_model.safetensors',
+}
 
-def deploy_model(version, environment='staging'):
+
+def deploy_model(version, environment='staging', force=False):
     """
     Deploy model to specified environment
     
     Args:
         version: Model version to deploy
         environment: 'staging' or 'production'
+        force: Deploy to production even if over the latency budget
     """
     registry = ModelRegistry()
     
     # Get model
     model = registry.get_model(version)
-    model_path = Path(model['path']) / 'model.pth'
+    if 'weights_sha256' not in model:
+        # Registered before serving weights were exported
+        if not (Path(model['path']) / 'model.pth').exists():
+            print(f"❌ Model file not found: {Path(model['path']) / 'model.pth'}")
+            return False
+        model = registry.export_weights(version)
+    model_path = Path(model['path']) / model['weights_file']
     
-    if not model_path.exists():
-        print(f"❌ Model file not found: {model_path}")
+    if not model_path.exists() or file_sha256(model_path) != model['weights_sha256']:
+        print(f"❌ Weights missing or modified since registration: {model_path}")
         return False
     
     # Deployment target
     if environment == 'staging':
         target_dir = Path('weights/staging')
-        registry.promote_to_staging(version)
     elif environment == 'production':
         target_dir = Path('weights')
-        registry.promote_to_production(version)
+        violations = [] if force else registry.check_latency_budget(version)
+        if violations:
+            print(f"❌ Model {version} exceeds the latency budget: {'; '.join(violations)} (--force to deploy anyway)")
+            return False
     else:
         print(f"❌ Invalid environment: {environment}")
         return False
     
     # Create target directory
     target_dir.mkdir(parents=True, exist_ok=True)
-    target_path = target_dir / 'best_model.pth'
+    architecture = model.get('architecture', 'efficientnet')
+    target_path = target_dir / WEIGHTS_FILES[architecture]
+    
+    # Prebuilt engines for this torch version, built now if registration predates them;
+    # copied first so a server never sees new weights without their engines
+    if model.get('artifacts', {}).get('key') != artifact_key(model['weights_sha256']):
+        model = registry.build_artifacts(version)
+    copy_artifacts(registry.artifacts_dir, model['weights_sha256'], target_dir / 'artifacts')
+    
+    # Copy, verify, then swap in atomically so a running host never sees a partial file
+    tmp_path = target_path.with_suffix('.tmp')
+    shutil.copy(model_path, tmp_path)
+    if file_sha256(tmp_path) != model['weights_sha256']:
+        tmp_path.unlink()
+        print(f"❌ Copy of {model_path} failed verification")
+        return False
+    os.replace(tmp_path, target_path)
     
-    # Copy model
-    shutil.copy(model_path, target_path)
+    # Promote last: watching backends reload as soon as registry.json changes,
+    # so the weights and engines must already be in place
+    if environment == 'staging':
+        registry.promote_to_staging(version)
+    else:
+        registry.promote_to_production(version, force=True)  # budget checked above
     
     print(f"\n✅ Model {version} deployed to {environment}")
     print(f"   Source: {model_path}")
     print(f"   Target: {target_path}")
+    print(f"   Engines: {', '.join(model['artifacts']['engines']) or 'none'} ({model['artifacts']['key']})")
     print(f"   Metrics: {model['metrics']}")
     
-    # Update backend to use new model
+    # Running backends swap the new model in without a restart
     if environment == 'production':
-        print(f"\n🔄 Restart backend server to load new model:")
-        print(f"   python backend_server.py")
+        print(f"\n🔄 Backends with MODEL_RELOAD_INTERVAL set pick up {version} automatically; otherwise:")
+        print(f"   curl -X POST http://localhost:5000/admin/reload")
+        if architecture != 'efficientnet':
+            print(f"   (new processes: DEEPFAKE_SERVING_MODEL={architecture} python backend_server.py)")
     
     return True
 
@@ -66,7 +108,8 @@ def deploy_model(version, environment='staging'):
 def rollback(to_version):
     """Rollback to previous version"""
     print(f"\n🔄 Rolling back to {to_version}...")
-    return deploy_model(to_version, 'production')
+    # The previous version is known-good: its latency is not held to the budget
+    return deploy_model(to_version, 'production', force=True)
 
 
 if __name__ == '__main__':
@@ -74,10 +117,11 @@ if __name__ == '__main__':
     parser.add_argument('--version', type=str, required=True, help='Model version')
     parser.add_argument('--env', type=str, default='staging', choices=['staging', 'production'], help='Environment')
     parser.add_argument('--rollback', action='store_true', help='Rollback to version')
+    parser.add_argument('--force', action='store_true', help='Ignore the production latency budget')
     
     args = parser.parse_args()
     
     if args.rollback:
         rollback(args.version)
     else:
-        deploy_model(args.version, args.env)
+        deploy_model(args.version, args.env, args.force)
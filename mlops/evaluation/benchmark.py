@@ -0,0 +1,223 @@
+"""
+Serving Benchmark
+Standard CPU performance profile of a model version, recorded at registration
+
+Each run happens in a fresh Python process so load time and peak RSS are
+not skewed by whatever the calling process already holds. The child loads
+the weights the way the server does (prebuilt engine when one was built,
+see serving_artifacts.py), then measures:
+
+    load_time_ms         weights / engine load until the model is usable
+    latency_p50_ms       batch 1, after warmup (one face, as in /analyze)
+    latency_p99_ms       batch 1: median of the p99s of 5 rounds of 200 runs, so
+                         a single stall does not set the tail
+    throughput_per_s     images per second at batch 16 (batch_scan / forensics)
+    peak_rss_mb          peak resident memory of the benchmark process
+    rss_increase_mb      growth over the process right after imports
+
+Threads are pinned (1 by default) so profiles of different versions stay
+comparable; host details are stored with each profile. The child imports
+deepfake_models only, so no face detector or serving model is loaded next
+to the measured one.
+
+Usage:
+    python mlops/evaluation/benchmark.py mlops/registry/models/v1.0.0/model.safetensors \\
+        --architecture efficientnet --artifacts-dir mlops/registry/artifacts
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from pathlib import Path
+from datetime import datetime
+
+# Add repository root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+# Fields compared between versions: name -> True if higher is worse
+PROFILE_FIELDS = {
+    'latency_p50_ms': True,
+    'latency_p99_ms': True,
+    'throughput_per_s': False,
+    'load_time_ms': True,
+    'peak_rss_mb': True,
+}
+
+# Host details that must match for two profiles to be compared directly
+HOST_FIELDS = ('machine', 'cpu_count', 'threads', 'torch_version')
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (current RSS, or None, without resource)"""
+    try:
+        import resource  # POSIX only
+    except ImportError:
+        return current_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kB, macOS bytes
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def host_details(threads=1):
+    """Conditions a profile is measured under (HOST_FIELDS plus the processor name)"""
+    import torch
+
+    return {
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'threads': threads,
+        'torch_version': torch.__version__
+    }
+
+
+def profile_model(weights_path, architecture, engine='auto', artifacts_dir=None, sha256=None, threads=1,
+                  latency_runs=1000, latency_rounds=5, throughput_runs=5, batch_size=16):
+    """
+    Measure a weights file in this process (see run_benchmark for isolation)
+
+    Args:
+        weights_path: Serving weights (.safetensors)
+        architecture: Serving architecture
+        engine: Engine to load (see deepfake_models.load_engine)
+        artifacts_dir: Prebuilt engine cache (default: the server's)
+        sha256: Recorded sha256 of the weights, verified on load like the server does
+        threads: torch intra-op threads
+        latency_runs: Timed batch-1 passes
+        latency_rounds: Rounds the passes are split into; p99 is the median of their p99s
+        throughput_runs: Timed full-batch passes
+        batch_size: Throughput batch size
+
+    Returns:
+        Profile dict (fields listed in the module docstring plus host details)
+    """
+    import numpy as np
+    import torch
+
+    from deepfake_models import ARTIFACTS_DIR, load_engine, warmup_model
+
+    torch.set_num_threads(threads)
+    baseline_mb = current_rss_mb()
+    start = time.perf_counter()
+    net = load_engine(architecture, weights_path, engine, artifacts_dir or ARTIFACTS_DIR, expected_sha256=sha256)
+    load_time_ms = (time.perf_counter() - start) * 1000
+
+    warmup_model(net, (1, batch_size, 1))
+    timings = []
+    with torch.no_grad():
+        x = torch.randn(1, 3, 224, 224)
+        for _ in range(latency_runs):
+            start = time.perf_counter()
+            net(x)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        x = torch.randn(batch_size, 3, 224, 224)
+        start = time.perf_counter()
+        for _ in range(throughput_runs):
+            net(x)
+        throughput = batch_size * throughput_runs / (time.perf_counter() - start)
+
+    peak_mb = peak_rss_mb()
+    return dict({
+        'engine': getattr(net, 'engine', 'eager'),
+        'load_time_ms': load_time_ms,
+        'latency_p50_ms': float(np.percentile(timings, 50)),
+        'latency_p99_ms': float(np.median([np.percentile(round_timings, 99)
+                                           for round_timings in np.array_split(timings, latency_rounds)])),
+        'latency_runs': latency_runs,
+        'throughput_per_s': throughput,
+        'batch_size': batch_size,
+        'peak_rss_mb': peak_mb,
+        'rss_increase_mb': peak_mb - baseline_mb if None not in (peak_mb, baseline_mb) else None,
+        'timestamp': datetime.now().isoformat()
+    }, **host_details(threads))
+
+
+def run_benchmark(weights_path, architecture, engine='auto', artifacts_dir=None, sha256=None, threads=1,
+                  timeout=900):
+    """
+    Profile a weights file in a fresh Python process
+
+    Args: as profile_model, plus the timeout in seconds
+
+    Returns:
+        Profile dict
+
+    Raises:
+        RuntimeError: The benchmark process failed
+    """
+    command = [sys.executable, str(Path(__file__).resolve()), str(weights_path),
+               '--architecture', architecture, '--engine', engine, '--threads', str(threads), '--json']
+    if artifacts_dir is not None:
+        command += ['--artifacts-dir', str(artifacts_dir)]
+    if sha256 is not None:
+        command += ['--sha256', sha256]
+
+    result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark failed: {result.stderr.strip().splitlines()[-1:] or result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare_profiles(baseline, candidate):
+    """
+    Relative change of each profile field (positive = worse)
+
+    Returns:
+        Dict field -> {'baseline', 'candidate', 'change'}; empty if either
+        profile is missing
+    """
+    if not baseline or not candidate:
+        return {}
+    changes = {}
+    for field, higher_is_worse in PROFILE_FIELDS.items():
+        old, new = baseline.get(field), candidate.get(field)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        changes[field] = {'baseline': old, 'candidate': new, 'change': change if higher_is_worse else -change}
+    return changes
+
+
+def same_host(a, b):
+    """True if two profiles were measured under the same conditions"""
+    return all(a.get(field) == b.get(field) for field in HOST_FIELDS)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CPU benchmark of a serving weights file')
+    parser.add_argument('weights', type=str, help='Serving weights (.safetensors)')
+    parser.add_argument('--architecture', type=str, default='efficientnet', help='Serving architecture')
+    parser.add_argument('--engine', type=str, default='auto', help='Engine (see deepfake_models.load_engine)')
+    parser.add_argument('--artifacts-dir', type=str, default=None, help='Prebuilt engine cache')
+    parser.add_argument('--sha256', type=str, default=None, help='Expected sha256 of the weights')
+    parser.add_argument('--threads', type=int, default=1, help='torch intra-op threads')
+    parser.add_argument('--json', action='store_true', help='Print the profile as one JSON line')
+
+    args = parser.parse_args()
+
+    profile = profile_model(args.weights, args.architecture, args.engine, args.artifacts_dir, args.sha256,
+                            args.threads)
+
+    if args.json:
+        print(json.dumps(profile))
+    else:
+        print(f"\n⏱️  {args.weights} ({profile['engine']}, {profile['threads']} thread(s))")
+        print(f"   Load: {profile['load_time_ms']:.0f} ms")
+        print(f"   Latency (batch 1): p50 {profile['latency_p50_ms']:.1f} ms, p99 {profile['latency_p99_ms']:.1f} ms")
+        print(f"   Throughput (batch {profile['batch_size']}): {profile['throughput_per_s']:.1f} images/s")
+        if profile['peak_rss_mb'] is not None:
+            print(f"   Peak RSS: {profile['peak_rss_mb']:.0f} MB")
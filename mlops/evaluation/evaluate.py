@@ -0,0 +1,240 @@
+"""
+Model Evaluation
+Evaluates the serving model on a labelled image folder (Real/ and Fake/)
+"""
+
+import sys
+import copy
+import json
+import time
+import argparse
+from functools import partial
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+from sklearn.metrics import roc_auc_score
+
+# Add repository root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from deepfake_detection import DeepfakeDetector, model, cpu_bf16_supported, FAKE_THRESHOLD, NORM_MEAN, NORM_STD
+from face_alignment import uint8_to_input
+from face_detection import detect_bounding_box
+from mlops.preprocessing.face_shards import FaceShardStore
+
+# Folder name (case-insensitive) -> label
+LABELS = {'real': 0, 'fake': 1}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+
+def list_labelled_images(test_dir):
+    """List (path, label) pairs from test_dir/{Real,Fake}/"""
+    samples = []
+    for class_dir in sorted(Path(test_dir).iterdir()):
+        label = LABELS.get(class_dir.name.lower())
+        if label is None or not class_dir.is_dir():
+            continue
+        for path in sorted(class_dir.iterdir()):
+            if path.suffix.lower() in IMAGE_EXTENSIONS:
+                samples.append((path, label))
+    return samples
+
+
+def load_face_tensors(test_dir, detector):
+    """
+    Detect, align and normalize the first face of every test image
+
+    Returns:
+        tuple: (inputs tensor (N, 3, 224, 224), labels array, number of skipped images)
+    """
+    inputs, labels, skipped = [], [], 0
+    for path, label in list_labelled_images(test_dir):
+        frame = cv2.imread(str(path))
+        faces = detect_bounding_box(frame) if frame is not None else []
+        if len(faces) == 0:
+            skipped += 1
+            continue
+
+        x, y, w, h = faces[0]
+        face_region = detector.preprocess_face_quality(frame[y:y + h, x:x + w])
+        input_face = detector._prepare_face_tensor(face_region)
+        if input_face is None:
+            skipped += 1
+            continue
+
+        inputs.append(input_face)
+        labels.append(label)
+
+    if not inputs:
+        return torch.empty(0, 3, 224, 224), np.array([]), skipped
+    return torch.cat(inputs), np.array(labels), skipped
+
+
+def tensor_batches(inputs, batch_size):
+    """Consecutive batches of an inputs tensor"""
+    for i in range(0, len(inputs), batch_size):
+        yield inputs[i:i + batch_size]
+
+
+def shard_batches(store, batch_size):
+    """
+    Normalized batches of pre-aligned crops from a face-crop shard store
+
+    Crops are zero-copy views of the memory-mapped shards and only one
+    batch is normalized to float at a time, so memory stays at one batch
+    however large the test set is.
+    """
+    for crops, _ in store.iter_batches(batch_size):
+        yield uint8_to_input(crops, NORM_MEAN, NORM_STD)
+
+
+def load_inputs(test_dir=None, shard_dir=None):
+    """
+    Aligned inputs from a shard directory if given, else from a labelled image folder
+
+    Returns:
+        tuple: (batches(batch_size) -> iterator of input tensors, labels array, number of skipped images)
+    """
+    if shard_dir:
+        store = FaceShardStore(shard_dir)
+        return partial(shard_batches, store), store.labels.copy(), 0
+    inputs, labels, skipped = load_face_tensors(test_dir, DeepfakeDetector(use_tta=False))
+    return partial(tensor_batches, inputs), labels, skipped
+
+
+def score(net, batches):
+    """
+    Run the model over batches of pre-aligned inputs
+
+    Returns:
+        tuple: (fake probabilities, mean model latency per image in ms)
+    """
+    probs = []
+    count, elapsed = 0, 0.0
+    with torch.no_grad():
+        for inputs in batches:
+            start = time.perf_counter()
+            logits = net(inputs).squeeze(1)
+            probs.append(torch.sigmoid(logits).float().cpu().numpy())
+            elapsed += time.perf_counter() - start
+            count += len(inputs)
+    if not probs:
+        return np.array([]), 0.0
+    return np.concatenate(probs), elapsed * 1000 / count
+
+
+def classification_metrics(labels, probs, threshold=FAKE_THRESHOLD):
+    """Accuracy and ROC AUC for binary fake-probability scores"""
+    predictions = (probs >= threshold).astype(int)
+    metrics = {'accuracy': float((predictions == labels).mean())}
+    if len(np.unique(labels)) == 2:
+        metrics['auc'] = float(roc_auc_score(labels, probs))
+    return metrics
+
+
+# Activation dtype each precision must actually run in
+PRECISION_DTYPES = {'fp32': torch.float32, 'bf16': torch.bfloat16}
+
+
+def conv_output_dtype(net, x):
+    """dtype of the first convolution's output on x (what the model computes in)"""
+    conv = next(m for m in net.modules() if isinstance(m, torch.nn.Conv2d))
+    seen = []
+    handle = conv.register_forward_hook(lambda module, inputs, output: seen.append(output.dtype))
+    try:
+        with torch.no_grad():
+            net(x)
+    finally:
+        handle.remove()
+    return seen[0]
+
+
+def compare_precision(test_dir, batch_size=32, threshold=FAKE_THRESHOLD, shard_dir=None):
+    """
+    Compare fp32 against bf16/channels_last inference on the same aligned faces
+
+    Faces come from shard_dir (a face-crop shard directory) when given,
+    otherwise they are detected and aligned from test_dir.
+
+    Returns:
+        Dict with per-precision metrics and the bf16 - fp32 deltas
+    """
+    batches, labels, skipped = load_inputs(test_dir, shard_dir)
+    print(f"Aligned {len(labels)} faces ({skipped} images skipped)")
+    if len(labels) == 0:
+        raise ValueError(f"No faces found in {shard_dir or test_dir}")
+
+    native_bf16 = cpu_bf16_supported()
+    results = {'samples': len(labels), 'skipped': skipped, 'native_bf16': native_bf16}
+    first = next(batches(batch_size))
+
+    # Prebuilt engines (SERVING_ENGINE=auto) are fp32 only: sweep the eager model
+    eager = getattr(model, 'eager', model)
+    for precision in ('fp32', 'bf16'):
+        net = copy.deepcopy(eager).eval()
+        net.configure_precision(precision, force=True)
+        dtype = conv_output_dtype(net, first[:1])
+        if dtype != PRECISION_DTYPES[precision]:
+            raise RuntimeError(f"{precision} run computes in {dtype}, expected {PRECISION_DTYPES[precision]}")
+        score(net, [first])  # warmup
+        probs, latency_ms = score(net, batches(batch_size))
+        results[precision] = classification_metrics(labels, probs, threshold)
+        results[precision]['latency_ms_per_image'] = latency_ms
+        results[precision]['_probs'] = probs
+
+    fp32_probs = results['fp32'].pop('_probs')
+    bf16_probs = results['bf16'].pop('_probs')
+    results['delta'] = {
+        metric: results['bf16'][metric] - results['fp32'][metric]
+        for metric in results['fp32'] if metric in results['bf16']
+    }
+    results['max_abs_prob_diff'] = float(np.abs(bf16_probs - fp32_probs).max())
+    results['prediction_flips'] = int(((bf16_probs >= threshold) != (fp32_probs >= threshold)).sum())
+    return results
+
+
+def print_precision_report(results):
+    print("\n" + "=" * 60)
+    print("📊 FP32 vs BF16 (channels_last) INFERENCE")
+    print("=" * 60)
+    print(f"  Samples: {results['samples']} ({results['skipped']} skipped)")
+    print(f"  Native bf16 on this host: {results['native_bf16']}")
+    for precision in ('fp32', 'bf16'):
+        r = results[precision]
+        auc = f", AUC {r['auc']:.4f}" if 'auc' in r else ''
+        print(f"  {precision}: accuracy {r['accuracy']:.2%}{auc}, {r['latency_ms_per_image']:.2f} ms/image")
+    print(f"\n  Accuracy delta (bf16 - fp32): {results['delta']['accuracy'] * 100:+.2f} pts")
+    if 'auc' in results['delta']:
+        print(f"  AUC delta (bf16 - fp32): {results['delta']['auc']:+.4f}")
+    print(f"  Max |Δ probability|: {results['max_abs_prob_diff']:.4f}")
+    print(f"  Prediction flips: {results['prediction_flips']}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluate deepfake detection model')
+    parser.add_argument('--test-dir', type=str, default='dataset/Dataset/Test', help='Folder with Real/ and Fake/ images')
+    parser.add_argument('--shards', type=str, help='Face-crop shard directory (skips detection and alignment)')
+    parser.add_argument('--compare-precision', action='store_true', help='Report fp32 vs bf16 accuracy delta')
+    parser.add_argument('--batch-size', type=int, default=32, help='Inference batch size')
+    parser.add_argument('--threshold', type=float, default=FAKE_THRESHOLD,
+                        help=f'Fake probability threshold (default: serving threshold {FAKE_THRESHOLD})')
+    parser.add_argument('--output', type=str, help='Write results as JSON')
+
+    args = parser.parse_args()
+
+    if args.compare_precision:
+        results = compare_precision(args.test_dir, args.batch_size, args.threshold, args.shards)
+        print_precision_report(results)
+    else:
+        batches, labels, skipped = load_inputs(args.test_dir, args.shards)
+        probs, latency_ms = score(model, batches(args.batch_size))
+        results = classification_metrics(labels, probs, args.threshold)
+        results.update({'samples': len(labels), 'skipped': skipped, 'latency_ms_per_image': latency_ms})
+        print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
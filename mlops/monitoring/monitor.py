@@ -1,26 +1,198 @@
 """
 Production Monitoring for MLOps
 Tracks model performance, predictions, and alerts
+
+Predictions are stored in hourly segments under logs/predictions/ with a
+time index (see prediction_log.py), so recent-window queries and reports
+only read the hours they cover. Prediction timestamps are UTC.
+
+With async_logging=True, log_prediction only updates the in-memory metrics
+and enqueues the record; a background writer thread appends queued
+predictions in batches and snapshots metrics.json periodically.
+
+Alongside the lifetime counters, every prediction feeds a lifetime latency
+sketch and 1m/5m/1h sliding windows (sketches.py), all in O(1); alerts
+are raised on windowed error rate and p95/p99 latency so a fresh
+regression is not averaged away by history. The windows are saved in
+metrics.json with the sketch, so the --report CLI sees what the server
+saw; in async mode the writer thread also checks alerts every
+alert_interval seconds and prints the ones that start firing.
+
+For drift, fake_probability, face size and frame resolution go into
+fixed-bin 1h/24h sliding histograms, compared with PSI and KL divergence
+against reference histograms stored with the model in the ModelRegistry.
+The histograms are saved in metrics.json like the windows, and the alert
+check on the writer thread re-reads the reference whenever registry.json
+changes, so a reference stored after startup is used without a restart.
 """
 
+import os
+import sys
 import json
+import time
+import queue
+import atexit
+import argparse
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 from collections import defaultdict
 
+# Add mlops to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from monitoring.prediction_log import PredictionLogStore, utc_now
+from registry.model_registry import ModelRegistry
+from monitoring.sketches import (DDSketch, FixedHistogram, SlidingHistogram, SlidingWindow,
+                                 kl_divergence, population_stability_index)
+
+# Sliding windows tracked per prediction: name -> seconds
+WINDOWS = {'1m': 60, '5m': 300, '1h': 3600}
+
+# Drift features -> fixed bin edges (out-of-range values fall in the end bins)
+DRIFT_FEATURES = {
+    'fake_probability': [i / 20 for i in range(21)],
+    'face_size': [0, 32, 45, 64, 90, 128, 181, 256, 362, 512, 724, 1024],           # sqrt(w * h) px
+    'frame_resolution': [0, 240, 360, 480, 576, 720, 900, 1080, 1440, 2160, 4320]   # short side px
+}
+
+# Sliding windows for drift histograms: name -> seconds
+DRIFT_WINDOWS = {'1h': 3600, '24h': 86400}
+
+DEFAULT_ALERT_THRESHOLDS = {
+    'error_rate': 0.01,        # > 1% errors
+    'latency_p95_ms': 500.0,
+    'latency_p99_ms': 1000.0,
+    'min_window_count': 20,    # ignore windows with fewer predictions
+    'psi': 0.2,                # significant distribution shift
+    'min_drift_count': 200     # ignore drift windows with fewer samples
+}
+
+
+def drift_features(prediction_data):
+    """Drift feature values present in a logged prediction"""
+    features = {}
+    if prediction_data.get('fake_probability') is not None:
+        features['fake_probability'] = prediction_data['fake_probability']
+    if prediction_data.get('face_size') is not None:
+        features['face_size'] = prediction_data['face_size']
+    if prediction_data.get('frame_width') and prediction_data.get('frame_height'):
+        features['frame_resolution'] = min(prediction_data['frame_width'], prediction_data['frame_height'])
+    return features
+
+
+def build_reference_histograms(records):
+    """
+    Reference histograms of the drift features over a set of predictions
+
+    Args:
+        records: Iterable of prediction dicts (as logged)
+
+    Returns:
+        Dict of feature -> FixedHistogram.to_dict()
+    """
+    histograms = {name: FixedHistogram(edges) for name, edges in DRIFT_FEATURES.items()}
+    for record in records:
+        for name, value in drift_features(record).items():
+            histograms[name].add(value)
+    return {name: histogram.to_dict() for name, histogram in histograms.items() if histogram.total}
+
+
+class _FlushRequest:
+    """Queue marker: the writer flushes everything before it, then sets done"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
 
 class ProductionMonitor:
     """Monitor model performance in production"""
     
-    def __init__(self, log_dir='mlops/monitoring/logs'):
+    def __init__(self, log_dir='mlops/monitoring/logs', async_logging=False, flush_interval=1.0,
+                 max_buffer=512, metrics_interval=5.0, max_log_bytes=64 * 1024 * 1024,
+                 columnar=False, queue_size=100000, alert_thresholds=None, reference_histograms=None,
+                 alert_interval=60.0):
+        """
+        Args:
+            log_dir: Directory for predictions, metrics and alerts
+            async_logging: Queue predictions for a background writer thread
+                instead of writing them on the caller's thread
+            flush_interval: Max seconds a queued prediction waits before it is written
+            max_buffer: Write as soon as this many predictions are pending
+            metrics_interval: Seconds between metrics.json snapshots (async mode)
+            max_log_bytes: Split an hourly segment once it reaches this size (None = never)
+            columnar: Compact finished hours into columnar .npz segments
+            queue_size: Max queued predictions; further ones are dropped and counted
+            alert_thresholds: Overrides for DEFAULT_ALERT_THRESHOLDS
+            reference_histograms: Feature -> histogram dict to measure drift
+                against (see ModelRegistry.get_reference_histograms)
+            alert_interval: Seconds between alert checks on the writer thread
+                (async mode; None = only when check_alerts is called)
+        """
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
         
-        self.predictions_file = self.log_dir / 'predictions.jsonl'
+        self.predictions_dir = self.log_dir / 'predictions'
         self.metrics_file = self.log_dir / 'metrics.json'
         self.alerts_file = self.log_dir / 'alerts.json'
         
         self.metrics = self._load_metrics()
+        self.latency_sketch = DDSketch.from_dict(self.metrics.pop('latency_sketch')) \
+            if 'latency_sketch' in self.metrics else DDSketch()
+        saved_windows = self.metrics.pop('windows', {})
+        self.windows = {
+            name: SlidingWindow.from_dict(saved_windows[name])
+            if saved_windows.get(name, {}).get('seconds') == seconds else SlidingWindow(seconds)
+            for name, seconds in WINDOWS.items()
+        }
+        saved_drift = self.metrics.pop('drift_windows', {})
+        self.drift_windows = {
+            name: {feature: self._restore_histogram(saved_drift.get(name, {}).get(feature), edges, seconds)
+                   for feature, edges in DRIFT_FEATURES.items()}
+            for name, seconds in DRIFT_WINDOWS.items()
+        }
+        self._reference_source = None
+        self.set_reference_histograms(reference_histograms)
+        self.alert_thresholds = {**DEFAULT_ALERT_THRESHOLDS, **(alert_thresholds or {})}
+        self.async_logging = async_logging
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.metrics_interval = metrics_interval
+        self.alert_interval = alert_interval
+        self.alerts = []
+        self.store = PredictionLogStore(self.predictions_dir, max_log_bytes, columnar)
+        self._import_flat_logs()
+        
+        self.logging_stats = {'queued': 0, 'written': 0, 'dropped': 0, 'flushes': 0}
+        # Guards logging_stats and the closed check before each enqueue
+        self._stats_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._writer = None
+        self._closed = False
+        
+        if async_logging:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._writer = threading.Thread(target=self._writer_loop, name='prediction-log-writer', daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+    
+    @staticmethod
+    def _restore_histogram(saved, edges, seconds):
+        """Sliding histogram from metrics.json, or an empty one if the layout changed"""
+        if saved and saved['seconds'] == seconds and saved['edges'] == [float(e) for e in edges]:
+            return SlidingHistogram.from_dict(saved)
+        return SlidingHistogram(edges, seconds)
+    
+    def _import_flat_logs(self):
+        """Move predictions*.jsonl from the old single-file layout into segments"""
+        for legacy in sorted(self.log_dir.glob('predictions*.jsonl')):
+            # The single-file log was written in local time
+            imported = self.store.import_jsonl(legacy, local_time=True)
+            os.replace(legacy, legacy.with_suffix('.jsonl.imported'))
+            print(f"📦 Imported {imported} predictions from {legacy.name} into {self.predictions_dir}")
     
     def _load_metrics(self):
         """Load monitoring metrics"""
@@ -39,9 +211,238 @@ class ProductionMonitor:
     
     def _save_metrics(self):
         """Save monitoring metrics"""
-        self.metrics['last_updated'] = datetime.now().isoformat()
-        with open(self.metrics_file, 'w') as f:
-            json.dump(self.metrics, f, indent=2)
+        with self._metrics_lock:
+            self.metrics['last_updated'] = datetime.now().isoformat()
+            for q in (50, 95, 99):
+                self.metrics[f'latency_p{q}_ms'] = self.latency_sketch.quantile(q / 100)
+            snapshot = dict(self.metrics)
+            # Persisted so lifetime quantiles survive restarts
+            snapshot['latency_sketch'] = self.latency_sketch.to_dict()
+            # ... and so a report from another process can evaluate the windows
+            snapshot['windows'] = {name: window.to_dict() for name, window in self.windows.items()}
+            snapshot['drift_windows'] = {
+                name: {feature: histogram.to_dict() for feature, histogram in histograms.items()}
+                for name, histograms in self.drift_windows.items()
+            }
+        # Write-then-rename so readers never see a half-written file
+        tmp_path = self.metrics_file.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, self.metrics_file)
+    
+    def _update_metrics(self, prediction_data):
+        now = time.time()
+        latency_ms = prediction_data.get('latency_ms')
+        error = 'error' in prediction_data
+        fake = not error and prediction_data.get('prediction') == 'fake'
+        with self._metrics_lock:
+            for window in self.windows.values():
+                window.add(now, latency_ms, error, fake)
+            if latency_ms is not None:
+                self.latency_sketch.add(latency_ms)
+            for feature, value in drift_features(prediction_data).items():
+                for histograms in self.drift_windows.values():
+                    histograms[feature].add(now, value)
+            self.metrics['total_predictions'] += 1
+            
+            if 'error' in prediction_data:
+                self.metrics['errors'] += 1
+            else:
+                if prediction_data['prediction'] == 'fake':
+                    self.metrics['fake_count'] += 1
+                else:
+                    self.metrics['real_count'] += 1
+                
+                # Update averages
+                total = self.metrics['total_predictions']
+                self.metrics['avg_confidence'] = (
+                    (self.metrics['avg_confidence'] * (total - 1) + prediction_data['confidence']) / total
+                )
+                self.metrics['avg_latency_ms'] = (
+                    (self.metrics['avg_latency_ms'] * (total - 1) + prediction_data['latency_ms']) / total
+                )
+    
+    def _write_records(self, records):
+        """Append records to their hourly segments"""
+        self.store.append(records)
+        with self._stats_lock:
+            self.logging_stats['written'] += len(records)
+            self.logging_stats['flushes'] += 1
+    
+    def _writer_loop(self):
+        """Background writer: batch queued predictions and snapshot metrics"""
+        pending = []
+        last_flush = last_snapshot = last_alert_check = time.time()
+        metrics_dirty = False
+        
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.time() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            
+            # Drain whatever else is already queued without blocking
+            items = [] if item is None else [item]
+            while len(pending) + len(items) < self.max_buffer:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            flush_requests = []
+            stop = False
+            for entry in items:
+                if entry is _STOP:
+                    stop = True
+                elif isinstance(entry, _FlushRequest):
+                    flush_requests.append(entry)
+                else:
+                    pending.append(entry)
+            
+            now = time.time()
+            if pending and (stop or flush_requests or len(pending) >= self.max_buffer
+                            or now - last_flush >= self.flush_interval):
+                try:
+                    self._write_records(pending)
+                except OSError as e:
+                    print(f"⚠️  Prediction log write failed: {e}")
+                pending = []
+                metrics_dirty = True
+            if not pending:
+                last_flush = now
+            
+            if metrics_dirty and (stop or flush_requests or now - last_snapshot >= self.metrics_interval):
+                try:
+                    self._save_metrics()
+                except OSError as e:
+                    print(f"⚠️  Metrics snapshot failed: {e}")
+                last_snapshot = now
+                metrics_dirty = False
+            
+            if self.alert_interval is not None and now - last_alert_check >= self.alert_interval:
+                self._evaluate_alerts()
+                last_alert_check = now
+            
+            for request in flush_requests:
+                request.done.set()
+            if stop:
+                return
+    
+    def _evaluate_alerts(self):
+        """Check alerts from the writer thread and print the ones that just started firing"""
+        firing = {(alert['type'], alert.get('feature')) for alert in self.alerts}
+        try:
+            self._refresh_reference()
+            alerts = self.check_alerts()
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Alert check failed: {e}")
+            return
+        for alert in alerts:
+            if (alert['type'], alert.get('feature')) not in firing:
+                print(f"🚨 [{alert['severity'].upper()}] {alert['message']}")
+    
+    def flush(self, timeout=None):
+        """
+        Write every queued prediction and snapshot metrics
+        
+        Returns:
+            True if the writer finished within timeout
+        """
+        if not self.async_logging:
+            return True
+        if self._closed:
+            return True
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+    
+    def close(self, timeout=10):
+        """Flush and stop the background writer (also registered with atexit)"""
+        with self._stats_lock:
+            if self._closed:
+                return
+            # No record is queued after this, so _STOP is the last item
+            self._closed = True
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+            atexit.unregister(self.close)
+        self.store.close()
+    
+    def get_window_stats(self, now=None):
+        """Count, error/fake rate, throughput and latency p50/p95/p99 for each sliding window"""
+        now = time.time() if now is None else now
+        with self._metrics_lock:
+            return {name: window.snapshot(now) for name, window in self.windows.items()}
+    
+    def set_reference_histograms(self, reference_histograms):
+        """Replace the drift reference (feature -> {'edges', 'counts'}); None disables drift checks"""
+        self.reference_histograms = {
+            feature: FixedHistogram.from_dict(histogram)
+            for feature, histogram in (reference_histograms or {}).items()
+            if feature in DRIFT_FEATURES and histogram['edges'] == [float(e) for e in DRIFT_FEATURES[feature]]
+        }
+    
+    def load_reference_from_registry(self, registry_dir='mlops/registry', version=None):
+        """
+        Use the reference histograms stored with a model (default: production)
+        
+        Returns:
+            True if a reference was loaded
+        """
+        registry = ModelRegistry(registry_dir)
+        mtime = registry.metadata_file.stat().st_mtime if registry.metadata_file.exists() else None
+        try:
+            reference = registry.get_reference_histograms(version)
+        except ValueError:
+            reference = None
+        self.set_reference_histograms(reference)
+        self._reference_source = (registry_dir, version, mtime)
+        return bool(self.reference_histograms)
+    
+    def _refresh_reference(self):
+        """Reload the drift reference if registry.json changed since it was read"""
+        if self._reference_source is None:
+            return
+        registry_dir, version, mtime = self._reference_source
+        metadata_file = Path(registry_dir) / 'registry.json'
+        if metadata_file.exists() and metadata_file.stat().st_mtime != mtime:
+            self.load_reference_from_registry(registry_dir, version)
+    
+    def get_drift(self, now=None):
+        """
+        PSI and KL divergence of each drift window against the reference
+        
+        Returns:
+            Dict window -> feature -> {'count', 'psi', 'kl'} (psi/kl None
+            when there is no reference or no data)
+        """
+        now = time.time() if now is None else now
+        with self._metrics_lock:
+            snapshots = {name: {feature: histogram.snapshot(now) for feature, histogram in histograms.items()}
+                         for name, histograms in self.drift_windows.items()}
+        
+        drift = {}
+        for name, histograms in snapshots.items():
+            drift[name] = {}
+            for feature, current in histograms.items():
+                reference = self.reference_histograms.get(feature)
+                scored = reference is not None and current.total > 0
+                drift[name][feature] = {
+                    'count': current.total,
+                    'psi': population_stability_index(reference, current) if scored else None,
+                    'kl': kl_divergence(reference, current) if scored else None
+                }
+        return drift
+    
+    def get_logging_stats(self):
+        """Counters of the prediction log writer (queued/written/dropped/flushes) and its segments"""
+        with self._stats_lock:
+            stats = dict(self.logging_stats)
+        stats.update(self.store.stats())
+        stats['pending'] = self._queue.qsize() if self.async_logging else 0
+        return stats
     
     def log_prediction(self, prediction_data):
         """
@@ -54,33 +455,33 @@ class ProductionMonitor:
                 - latency_ms: float
                 - model_version: str
                 - error: str (optional)
+        
+        In async mode this never touches the disk: serialization and writes
+        happen on the writer thread. If the queue is full, or the monitor is
+        closed and nothing drains it, the record is dropped (and counted)
+        rather than blocking the caller.
         """
-        prediction_data['timestamp'] = datetime.now().isoformat()
+        prediction_data['timestamp'] = utc_now().isoformat()
+        
+        if self.async_logging:
+            self._update_metrics(prediction_data)
+            with self._stats_lock:
+                if self._closed:
+                    self.logging_stats['dropped'] += 1
+                    return
+                try:
+                    # Shallow copy so later caller-side edits don't leak into the log
+                    self._queue.put_nowait(dict(prediction_data))
+                    self.logging_stats['queued'] += 1
+                except queue.Full:
+                    self.logging_stats['dropped'] += 1
+            return
         
         # Append to log
-        with open(self.predictions_file, 'a') as f:
-            f.write(json.dumps(prediction_data) + '\n')
+        self._write_records([dict(prediction_data)])
         
         # Update metrics
-        self.metrics['total_predictions'] += 1
-        
-        if 'error' in prediction_data:
-            self.metrics['errors'] += 1
-        else:
-            if prediction_data['prediction'] == 'fake':
-                self.metrics['fake_count'] += 1
-            else:
-                self.metrics['real_count'] += 1
-            
-            # Update averages
-            total = self.metrics['total_predictions']
-            self.metrics['avg_confidence'] = (
-                (self.metrics['avg_confidence'] * (total - 1) + prediction_data['confidence']) / total
-            )
-            self.metrics['avg_latency_ms'] = (
-                (self.metrics['avg_latency_ms'] * (total - 1) + prediction_data['latency_ms']) / total
-            )
-        
+        self._update_metrics(prediction_data)
         self._save_metrics()
     
     def get_metrics(self):
@@ -88,48 +489,65 @@ class ProductionMonitor:
         return self.metrics
     
     def get_recent_predictions(self, hours=24):
-        """Get predictions from last N hours"""
-        cutoff = datetime.now() - timedelta(hours=hours)
-        predictions = []
-        
-        if self.predictions_file.exists():
-            with open(self.predictions_file, 'r') as f:
-                for line in f:
-                    pred = json.loads(line)
-                    pred_time = datetime.fromisoformat(pred['timestamp'])
-                    if pred_time >= cutoff:
-                        predictions.append(pred)
-        
-        return predictions
+        """Get predictions from last N hours (reads only the segments in range)"""
+        cutoff = utc_now() - timedelta(hours=hours)
+        return self.store.read_records(start=cutoff)
     
     def check_alerts(self):
-        """Check for alert conditions"""
+        """
+        Check for alert conditions on the sliding windows
+        
+        Each condition is checked from the shortest window up and reported
+        once, for the first window that breaches it. The result replaces
+        alerts.json and self.alerts.
+        """
         alerts = []
+        thresholds = self.alert_thresholds
+        windows = self.get_window_stats()
+        checks = [
+            ('high_error_rate', 'error_rate', 'Error rate', lambda v: f"{v*100:.2f}%"),
+            ('high_latency_p95', 'latency_p95_ms', 'p95 latency', lambda v: f"{v:.2f}ms"),
+            ('high_latency_p99', 'latency_p99_ms', 'p99 latency', lambda v: f"{v:.2f}ms"),
+        ]
         
-        # Check error rate
-        if self.metrics['total_predictions'] > 0:
-            error_rate = self.metrics['errors'] / self.metrics['total_predictions']
-            if error_rate > 0.01:  # > 1%
+        for alert_type, key, label, fmt in checks:
+            for name, stats in windows.items():
+                value = stats[key]
+                if stats['count'] < thresholds['min_window_count'] or value is None or value <= thresholds[key]:
+                    continue
                 alerts.append({
-                    'type': 'high_error_rate',
+                    'type': alert_type,
                     'severity': 'warning',
-                    'message': f"Error rate: {error_rate*100:.2f}%",
+                    'window': name,
+                    'message': f"{label} over last {name}: {fmt(value)} (threshold {fmt(thresholds[key])}, "
+                               f"{stats['count']} predictions)",
                     'timestamp': datetime.now().isoformat()
                 })
+                break
         
-        # Check latency
-        if self.metrics['avg_latency_ms'] > 500:
-            alerts.append({
-                'type': 'high_latency',
-                'severity': 'warning',
-                'message': f"Average latency: {self.metrics['avg_latency_ms']:.2f}ms",
-                'timestamp': datetime.now().isoformat()
-            })
+        # Drift: PSI of each feature, shortest window first
+        drift = self.get_drift()
+        for feature in DRIFT_FEATURES:
+            for name, features in drift.items():
+                stats = features[feature]
+                if stats['psi'] is None or stats['count'] < thresholds['min_drift_count'] \
+                        or stats['psi'] <= thresholds['psi']:
+                    continue
+                alerts.append({
+                    'type': 'distribution_drift',
+                    'severity': 'warning',
+                    'window': name,
+                    'feature': feature,
+                    'message': f"{feature} drift over last {name}: PSI {stats['psi']:.3f}, "
+                               f"KL {stats['kl']:.3f} (threshold {thresholds['psi']}, {stats['count']} samples)",
+                    'timestamp': datetime.now().isoformat()
+                })
+                break
         
-        # Save alerts
-        if alerts:
-            with open(self.alerts_file, 'w') as f:
-                json.dump(alerts, f, indent=2)
+        # Save alerts (an empty list once they clear)
+        self.alerts = alerts
+        with open(self.alerts_file, 'w') as f:
+            json.dump(alerts, f, indent=2)
         
         return alerts
     
@@ -145,18 +563,40 @@ class ProductionMonitor:
         print(f"  Real Detected: {self.metrics['real_count']}")
         print(f"  Average Confidence: {self.metrics['avg_confidence']:.2%}")
         print(f"  Average Latency: {self.metrics['avg_latency_ms']:.2f}ms")
+        if self.latency_sketch.count:
+            print(f"  Latency p50/p95/p99: {self.latency_sketch.quantile(0.5):.2f} / "
+                  f"{self.latency_sketch.quantile(0.95):.2f} / {self.latency_sketch.quantile(0.99):.2f}ms")
         print(f"  Errors: {self.metrics['errors']}")
         
-        # Recent predictions
-        recent = self.get_recent_predictions(hours=24)
+        # Recent predictions: only the prediction field of the last 24 hourly segments
+        recent = self.store.read_columns(['prediction'], start=utc_now() - timedelta(hours=24))['prediction']
         print(f"\n📊 Last 24 Hours:")
         print(f"  Predictions: {len(recent)}")
         
-        if recent:
-            fake_24h = sum(1 for p in recent if p.get('prediction') == 'fake')
+        if len(recent):
+            fake_24h = int((recent == 'fake').sum())
             print(f"  Fake: {fake_24h} ({fake_24h/len(recent)*100:.1f}%)")
             print(f"  Real: {len(recent)-fake_24h} ({(len(recent)-fake_24h)/len(recent)*100:.1f}%)")
         
+        # Sliding windows (as of the last metrics.json snapshot when another process logs)
+        windows = self.get_window_stats()
+        if any(stats['count'] for stats in windows.values()):
+            print(f"\n⏱️  Sliding Windows:")
+            for name, stats in windows.items():
+                if stats['count']:
+                    print(f"  {name}: {stats['count']} predictions ({stats['rate_per_s']:.2f}/s), "
+                          f"errors {stats['error_rate']:.2%}, p95 {stats['latency_p95_ms']:.2f}ms, "
+                          f"p99 {stats['latency_p99_ms']:.2f}ms")
+        
+        # Drift against the model's reference histograms
+        drift = self.get_drift()
+        scored = [(name, feature, stats) for name, features in drift.items()
+                  for feature, stats in features.items() if stats['psi'] is not None]
+        if scored:
+            print(f"\n📉 Distribution Drift (PSI / KL):")
+            for name, feature, stats in scored:
+                print(f"  {name} {feature}: {stats['psi']:.3f} / {stats['kl']:.3f} ({stats['count']} samples)")
+        
         # Alerts
         alerts = self.check_alerts()
         if alerts:
@@ -170,5 +610,22 @@ class ProductionMonitor:
 
 
 if __name__ == '__main__':
-    monitor = ProductionMonitor()
+    parser = argparse.ArgumentParser(description='Production monitoring report')
+    parser.add_argument('--log-dir', type=str, default='mlops/monitoring/logs', help='Monitoring log directory')
+    parser.add_argument('--compact', action='store_true', help='Compact finished hourly segments to columnar .npz (while no server writes to log-dir)')
+    parser.add_argument('--set-reference', type=str, metavar='VERSION',
+                        help='Store drift reference histograms for VERSION from recent logged predictions')
+    parser.add_argument('--reference-hours', type=float, default=24, help='Hours of predictions for --set-reference')
+    parser.add_argument('--registry-dir', type=str, default='mlops/registry', help='Model registry directory')
+    
+    args = parser.parse_args()
+    
+    monitor = ProductionMonitor(args.log_dir)
+    if args.compact:
+        print(f"🗜️  Compacted {monitor.store.compact()} segments")
+    if args.set_reference:
+        records = monitor.get_recent_predictions(hours=args.reference_hours)
+        ModelRegistry(args.registry_dir).set_reference_histograms(
+            args.set_reference, build_reference_histograms(records))
+    monitor.load_reference_from_registry(args.registry_dir)
     monitor.generate_report()
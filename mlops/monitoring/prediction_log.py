@@ -0,0 +1,405 @@
+"""
+Segmented Prediction Log
+Time-partitioned storage for production predictions
+
+Records are appended to one JSONL segment per hour (split into numbered
+parts once a segment reaches max_segment_bytes). A sidecar index.json holds
+the time range, record count and byte length of every segment, so a range
+query opens only the segments that overlap it. The index is rewritten when
+a segment is created or sealed and otherwise at most every index_interval
+seconds; on open, any JSONL tail written after the last index save is
+re-scanned, so a crash loses no records. Sealed segments can be
+compacted into a columnar .npz file (one array per field), which lets
+reports load just the fields they need without parsing JSON. The index
+points at the .npz before the JSONL is deleted, so a crash mid-compaction
+leaves either the old segment or a stray JSONL that the next open removes.
+
+Timestamps are naive ISO-8601 strings in UTC (see utc_now), so they order
+lexicographically and the hour key is their first 13 chars. Local time
+would repeat an hour when DST ends and write two hours into one segment.
+"""
+
+import os
+import json
+import time
+import itertools
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+INDEX_NAME = 'index.json'
+
+
+def utc_now():
+    """Current time as a naive UTC datetime, the log's timestamp convention"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def local_to_utc(timestamp):
+    """Naive local-time ISO timestamp (older logs) as a naive UTC ISO timestamp"""
+    return datetime.fromisoformat(timestamp).astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def _iso(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+def records_to_columns(records):
+    """
+    Encode a list of flat records as named numpy arrays
+
+    Numbers become float64, strings unicode arrays and anything else JSON
+    strings (flagged by a '<field>.json' marker). Fields missing from some
+    records get a '<field>.present' mask. 'timestamp' is stored as
+    datetime64[us].
+    """
+    columns = {}
+    keys = sorted({key for record in records for key in record})
+    for key in keys:
+        values = [record.get(key) for record in records]
+        present = np.array([value is not None for value in values])
+        if key == 'timestamp':
+            columns[key] = np.array(values, dtype='datetime64[us]')
+        elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values if v is not None):
+            columns[key] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        elif all(isinstance(v, str) for v in values if v is not None):
+            columns[key] = np.array(['' if v is None else v for v in values], dtype=str)
+        else:
+            columns[key] = np.array(['' if v is None else json.dumps(v) for v in values], dtype=str)
+            columns[f'{key}.json'] = np.array(True)
+        if not present.all():
+            columns[f'{key}.present'] = present
+    return columns
+
+
+def columns_to_records(columns):
+    """Inverse of records_to_columns (numbers come back as floats)"""
+    fields = [key for key in columns if '.' not in key]
+    count = len(columns['timestamp']) if 'timestamp' in columns else 0
+    decoded = {}
+    for key in fields:
+        values = columns[key]
+        if key == 'timestamp':
+            decoded[key] = np.datetime_as_string(values, unit='us').tolist()
+        elif f'{key}.json' in columns:
+            decoded[key] = [json.loads(v) if v else None for v in values.tolist()]
+        else:
+            decoded[key] = values.tolist()
+    masks = {key: columns[f'{key}.present'] for key in fields if f'{key}.present' in columns}
+
+    records = []
+    for i in range(count):
+        record = {}
+        for key in fields:
+            if key in masks and not masks[key][i]:
+                continue
+            record[key] = decoded[key][i]
+        records.append(record)
+    return records
+
+
+class PredictionLogStore:
+    """Hourly segmented prediction log with a sidecar time index"""
+
+    def __init__(self, root, max_segment_bytes=64 * 1024 * 1024, columnar=False, index_interval=5.0):
+        """
+        Args:
+            root: Directory for segments and index.json
+            max_segment_bytes: Start a new part of the hour once a segment reaches this size (None = never)
+            columnar: Compact each hour into .npz once a later hour starts
+            index_interval: Max seconds between index.json saves while appending
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.root / INDEX_NAME
+        self.max_segment_bytes = max_segment_bytes
+        self.columnar = columnar
+        self.index_interval = index_interval
+
+        self._lock = threading.RLock()
+        self._handle = None
+        self._handle_name = None
+        self._active_hour = None
+        self._index_saved_at = 0.0
+        self._dirty = False
+        self.index = self._load_index()
+        self._recover()
+        # Newest part per hour, so appends don't scan the whole index
+        self._latest = {}
+        for entry in sorted(self.index['segments'].values(), key=lambda entry: entry['part']):
+            self._latest[entry['hour']] = entry['name']
+
+    def _load_index(self):
+        if self.index_file.exists():
+            with open(self.index_file, 'r') as f:
+                return json.load(f)
+        return {'segments': {}}
+
+    def _save_index(self):
+        # Write-then-rename so readers never see a half-written index
+        tmp_path = self.index_file.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_file)
+        self._index_saved_at = time.time()
+        self._dirty = False
+
+    def _recover(self):
+        """Bring the in-memory index up to date with JSONL written after its last save"""
+        segments = self.index['segments']
+        for path in self.root.glob('*.jsonl'):
+            name = path.stem
+            if name not in segments:
+                hour, _, part = name.partition('.')
+                segments[name] = {
+                    'name': name, 'hour': hour, 'part': int(part or 0), 'format': 'jsonl', 'file': path.name,
+                    'start': None, 'end': None, 'count': 0, 'bytes': 0
+                }
+            entry = segments[name]
+            if entry['format'] == 'npz':
+                # Compacted, but the process stopped before deleting the JSONL
+                path.unlink(missing_ok=True)
+                continue
+            if path.stat().st_size == entry['bytes']:
+                continue
+
+            # Complete lines only; a line cut off mid-write is dropped on the next append
+            with open(path, 'rb') as f:
+                f.seek(entry['bytes'])
+                tail = f.read()
+            complete = tail[:tail.rfind(b'\n') + 1]
+            timestamps = [json.loads(line)['timestamp'] for line in complete.decode('utf-8').splitlines() if line]
+            if timestamps:
+                entry['start'] = min(timestamps + ([entry['start']] if entry['start'] else []))
+                entry['end'] = max(timestamps + ([entry['end']] if entry['end'] else []))
+            entry['count'] += len(timestamps)
+            entry['bytes'] += len(complete)
+            self._dirty = True
+
+    def _writable_segment(self, hour):
+        """Name of the JSONL segment new records for this hour go to"""
+        latest = self.index['segments'].get(self._latest.get(hour))
+        if latest is not None and latest['format'] == 'jsonl' and (
+                self.max_segment_bytes is None or latest['bytes'] < self.max_segment_bytes):
+            return latest['name']
+
+        # First segment of the hour, or the previous part is full / already compacted
+        part = 0 if latest is None else latest['part'] + 1
+        name = hour if part == 0 else f'{hour}.{part}'
+        self.index['segments'][name] = {
+            'name': name, 'hour': hour, 'part': part, 'format': 'jsonl', 'file': f'{name}.jsonl',
+            'start': None, 'end': None, 'count': 0, 'bytes': 0
+        }
+        self._latest[hour] = name
+        return name
+
+    def _close_handle(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+            self._handle_name = None
+
+    def append(self, records):
+        """
+        Append records (dicts with an ISO 'timestamp') to their hourly segments
+
+        Returns:
+            Number of records written
+        """
+        if not records:
+            return 0
+        with self._lock:
+            segment_count = len(self.index['segments'])
+            for hour, group in itertools.groupby(records, key=lambda record: record['timestamp'][:13]):
+                group = list(group)
+                name = self._writable_segment(hour)
+                entry = self.index['segments'][name]
+                if self._handle_name != name:
+                    self._close_handle()
+                    path = self.root / entry['file']
+                    if path.exists() and path.stat().st_size > entry['bytes']:
+                        os.truncate(path, entry['bytes'])
+                    self._handle = open(path, 'a', encoding='utf-8')
+                    self._handle_name = name
+
+                self._handle.write(''.join(json.dumps(record) + '\n' for record in group))
+                self._handle.flush()
+
+                timestamps = [record['timestamp'] for record in group]
+                entry['start'] = min(timestamps + ([entry['start']] if entry['start'] else []))
+                entry['end'] = max(timestamps + ([entry['end']] if entry['end'] else []))
+                entry['count'] += len(group)
+                entry['bytes'] = self._handle.tell()
+                self._dirty = True
+
+                if self.columnar and (self._active_hour is None or hour > self._active_hour):
+                    self._active_hour = hour
+                    self._compact_before(hour)
+            # Always persist new or sealed segments; otherwise recovery covers the lag
+            if (len(self.index['segments']) != segment_count
+                    or time.time() - self._index_saved_at >= self.index_interval):
+                self._save_index()
+        return len(records)
+
+    def _read_jsonl(self, entry):
+        # Only the indexed byte range: a concurrent append may be mid-write past it
+        with open(self.root / entry['file'], 'r', encoding='utf-8') as f:
+            data = f.read(entry['bytes'])
+        return [json.loads(line) for line in data.splitlines() if line]
+
+    def _compact_before(self, hour):
+        """Compact JSONL segments of earlier hours; saves the index before deleting any JSONL"""
+        compacted = []
+        for entry in list(self.index['segments'].values()):
+            if entry['format'] != 'jsonl' or entry['hour'] >= hour or entry['count'] == 0:
+                continue
+            if self._handle_name == entry['name']:
+                self._close_handle()
+            columns = records_to_columns(self._read_jsonl(entry))
+            target = self.root / f"{entry['name']}.npz"
+            tmp_path = self.root / f"{entry['name']}.tmp.npz"
+            np.savez_compressed(tmp_path, **columns)
+            os.replace(tmp_path, target)
+            compacted.append(self.root / entry['file'])
+            entry.update({'format': 'npz', 'file': target.name, 'bytes': target.stat().st_size})
+        if compacted:
+            self._save_index()
+            for path in compacted:
+                path.unlink(missing_ok=True)
+        return len(compacted)
+
+    def compact(self, before=None):
+        """
+        Convert JSONL segments of hours before `before` into columnar .npz
+
+        Args:
+            before: ISO timestamp / datetime in UTC (default: the current hour)
+
+        Returns:
+            Number of segments compacted
+        """
+        hour = (_iso(before) or utc_now().isoformat())[:13]
+        with self._lock:
+            return self._compact_before(hour)
+
+    def segments(self, start=None, end=None):
+        """Index entries of non-empty segments overlapping [start, end], oldest first"""
+        start, end = _iso(start), _iso(end)
+        with self._lock:
+            entries = [dict(entry) for entry in self.index['segments'].values()]
+        selected = [entry for entry in entries if entry['count']
+                    and (start is None or entry['end'] >= start)
+                    and (end is None or entry['start'] <= end)]
+        return sorted(selected, key=lambda entry: (entry['start'], entry['part']))
+
+    def _segment_columns(self, entry, start, end, fields=None):
+        """Columns of one segment restricted to [start, end] (and to fields, if given)"""
+        inside = (start is None or entry['start'] >= start) and (end is None or entry['end'] <= end)
+        if entry['format'] == 'jsonl':
+            records = self._read_jsonl(entry)
+            if not inside:
+                records = [r for r in records if (start is None or r['timestamp'] >= start)
+                           and (end is None or r['timestamp'] <= end)]
+            columns = records_to_columns(records) if records else {}
+            return columns, len(records)
+
+        with np.load(self.root / entry['file']) as data:
+            names = data.files
+            mask = None
+            if not inside:
+                timestamps = data['timestamp']
+                mask = np.ones(len(timestamps), dtype=bool)
+                if start is not None:
+                    mask &= timestamps >= np.datetime64(start)
+                if end is not None:
+                    mask &= timestamps <= np.datetime64(end)
+            wanted = names if fields is None else [
+                name for name in names if name.split('.')[0] in fields]
+            columns = {}
+            for name in wanted:
+                values = data[name]  # npz members load lazily, one field at a time
+                columns[name] = values if mask is None or values.ndim == 0 else values[mask]
+            count = int(entry['count'] if mask is None else mask.sum())
+        return columns, count
+
+    def read_records(self, start=None, end=None):
+        """All records with start <= timestamp <= end, oldest segment first"""
+        start, end = _iso(start), _iso(end)
+        records = []
+        for entry in self.segments(start, end):
+            columns, count = self._segment_columns(entry, start, end)
+            if count:
+                records.extend(columns_to_records(columns))
+        return records
+
+    def read_columns(self, fields, start=None, end=None):
+        """
+        Selected fields of all records in [start, end] as arrays
+
+        Missing values are NaN for numeric fields and '' for text fields.
+
+        Returns:
+            Dict of field name -> numpy array (equal lengths)
+        """
+        start, end = _iso(start), _iso(end)
+        parts = []
+        for entry in self.segments(start, end):
+            columns, count = self._segment_columns(entry, start, end, fields)
+            if count:
+                parts.append((columns, count))
+
+        result = {}
+        for field in fields:
+            arrays = [columns.get(field) for columns, _ in parts]
+            textual = any(a is not None and a.dtype.kind == 'U' for a in arrays)
+            filled = []
+            for (columns, count), values in zip(parts, arrays):
+                if values is None:
+                    values = np.full(count, '' if textual else np.nan, dtype=str if textual else np.float64)
+                elif f'{field}.present' in columns and values.dtype.kind == 'f':
+                    values = np.where(columns[f'{field}.present'], values, np.nan)
+                filled.append(values)
+            result[field] = np.concatenate(filled) if filled else np.empty(0)
+        return result
+
+    def import_jsonl(self, path, batch_size=10000, local_time=False):
+        """
+        Append an existing flat JSONL prediction log, in file order
+
+        Args:
+            path: JSONL file
+            batch_size: Records appended per batch
+            local_time: Timestamps are naive local time and are converted to UTC
+        """
+        imported = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            while True:
+                batch = [json.loads(line) for line in itertools.islice(f, batch_size) if line.strip()]
+                if not batch:
+                    break
+                if local_time:
+                    for record in batch:
+                        record['timestamp'] = local_to_utc(record['timestamp'])
+                imported += self.append(batch)
+        return imported
+
+    def stats(self):
+        """Segment and record counts by storage format"""
+        with self._lock:
+            entries = list(self.index['segments'].values())
+        return {
+            'segments': len(entries),
+            'records': sum(entry['count'] for entry in entries),
+            'bytes': sum(entry['bytes'] for entry in entries),
+            'columnar_segments': sum(entry['format'] == 'npz' for entry in entries)
+        }
+
+    def close(self):
+        with self._lock:
+            self._close_handle()
+            if self._dirty:
+                self._save_index()
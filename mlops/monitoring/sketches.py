@@ -0,0 +1,323 @@
+"""
+Streaming Statistics for Production Monitoring
+Mergeable quantile sketches, sliding-window counters and drift histograms
+
+DDSketch keeps counts in logarithmic buckets whose width is set by the
+relative accuracy, so any quantile is returned within that relative error
+of the true value with constant-time inserts and a bounded number of
+buckets. Two sketches with the same accuracy merge by adding bucket counts,
+which is what makes windowed quantiles cheap: each window is a ring of
+time slots, every slot has its own sketch, and a window query merges the
+live slots.
+
+Fixed-bin histograms do the same for input and score distributions: a
+value lands in a bin in O(log bins), histograms with the same edges merge
+by adding counts, and PSI / KL divergence compare a window against a
+reference histogram without touching the prediction log.
+"""
+
+import math
+import bisect
+
+
+class DDSketch:
+    """Relative-error quantile sketch (Masson et al., DDSketch)"""
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6, max_bins=2048):
+        """
+        Args:
+            relative_accuracy: Max relative error of returned quantiles
+            min_value: Values at or below this are counted as zero
+            max_bins: Collapse the lowest buckets beyond this many
+        """
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        """Record one non-negative value in O(1)"""
+        if value > self.min_value:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[key] = self.bins.get(key, 0) + 1
+            if len(self.bins) > self.max_bins:
+                self._collapse()
+        else:
+            self.zero_count += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def _collapse(self):
+        # Fold the two lowest buckets; only the smallest quantiles lose accuracy
+        lowest, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(lowest)
+
+    def merge(self, other):
+        """Add another sketch with the same accuracy into this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        while len(self.bins) > self.max_bins:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q in [0, 1] (None if empty)"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self):
+        """JSON-serializable state"""
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'min_value': self.min_value,
+            'bins': {str(key): count for key, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'], data['min_value'])
+        sketch.bins = {int(key): count for key, count in data['bins'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+class SlidingWindow:
+    """
+    Counts and a latency sketch over the last `seconds`
+
+    The window is a ring of `slots` time slots; a slot is reset in O(1) the
+    first time it is reused, so stale data ages out without a sweep. The
+    window resolution is seconds / slots.
+    """
+
+    def __init__(self, seconds, slots=60, relative_accuracy=0.01):
+        self.seconds = seconds
+        self.slots = slots
+        self.slot_seconds = seconds / slots
+        self.relative_accuracy = relative_accuracy
+
+        self._epochs = [None] * slots
+        self._counts = [0] * slots
+        self._errors = [0] * slots
+        self._fakes = [0] * slots
+        self._latency = [None] * slots
+
+    def _slot(self, now):
+        epoch = int(now // self.slot_seconds)
+        i = epoch % self.slots
+        if self._epochs[i] != epoch:
+            self._epochs[i] = epoch
+            self._counts[i] = self._errors[i] = self._fakes[i] = 0
+            self._latency[i] = DDSketch(self.relative_accuracy)
+        return i
+
+    def add(self, now, latency_ms=None, error=False, fake=False):
+        """Record one prediction at time `now` (seconds)"""
+        i = self._slot(now)
+        self._counts[i] += 1
+        self._errors[i] += bool(error)
+        self._fakes[i] += bool(fake)
+        if latency_ms is not None:
+            self._latency[i].add(latency_ms)
+
+    def snapshot(self, now):
+        """
+        Aggregate of the live slots
+
+        Returns:
+            Dict with count, errors, error_rate, fake_rate, rate_per_s and
+            latency p50/p95/p99 in ms (None when the window is empty)
+        """
+        current = int(now // self.slot_seconds)
+        latency = DDSketch(self.relative_accuracy)
+        count = errors = fakes = 0
+        for i, epoch in enumerate(self._epochs):
+            if epoch is None or not current - self.slots < epoch <= current:
+                continue
+            count += self._counts[i]
+            errors += self._errors[i]
+            fakes += self._fakes[i]
+            latency.merge(self._latency[i])
+
+        scored = count - errors
+        return {
+            'window_s': self.seconds,
+            'count': count,
+            'errors': errors,
+            'error_rate': errors / count if count else 0.0,
+            'fake_rate': fakes / scored if scored else 0.0,
+            'rate_per_s': count / self.seconds,
+            'latency_p50_ms': latency.quantile(0.50),
+            'latency_p95_ms': latency.quantile(0.95),
+            'latency_p99_ms': latency.quantile(0.99)
+        }
+
+    def to_dict(self):
+        """JSON-serializable state of the used slots"""
+        return {
+            'seconds': self.seconds,
+            'slots': self.slots,
+            'relative_accuracy': self.relative_accuracy,
+            'slot_state': [
+                [epoch, self._counts[i], self._errors[i], self._fakes[i], self._latency[i].to_dict()]
+                for i, epoch in enumerate(self._epochs) if epoch is not None
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        window = cls(data['seconds'], data['slots'], data['relative_accuracy'])
+        for epoch, count, errors, fakes, latency in data['slot_state']:
+            i = epoch % window.slots
+            window._epochs[i] = epoch
+            window._counts[i], window._errors[i], window._fakes[i] = count, errors, fakes
+            window._latency[i] = DDSketch.from_dict(latency)
+        return window
+
+
+class FixedHistogram:
+    """Counts over fixed bin edges; values outside the edges go to the first/last bin"""
+
+    def __init__(self, edges, counts=None):
+        self.edges = [float(edge) for edge in edges]
+        self.counts = list(counts) if counts is not None else [0] * (len(self.edges) - 1)
+
+    def bin_index(self, value):
+        i = bisect.bisect_right(self.edges, value) - 1
+        return min(max(i, 0), len(self.counts) - 1)
+
+    def add(self, value, count=1):
+        self.counts[self.bin_index(value)] += count
+
+    def merge(self, other):
+        if other.edges != self.edges:
+            raise ValueError("Cannot merge histograms with different edges")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+    def proportions(self, epsilon=1e-4):
+        """Bin shares, smoothed so empty bins keep log ratios finite"""
+        total = self.total
+        shares = [count / total if total else 0.0 for count in self.counts]
+        smoothed = [share + epsilon for share in shares]
+        norm = sum(smoothed)
+        return [share / norm for share in smoothed]
+
+    def to_dict(self):
+        return {'edges': self.edges, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['edges'], data['counts'])
+
+
+def population_stability_index(reference, current, epsilon=1e-4):
+    """
+    PSI between two histograms with the same edges
+
+    sum((current - reference) * ln(current / reference)) over bin shares;
+    below 0.1 is usually read as stable, above 0.2 as a significant shift.
+    """
+    if reference.edges != current.edges:
+        raise ValueError("Histograms must share bin edges")
+    expected, actual = reference.proportions(epsilon), current.proportions(epsilon)
+    return sum((a - e) * math.log(a / e) for e, a in zip(expected, actual))
+
+
+def kl_divergence(reference, current, epsilon=1e-4):
+    """KL(current || reference) in nats, for histograms with the same edges"""
+    if reference.edges != current.edges:
+        raise ValueError("Histograms must share bin edges")
+    expected, actual = reference.proportions(epsilon), current.proportions(epsilon)
+    return sum(a * math.log(a / e) for e, a in zip(expected, actual))
+
+
+class SlidingHistogram:
+    """FixedHistogram over the last `seconds`, as a ring of per-slot bin counts"""
+
+    def __init__(self, edges, seconds, slots=60):
+        self.edges = [float(edge) for edge in edges]
+        self.seconds = seconds
+        self.slots = slots
+        self.slot_seconds = seconds / slots
+        self._index = FixedHistogram(self.edges)
+        self._epochs = [None] * slots
+        self._counts = [None] * slots
+
+    def add(self, now, value):
+        epoch = int(now // self.slot_seconds)
+        i = epoch % self.slots
+        if self._epochs[i] != epoch:
+            self._epochs[i] = epoch
+            self._counts[i] = [0] * (len(self.edges) - 1)
+        self._counts[i][self._index.bin_index(value)] += 1
+
+    def snapshot(self, now):
+        """FixedHistogram of the live slots"""
+        current = int(now // self.slot_seconds)
+        histogram = FixedHistogram(self.edges)
+        for epoch, counts in zip(self._epochs, self._counts):
+            if epoch is not None and current - self.slots < epoch <= current:
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+        return histogram
+
+    def to_dict(self):
+        """JSON-serializable state of the used slots"""
+        return {
+            'edges': self.edges,
+            'seconds': self.seconds,
+            'slots': self.slots,
+            'slot_counts': [[epoch, counts] for epoch, counts in zip(self._epochs, self._counts) if epoch is not None]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['edges'], data['seconds'], data['slots'])
+        for epoch, counts in data['slot_counts']:
+            histogram._epochs[epoch % histogram.slots] = epoch
+            histogram._counts[epoch % histogram.slots] = counts
+        return histogram
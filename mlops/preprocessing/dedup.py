@@ -0,0 +1,271 @@
+"""
+Near-Duplicate Frame Deduplication
+Clusters visually near-identical images in a manifest and writes a reduced
+sample list (one representative per cluster)
+
+Each image gets a 64-bit difference hash (dHash), stored in the manifest so
+only new or changed files are hashed again. Images that cannot be decoded
+are flagged in the manifest (not retried until the file changes), kept in
+the sample list and reported, since they cannot be compared. Near-duplicates are found with
+multi-index hashing: the hash is split into max_distance + 1 blocks, and by
+the pigeonhole principle two hashes within max_distance bits agree exactly
+on at least one block. Only images sharing a block value are compared.
+Clusters form around a kept representative, in path order: an image is
+dropped only if it is within max_distance of a kept image, so a slowly
+changing clip keeps a frame every time it drifts past the threshold
+instead of chaining into one cluster.
+
+Usage:
+    python mlops/preprocessing/dedup.py dataset/Dataset/Test --max-distance 6
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+# Add repository root and mlops to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from preprocessing.manifest import MANIFEST_NAME, build_manifest, connect_manifest
+
+SAMPLE_LIST_NAME = 'dedup_samples.txt'
+HASH_BITS = 64
+# Distances computed at once when checking a block bucket (bounds memory on huge buckets)
+CHUNK_PAIRS = 1 << 20
+_SIGN_BIT = 1 << 63
+
+
+def dhash_file(path):
+    """
+    64-bit difference hash of an image (None if it cannot be decoded)
+
+    The JPEG is decoded at 1/4 scale straight to grayscale, which skips most
+    of the IDCT work; the hash only needs a 9x8 thumbnail.
+    """
+    image = cv2.imread(str(path), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        return None
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def _dhash_batch(paths):
+    cv2.setNumThreads(1)
+    return [dhash_file(path) for path in paths]
+
+
+def _to_sqlite(value):
+    # sqlite integers are signed 64-bit
+    return value - (1 << 64) if value >= _SIGN_BIT else value
+
+
+def _from_sqlite(value):
+    return value & ((1 << 64) - 1)
+
+
+def update_dhashes(data_dir, manifest_path, num_workers=None, chunk_size=256):
+    """
+    Hash every manifest row that has no dHash yet, in parallel
+
+    Rows that fail to decode are marked dhash_failed and skipped by later
+    runs until build_manifest sees the file change.
+
+    Returns:
+        Number of images hashed (including failures)
+    """
+    data_dir = Path(data_dir)
+    conn = connect_manifest(manifest_path)
+    missing = [path for (path,) in conn.execute('SELECT path FROM samples WHERE dhash IS NULL AND NOT dhash_failed')]
+    if missing:
+        chunks = [[str(data_dir / path) for path in missing[i:i + chunk_size]]
+                  for i in range(0, len(missing), chunk_size)]
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=num_workers or os.cpu_count() or 1, mp_context=ctx) as pool:
+            hashes = [h for batch in pool.map(_dhash_batch, chunks) for h in batch]
+        with conn:
+            conn.executemany('UPDATE samples SET dhash = ?, dhash_failed = ? WHERE path = ?',
+                             [(None if h is None else _to_sqlite(h), int(h is None), path)
+                              for path, h in zip(missing, hashes)])
+    conn.close()
+    return len(missing)
+
+
+def hamming_distance(a, b):
+    """Bitwise Hamming distance between uint64 arrays (broadcasting)"""
+    x = np.bitwise_xor(a, b)
+    if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+        return np.bitwise_count(x)
+    return np.unpackbits(x[..., None].view(np.uint8), axis=-1).sum(axis=-1)
+
+
+def near_duplicate_pairs(hashes, max_distance=6):
+    """
+    All index pairs (i < j) whose hashes differ in at most max_distance bits
+
+    A bucket is checked a block of rows at a time (about CHUNK_PAIRS
+    distances), so one huge bucket, e.g. of blank or uniform frames, does
+    not need a bucket-squared distance matrix. Pass distinct hashes (see
+    dedup_dataset): exact copies are cheaper to group directly.
+
+    Args:
+        hashes: uint64 array of dHashes
+        max_distance: Hamming distance threshold
+
+    Returns:
+        Set of (i, j) tuples
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    bounds = np.linspace(0, HASH_BITS, max_distance + 2).astype(int)
+    pairs = set()
+
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        keys = (hashes >> np.uint64(lo)) & np.uint64((1 << int(hi - lo)) - 1)
+        order = np.argsort(keys, kind='stable')
+        buckets = np.split(order, np.flatnonzero(np.diff(keys[order])) + 1)
+        for bucket in buckets:
+            if len(bucket) < 2:
+                continue
+            # Exact check of every candidate pair that shares this block, rows in chunks
+            bucket_hashes = hashes[bucket]
+            rows = max(1, CHUNK_PAIRS // len(bucket))
+            for start in range(0, len(bucket) - 1, rows):
+                block = bucket_hashes[start:start + rows]
+                close = hamming_distance(block[:, None], bucket_hashes[None, start + 1:]) <= max_distance
+                i, j = np.nonzero(close)
+                i, j = i + start, j + start + 1
+                upper = j > i
+                pairs.update(zip(bucket[i[upper]].tolist(), bucket[j[upper]].tolist()))
+
+    return {(min(i, j), max(i, j)) for i, j in pairs}
+
+
+def cluster_pairs(num_items, pairs):
+    """
+    Greedy clustering around representatives over near-duplicate pairs
+
+    Items are visited in index order; an item not yet in a cluster becomes a
+    representative and takes every unclustered item it is paired with.
+    Every member is therefore a direct near-duplicate of its representative:
+    pairs do not chain (a-b, b-c does not put c with a).
+
+    Returns:
+        Array with the representative (lowest index of its cluster) of every item
+    """
+    neighbours = [[] for _ in range(num_items)]
+    for i, j in pairs:
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+
+    roots = np.full(num_items, -1)
+    for i in range(num_items):
+        if roots[i] >= 0:
+            continue
+        roots[i] = i
+        for j in neighbours[i]:
+            if roots[j] < 0:
+                roots[j] = i
+    return roots
+
+
+def load_sample_list(path):
+    """Relative paths from a sample list file (blank lines and # comments skipped)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip() and not line.startswith('#')}
+
+
+def dedup_dataset(data_dir, manifest_path=None, output_path=None, max_distance=6, num_workers=None):
+    """
+    Refresh the manifest, hash it and write one representative per near-duplicate cluster
+
+    Args:
+        data_dir: Folder with real/ and fake/ images
+        manifest_path: Manifest file (default: data_dir/manifest.sqlite)
+        output_path: Reduced sample list (default: data_dir/dedup_samples.txt)
+        max_distance: Max dHash Hamming distance for near-duplicates
+        num_workers: Hashing processes (default: CPU count)
+
+    Returns:
+        Dict with sample, cluster and timing statistics
+    """
+    data_dir = Path(data_dir)
+    manifest_path = Path(manifest_path) if manifest_path else data_dir / MANIFEST_NAME
+    output_path = Path(output_path) if output_path else data_dir / SAMPLE_LIST_NAME
+    start = time.time()
+
+    build_manifest(data_dir, manifest_path, num_workers)
+    hashed = update_dhashes(data_dir, manifest_path, num_workers)
+    hash_time = time.time() - start
+
+    conn = connect_manifest(manifest_path)
+    rows = conn.execute('SELECT path, label, dhash FROM samples WHERE dhash IS NOT NULL ORDER BY path').fetchall()
+    undecodable = [path for (path,) in conn.execute('SELECT path FROM samples WHERE dhash_failed ORDER BY path')]
+    conn.close()
+
+    paths = [path for path, _, _ in rows]
+    labels = np.array([label for _, label, _ in rows])
+    hashes = np.array([_from_sqlite(h) for _, _, h in rows], dtype=np.uint64)
+
+    # Cluster each label separately (never merge a real frame with a fake one) over
+    # its distinct hashes: copies of one hash (blank frames) join the first of them
+    roots = np.arange(len(rows))
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        unique, first, inverse = np.unique(hashes[members], return_index=True, return_inverse=True)
+        order = np.argsort(first)  # path order, so representatives are the earliest frames
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        unique_roots = cluster_pairs(len(unique), near_duplicate_pairs(unique[order], max_distance))
+        roots[members] = members[first[order][unique_roots[rank[inverse.ravel()]]]]
+    kept = [paths[i] for i in range(len(rows)) if roots[i] == i]
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(f"# {len(kept) + len(undecodable)} of {len(rows) + len(undecodable)} samples, "
+                f"dHash distance <= {max_distance}\n")
+        for path in kept:
+            f.write(path + '\n')
+        if undecodable:
+            # Never compared, so never dropped: the training loader decides what to do with them
+            f.write(f"# {len(undecodable)} samples that could not be decoded for hashing\n")
+            for path in undecodable:
+                f.write(path + '\n')
+
+    stats = {
+        'samples': len(rows) + len(undecodable),
+        'kept': len(kept) + len(undecodable),
+        'removed': len(rows) - len(kept),
+        'undecodable': len(undecodable),
+        'clusters_with_duplicates': int(np.sum(np.bincount(roots, minlength=len(rows)) > 1)) if rows else 0,
+        'hashed': hashed,
+        'hash_s': hash_time,
+        'elapsed_s': time.time() - start
+    }
+    print(f"✅ Kept {stats['kept']}/{stats['samples']} samples ({stats['removed']} near-duplicates in "
+          f"{stats['clusters_with_duplicates']} clusters) in {stats['elapsed_s']:.2f}s "
+          f"({hashed} images hashed)")
+    if undecodable:
+        print(f"⚠️  {len(undecodable)} images could not be decoded and were kept without dedup: "
+              f"{', '.join(undecodable[:5])}{' ...' if len(undecodable) > 5 else ''}")
+    print(f"   Sample list: {output_path}")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Remove near-duplicate frames from a dataset manifest')
+    parser.add_argument('data_dir', type=str, help='Folder with real/ and fake/ images')
+    parser.add_argument('--manifest', type=str, default=None, help='Manifest path (default: <data_dir>/manifest.sqlite)')
+    parser.add_argument('--output', type=str, default=None, help='Sample list path (default: <data_dir>/dedup_samples.txt)')
+    parser.add_argument('--max-distance', type=int, default=6, help='Max dHash Hamming distance (of 64 bits)')
+    parser.add_argument('--workers', type=int, default=None, help='Hashing processes (default: CPU count)')
+
+    args = parser.parse_args()
+
+    dedup_dataset(args.data_dir, args.manifest, args.output, args.max_distance, args.workers)
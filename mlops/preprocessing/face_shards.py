@@ -0,0 +1,289 @@
+"""
+Face-Crop Shard Store
+Runs face detection and alignment once and stores the aligned crops in
+memory-mapped shards shared by training and evaluation
+
+Layout of a shard directory:
+    index.json            shard list, sample sources and crop size
+    labels.npy            int64 label per sample (0 = real, 1 = fake)
+    shard_00000.npy ...   uint8 (N, 224, 224, 3) RGB crops, .npy format
+
+Crops are produced exactly like the serving path (Haar box -> CLAHE ->
+MTCNN -> 224x224) and stored before normalization, so readers only need
+to scale and normalize.
+
+Usage:
+    python mlops/preprocessing/face_shards.py dataset/Dataset/Train --output mlops/data/shards/train
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# Add repository root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from face_alignment import align_face, aligned_to_uint8, create_mtcnn, enhance_face_contrast
+from face_detection import detect_bounding_box
+from video_io import is_image, is_video, read_frames, sample_frame_indices, video_frame_count
+
+# Folder name (case-insensitive) -> label
+LABELS = {'real': 0, 'fake': 1}
+INDEX_VERSION = 1
+
+_mtcnn = None  # one MTCNN per worker process
+
+
+def list_sources(data_dir, frames_per_video=10):
+    """
+    List what to crop from data_dir/{real,fake}/ (images and videos)
+
+    Returns:
+        List of (path, frame indices or None for images, label)
+    """
+    sources = []
+    for class_dir in sorted(Path(data_dir).iterdir()):
+        label = LABELS.get(class_dir.name.lower())
+        if label is None or not class_dir.is_dir():
+            continue
+        for path in sorted(class_dir.iterdir()):
+            if is_image(path):
+                sources.append((str(path), None, label))
+            elif is_video(path):
+                indices = sample_frame_indices(video_frame_count(path), frames_per_video)
+                if indices:
+                    sources.append((str(path), indices, label))
+    return sources
+
+
+def _init_crop_worker():
+    global _mtcnn
+    import torch
+
+    # One process per core already; keep torch/OpenCV single-threaded
+    torch.set_num_threads(1)
+    cv2.setNumThreads(1)
+    _mtcnn = create_mtcnn('cpu')
+
+
+def crop_face(frame):
+    """
+    Detect, enhance and align the first face of a BGR frame
+
+    Returns:
+        uint8 (224, 224, 3) RGB crop, or None if no face was found
+    """
+    faces = detect_bounding_box(frame)
+    if len(faces) == 0:
+        return None
+    x, y, w, h = faces[0]
+    aligned = align_face(enhance_face_contrast(frame[y:y + h, x:x + w]), _mtcnn)
+    return None if aligned is None else aligned_to_uint8(aligned)
+
+
+def crop_source(source):
+    """
+    Crop every frame of one source (runs in a worker process)
+
+    Returns:
+        List of (path, frame index, label, crop or None)
+    """
+    path, frame_indices, label = source
+    if frame_indices is None:
+        frame = cv2.imread(path)
+        return [(path, 0, label, None if frame is None else crop_face(frame))]
+    # Videos decode in one forward pass
+    return [(path, idx, label, crop_face(frame)) for idx, frame in read_frames(path, frame_indices)]
+
+
+class FaceShardWriter:
+    """Writes crops into fixed-size .npy shards and the index"""
+
+    def __init__(self, output_dir, shard_size=1024, image_size=224):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.image_size = image_size
+        self.shards = []
+        self.sources = []
+        self.labels = []
+        self._pending = []
+
+    def add(self, crop, label, path='', frame_index=0):
+        self._pending.append(crop)
+        self.labels.append(int(label))
+        self.sources.append([str(path), int(frame_index)])
+        if len(self._pending) >= self.shard_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        name = f"shard_{len(self.shards):05d}.npy"
+        shape = (len(self._pending), self.image_size, self.image_size, 3)
+        shard = np.lib.format.open_memmap(self.output_dir / name, mode='w+', dtype=np.uint8, shape=shape)
+        for i, crop in enumerate(self._pending):
+            shard[i] = crop
+        shard.flush()
+        del shard
+        self.shards.append({'file': name, 'count': len(self._pending)})
+        self._pending = []
+
+    def close(self):
+        """Write the last shard, labels and index; returns the sample count"""
+        self._flush()
+        np.save(self.output_dir / 'labels.npy', np.array(self.labels, dtype=np.int64))
+        index = {
+            'version': INDEX_VERSION,
+            'image_size': self.image_size,
+            'count': len(self.labels),
+            'shards': self.shards,
+            'sources': self.sources
+        }
+        # Index last, so a half-written store is never picked up
+        with open(self.output_dir / 'index.json', 'w') as f:
+            json.dump(index, f)
+        return len(self.labels)
+
+
+class FaceShardStore:
+    """
+    Read-only view over a shard directory
+
+    Shards are opened with mmap_mode='r'; slices that stay inside one shard
+    are views onto the page cache, so readers never copy crops they do not
+    touch. Safe to pickle into DataLoader workers (each reopens the maps).
+    """
+
+    def __init__(self, shard_dir):
+        self.shard_dir = Path(shard_dir)
+        with open(self.shard_dir / 'index.json', 'r') as f:
+            self.index = json.load(f)
+        self.image_size = self.index['image_size']
+        self.labels = np.load(self.shard_dir / 'labels.npy')
+        counts = [shard['count'] for shard in self.index['shards']]
+        # offsets[i] is the global index of the first crop in shard i
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._shards = None
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shards'] = None
+        return state
+
+    def _open(self):
+        if self._shards is None:
+            self._shards = [np.load(self.shard_dir / shard['file'], mmap_mode='r')
+                            for shard in self.index['shards']]
+        return self._shards
+
+    def _locate(self, idx):
+        if idx < 0 or idx >= len(self):
+            raise IndexError(idx)
+        shard = int(np.searchsorted(self.offsets, idx, side='right')) - 1
+        return shard, idx - int(self.offsets[shard])
+
+    def __getitem__(self, idx):
+        """(crop view (224, 224, 3) uint8, label)"""
+        shard, local = self._locate(idx)
+        return self._open()[shard][local], int(self.labels[idx])
+
+    def get_range(self, start, stop):
+        """
+        Crops [start, stop) and their labels
+
+        A zero-copy view when the range lies inside one shard; ranges that
+        span shards are concatenated.
+        """
+        stop = min(stop, len(self))
+        if start >= stop:
+            return np.empty((0, self.image_size, self.image_size, 3), dtype=np.uint8), self.labels[:0]
+        shards = self._open()
+        first, first_local = self._locate(start)
+        last, last_local = self._locate(stop - 1)
+        if first == last:
+            crops = shards[first][first_local:last_local + 1]
+        else:
+            parts = [shards[first][first_local:]]
+            parts += [shards[i] for i in range(first + 1, last)]
+            parts.append(shards[last][:last_local + 1])
+            crops = np.concatenate(parts)
+        return crops, self.labels[start:stop]
+
+    def iter_batches(self, batch_size):
+        """Yield (crops, labels) batches that never cross a shard, so every batch is a view"""
+        shards = self._open()
+        for i, shard in enumerate(shards):
+            base = int(self.offsets[i])
+            for start in range(0, len(shard), batch_size):
+                crops = shard[start:start + batch_size]
+                yield crops, self.labels[base + start:base + start + len(crops)]
+
+    def source(self, idx):
+        """(path, frame index) the crop at idx was taken from"""
+        path, frame_index = self.index['sources'][idx]
+        return path, frame_index
+
+
+def build_face_shards(data_dir, output_dir, frames_per_video=10, num_workers=None, shard_size=1024):
+    """
+    Detect and align faces once, in parallel, and write them to shards
+
+    Args:
+        data_dir: Folder with real/ and fake/ (images and/or videos, any case)
+        output_dir: Shard directory to create
+        frames_per_video: Frames sampled per video
+        num_workers: Crop processes (default: CPU count)
+        shard_size: Crops per shard file
+
+    Returns:
+        Dict with build statistics
+    """
+    sources = list_sources(data_dir, frames_per_video)
+    num_workers = num_workers or os.cpu_count() or 1
+    writer = FaceShardWriter(output_dir, shard_size=shard_size)
+    stats = {'sources': len(sources), 'frames': 0, 'crops': 0, 'no_face': 0}
+    print(f"Cropping faces from {len(sources)} files with {num_workers} workers...")
+    start = time.time()
+
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(num_workers, initializer=_init_crop_worker) as pool:
+        # imap keeps input order, so shard contents are deterministic
+        for results in pool.imap(crop_source, sources, chunksize=4):
+            for path, frame_index, label, crop in results:
+                stats['frames'] += 1
+                if crop is None:
+                    stats['no_face'] += 1
+                    continue
+                writer.add(crop, label, path, frame_index)
+                stats['crops'] += 1
+
+    writer.close()
+    stats['elapsed_s'] = time.time() - start
+    print(f"✅ Wrote {stats['crops']} face crops in {len(writer.shards)} shards "
+          f"({stats['no_face']} frames without a face) in {stats['elapsed_s']:.1f}s")
+    print(f"   Shards: {output_dir}")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute aligned face crops into memory-mapped shards')
+    parser.add_argument('data_dir', type=str, help='Folder with real/ and fake/ images or videos')
+    parser.add_argument('--output', type=str, required=True, help='Shard directory to create')
+    parser.add_argument('--frames-per-video', type=int, default=10, help='Frames sampled per video')
+    parser.add_argument('--workers', type=int, default=None, help='Crop processes (default: CPU count)')
+    parser.add_argument('--shard-size', type=int, default=1024, help='Crops per shard file')
+
+    args = parser.parse_args()
+
+    build_face_shards(args.data_dir, args.output, args.frames_per_video, args.workers, args.shard_size)
@@ -0,0 +1,244 @@
+"""
+Dataset Manifest
+Indexed sqlite record of every labelled image in a dataset folder
+
+One row per image: relative path, label, size, mtime, content hash and the
+source video it was extracted from. Rebuilding only re-hashes files whose
+size or mtime changed, so refreshing a large folder costs a directory walk
+and loading it costs a single query.
+
+Usage:
+    python mlops/preprocessing/manifest.py dataset/Dataset/Test
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Add repository root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from video_io import is_image
+
+MANIFEST_NAME = 'manifest.sqlite'
+
+# Folder name (case-insensitive) -> label
+LABELS = {'real': 0, 'fake': 1}
+
+# Frames written by extract_test_images_from_videos.py: {label}_{video}_frame_{n}
+FRAME_NAME = re.compile(r'^(?:real|fake)_(?P<video>.+)_frame_(?P<frame>\d+)$', re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    path TEXT PRIMARY KEY,
+    label INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    source_video TEXT NOT NULL,
+    frame INTEGER,
+    dhash INTEGER,
+    dhash_failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS samples_source_video ON samples (source_video);
+CREATE INDEX IF NOT EXISTS samples_label ON samples (label);
+"""
+
+
+def source_of(path):
+    """
+    Source video and frame number of a sample
+
+    Extracted frames map to the video they came from; any other file is its
+    own source.
+
+    Returns:
+        tuple: (source video name, frame number or None)
+    """
+    stem = Path(path).stem
+    match = FRAME_NAME.match(stem)
+    if match:
+        return match.group('video'), int(match.group('frame'))
+    return stem, None
+
+
+def file_hash(path):
+    """blake2b-128 of the file contents (hex)"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_labelled_files(data_dir):
+    """(relative path, label) for every image under data_dir/{real,fake}/ (any case)"""
+    data_dir = Path(data_dir)
+    files = []
+    for class_dir in sorted(data_dir.iterdir()):
+        label = LABELS.get(class_dir.name.lower())
+        if label is None or not class_dir.is_dir():
+            continue
+        for path in sorted(class_dir.iterdir()):
+            if path.is_file() and is_image(path):
+                files.append((path.relative_to(data_dir).as_posix(), label))
+    return files
+
+
+def connect_manifest(manifest_path):
+    """Open (creating or upgrading) a manifest database"""
+    conn = sqlite3.connect(str(manifest_path))
+    conn.executescript(SCHEMA)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(samples)')}
+    if 'dhash' not in columns:
+        # Manifests written before perceptual hashes were tracked
+        conn.execute('ALTER TABLE samples ADD COLUMN dhash INTEGER')
+    if 'dhash_failed' not in columns:
+        # ... or before decode failures were recorded
+        conn.execute('ALTER TABLE samples ADD COLUMN dhash_failed INTEGER NOT NULL DEFAULT 0')
+    return conn
+
+
+def build_manifest(data_dir, manifest_path=None, num_workers=None):
+    """
+    Create or incrementally refresh the manifest for data_dir
+
+    Files whose size and mtime are unchanged are not re-read; new and
+    modified files are hashed on a thread pool; rows for deleted files are
+    dropped.
+
+    Args:
+        data_dir: Folder with real/ and fake/ images
+        manifest_path: Manifest file (default: data_dir/manifest.sqlite)
+        num_workers: Hashing threads (default: CPU count)
+
+    Returns:
+        Dict with added/updated/removed/unchanged counts
+    """
+    data_dir = Path(data_dir)
+    manifest_path = Path(manifest_path) if manifest_path else data_dir / MANIFEST_NAME
+    start = time.time()
+
+    conn = connect_manifest(manifest_path)
+    known = {path: (size, mtime_ns) for path, size, mtime_ns
+             in conn.execute('SELECT path, size, mtime_ns FROM samples')}
+
+    stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+    to_hash = []
+    present = set()
+    for rel_path, label in list_labelled_files(data_dir):
+        present.add(rel_path)
+        stat = (data_dir / rel_path).stat()
+        if known.get(rel_path) == (stat.st_size, stat.st_mtime_ns):
+            stats['unchanged'] += 1
+            continue
+        stats['updated' if rel_path in known else 'added'] += 1
+        to_hash.append((rel_path, label, stat.st_size, stat.st_mtime_ns))
+
+    # hashlib releases the GIL on large buffers, so threads hash in parallel
+    with ThreadPoolExecutor(max_workers=num_workers or os.cpu_count() or 1) as pool:
+        hashes = list(pool.map(lambda item: file_hash(data_dir / item[0]), to_hash))
+
+    rows = []
+    for (rel_path, label, size, mtime_ns), digest in zip(to_hash, hashes):
+        source_video, frame = source_of(rel_path)
+        rows.append((rel_path, label, size, mtime_ns, digest, source_video, frame))
+
+    removed = [(path,) for path in known if path not in present]
+    stats['removed'] = len(removed)
+
+    with conn:
+        # Replacing a row clears its perceptual hash (and decode failure), so dedup re-hashes changed files
+        conn.executemany('INSERT OR REPLACE INTO samples (path, label, size, mtime_ns, hash, source_video, frame) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        conn.executemany('DELETE FROM samples WHERE path = ?', removed)
+    conn.close()
+
+    stats['elapsed_s'] = time.time() - start
+    return stats
+
+
+def load_manifest(manifest_path, data_dir=None):
+    """
+    Read every sample from a manifest (one indexed query, no file system walk)
+
+    Args:
+        manifest_path: Manifest file
+        data_dir: Folder the manifest paths are relative to (default: the
+            manifest's own folder)
+
+    Returns:
+        List of (absolute path, label, source video), sorted by path
+    """
+    manifest_path = Path(manifest_path)
+    root = Path(data_dir) if data_dir else manifest_path.parent
+    # Read-only: data-parallel ranks and loaders read one manifest concurrently
+    conn = sqlite3.connect(f"{manifest_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        rows = conn.execute('SELECT path, label, source_video FROM samples ORDER BY path').fetchall()
+    finally:
+        conn.close()
+    return [(str(root / path), label, source_video) for path, label, source_video in rows]
+
+
+def group_split(groups, val_fraction=0.15, test_fraction=0.15, seed=42):
+    """
+    Split sample indices so every group (source video) lands in one split only
+
+    Groups are shuffled with a fixed seed and assigned to test, then
+    validation, until each reaches its share of samples; the rest train.
+    Frames of one video are near-duplicates, so a random per-frame split
+    would leak them between train and validation.
+
+    Args:
+        groups: Group key per sample
+        val_fraction: Target share of samples for validation
+        test_fraction: Target share of samples for test
+
+    Returns:
+        tuple: (train indices, val indices, test indices)
+    """
+    members = {}
+    for idx, group in enumerate(groups):
+        members.setdefault(group, []).append(idx)
+
+    order = sorted(members)
+    np.random.default_rng(seed).shuffle(order)
+
+    total = len(groups)
+    splits = {'test': [], 'val': [], 'train': []}
+    targets = [('test', test_fraction * total), ('val', val_fraction * total)]
+    for i, group in enumerate(order):
+        # Never leave training empty on tiny datasets
+        if i == len(order) - 1 and not splits['train']:
+            splits['train'].extend(members[group])
+            break
+        for name, target in targets:
+            if len(splits[name]) < target:
+                splits[name].extend(members[group])
+                break
+        else:
+            splits['train'].extend(members[group])
+
+    return sorted(splits['train']), sorted(splits['val']), sorted(splits['test'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or refresh a dataset manifest')
+    parser.add_argument('data_dir', type=str, help='Folder with real/ and fake/ images')
+    parser.add_argument('--manifest', type=str, default=None, help='Manifest path (default: <data_dir>/manifest.sqlite)')
+    parser.add_argument('--workers', type=int, default=None, help='Hashing threads')
+
+    args = parser.parse_args()
+
+    stats = build_manifest(args.data_dir, args.manifest, args.workers)
+    print(f"✅ Manifest updated in {stats['elapsed_s']:.2f}s: {stats['added']} added, {stats['updated']} updated, "
+          f"{stats['removed']} removed, {stats['unchanged']} unchanged")
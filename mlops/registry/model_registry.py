@@ -1,13 +1,40 @@
 """
 Model Registry for MLOps
 Manages model versions, metadata, and deployment
+
+Registering a version converts its model.pth into a verified,
+key-normalized model.safetensors and records its sha256; that file is
+what gets deployed and memory-mapped by the serving workers. Prebuilt
+engines (TorchScript, int8, ONNX) are built from it into artifacts/,
+keyed by weights hash and torch version (see serving_artifacts.py).
+
+Each version also gets a standard CPU performance profile (latency,
+throughput, memory, load time; see mlops/evaluation/benchmark.py), and
+promotion to production is blocked when its latency is over
+LATENCY_BUDGET relative to the current production model.
 """
 
+import os
+import sys
 import json
 import shutil
 from pathlib import Path
 from datetime import datetime
 
+# Add repository root to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+SERVING_WEIGHTS = 'model.safetensors'
+
+# Allowed latency increase of a new production model over the current one;
+# override per registry with a 'latency_budget' entry in registry.json. p99
+# gets more room than p50: it is the median of five 200-run p99s, steadier
+# than a single p99 but still noisier than the median
+LATENCY_BUDGET = {
+    'latency_p50_ms': 0.10,
+    'latency_p99_ms': 0.25,
+}
+
 
 class ModelRegistry:
     """Manage model versions and deployment"""
@@ -15,6 +42,7 @@ class ModelRegistry:
     def __init__(self, registry_dir='mlops/registry'):
         self.registry_dir = Path(registry_dir)
         self.models_dir = self.registry_dir / 'models'
+        self.artifacts_dir = self.registry_dir / 'artifacts'
         self.metadata_file = self.registry_dir / 'registry.json'
         
         # Create directories
@@ -35,11 +63,14 @@ class ModelRegistry:
         }
     
     def _save_registry(self):
-        """Save model registry"""
-        with open(self.metadata_file, 'w') as f:
+        """Save model registry (atomically: serving hosts may be polling it)"""
+        tmp_file = self.metadata_file.with_suffix('.json.tmp')
+        with open(tmp_file, 'w') as f:
             json.dump(self.registry, f, indent=2)
+        os.replace(tmp_file, self.metadata_file)
     
-    def register_model(self, version, metrics, description=''):
+    def register_model(self, version, metrics, description='', architecture='efficientnet',
+                       build_artifacts=True, benchmark=True):
         """
         Register a new model version
         
@@ -47,6 +78,9 @@ class ModelRegistry:
             version: Version string (e.g., 'v1.0.0')
             metrics: Dict of metrics
             description: Optional description
+            architecture: Serving architecture ('efficientnet' or 'student')
+            build_artifacts: Also build the prebuilt serving engines
+            benchmark: Also record the CPU performance profile
         """
         model_path = self.models_dir / version
         
@@ -59,9 +93,19 @@ class ModelRegistry:
             'timestamp': datetime.now().isoformat(),
             'metrics': metrics,
             'description': description,
+            'architecture': architecture,
             'status': 'registered',
             'path': str(model_path)
         }
+        if (model_path / 'model.pth').exists():
+            metadata.update(self._export_weights(model_path, architecture))
+            if build_artifacts:
+                metadata['artifacts'] = self._build_artifacts(metadata)
+            if benchmark:
+                try:
+                    metadata['performance'] = self._benchmark(metadata)
+                except Exception as e:
+                    print(f"⚠️  Warning: benchmark failed, no performance profile recorded: {e}")
         
         # Add to registry
         self.registry['models'].append(metadata)
@@ -72,6 +116,85 @@ class ModelRegistry:
         
         return metadata
     
+    def _export_weights(self, model_path, architecture):
+        from model_weights import export_safetensors
+        
+        sha256 = export_safetensors(model_path / 'model.pth', model_path / SERVING_WEIGHTS, architecture)
+        print(f"   Serving weights: {model_path / SERVING_WEIGHTS} (sha256 {sha256[:12]}…)")
+        return {'weights_file': SERVING_WEIGHTS, 'weights_sha256': sha256}
+    
+    def export_weights(self, version):
+        """
+        (Re)build the verified safetensors weights of a registered version
+        
+        Returns:
+            Updated model metadata
+        """
+        model = self.get_model(version)
+        model.update(self._export_weights(Path(model['path']), model.get('architecture', 'efficientnet')))
+        self._save_registry()
+        return model
+    
+    def _build_artifacts(self, model):
+        from deepfake_models import load_engine
+        from serving_artifacts import build_artifacts
+        
+        weights_path = Path(model['path']) / model['weights_file']
+        net = load_engine(model.get('architecture', 'efficientnet'), weights_path, 'eager',
+                          expected_sha256=model['weights_sha256'])
+        manifest = build_artifacts(net, model['weights_sha256'], self.artifacts_dir)
+        for engine, entry in manifest['engines'].items():
+            print(f"   {engine} engine: parity {entry['parity_max_abs']:.1e}")
+        if 'folded' in manifest:
+            print(f"   folded eager weights: parity {manifest['folded']['parity_max_abs']:.1e}")
+        for engine, reason in manifest['skipped'].items():
+            print(f"   {engine} engine skipped: {reason}")
+        return {
+            'key': manifest['key'],
+            'engines': sorted(manifest['engines']),
+            'skipped': manifest['skipped']
+        }
+    
+    def build_artifacts(self, version):
+        """
+        Build the serving engines of a registered version for this torch version
+        
+        Returns:
+            Updated model metadata
+        """
+        model = self.get_model(version)
+        if 'weights_sha256' not in model:
+            model = self.export_weights(version)
+        model['artifacts'] = self._build_artifacts(model)
+        self._save_registry()
+        return model
+    
+    def _benchmark(self, model):
+        from mlops.evaluation.benchmark import run_benchmark
+        
+        profile = run_benchmark(Path(model['path']) / model['weights_file'], model.get('architecture', 'efficientnet'),
+                                artifacts_dir=self.artifacts_dir, sha256=model['weights_sha256'])
+        rss = f", peak RSS {profile['peak_rss_mb']:.0f} MB" if profile['peak_rss_mb'] is not None else ''
+        print(f"   Benchmark ({profile['engine']}, {profile['threads']} thread): "
+              f"p50 {profile['latency_p50_ms']:.1f} ms, p99 {profile['latency_p99_ms']:.1f} ms, "
+              f"{profile['throughput_per_s']:.1f} img/s at batch {profile['batch_size']}{rss}, "
+              f"load {profile['load_time_ms']:.0f} ms")
+        return profile
+    
+    def benchmark_model(self, version):
+        """
+        (Re)run the CPU benchmark of a registered version on this host
+        
+        Returns:
+            Updated model metadata
+        """
+        model = self.get_model(version)
+        if 'weights_sha256' not in model:
+            model = self.export_weights(version)
+        model['performance'] = self._benchmark(model)
+        self._save_registry()
+        return model
+    
     def list_models(self):
         """List all registered models"""
         return self.registry['models']
@@ -100,10 +223,26 @@ class ModelRegistry:
         self._save_registry()
         print(f"✅ Model {version} promoted to staging")
     
-    def promote_to_production(self, version):
-        """Promote model to production"""
+    def promote_to_production(self, version, force=False, latency_budget=None):
+        """
+        Promote model to production
+        
+        Args:
+            version: Model version
+            force: Skip the latency budget check (e.g. for a rollback)
+            latency_budget: Override of LATENCY_BUDGET / the registry's budget
+        
+        Raises:
+            ValueError: The model is slower than production by more than the budget
+        """
         model = self.get_model(version)
         
+        if not force:
+            violations = self.check_latency_budget(version, latency_budget)
+            if violations:
+                raise ValueError(f"Model {version} exceeds the latency budget: {'; '.join(violations)} "
+                                 f"(use force=True / --force to promote anyway)")
+        
         old_production = self.registry.get('production_version')
         self.registry['production_version'] = version
         
@@ -119,8 +258,65 @@ class ModelRegistry:
         if old_production:
             print(f"   Previous version {old_production} archived")
     
+    def _comparable_profiles(self, model1, model2):
+        """
+        Performance profiles of two models measured under the same conditions, or (None, None)
+        
+        Absolute timings only compare on the same host and torch version:
+        profiles taken elsewhere are re-measured here and saved, so later
+        comparisons on this host reuse them.
+        """
+        from mlops.evaluation.benchmark import host_details, same_host
+        
+        if not model1.get('performance') or not model2.get('performance'):
+            return None, None
+        if not same_host(model1['performance'], model2['performance']):
+            host = host_details(model1['performance'].get('threads', 1))
+            for model in (model1, model2):
+                profile = model['performance']
+                if not same_host(profile, host):
+                    print(f"   {model['version']} was benchmarked on {profile.get('machine')} with torch "
+                          f"{profile.get('torch_version')}, re-benchmarking on this host...")
+                    self.benchmark_model(model['version'])
+        return model1['performance'], model2['performance']
+    
+    def check_latency_budget(self, version, latency_budget=None):
+        """
+        Latency regressions of a version against production beyond the budget
+        
+        Versions without a performance profile (or with no production model
+        to compare to) pass.
+        
+        Returns:
+            List of violation messages (empty if within budget)
+        """
+        from mlops.evaluation.benchmark import compare_profiles
+        
+        production = self.registry.get('production_version')
+        if not production or production == version:
+            return []
+        budget = latency_budget or self.registry.get('latency_budget', LATENCY_BUDGET)
+        
+        baseline, candidate = self._comparable_profiles(self.get_model(production), self.get_model(version))
+        if baseline is None:
+            print(f"⚠️  No benchmark for {version} or {production}, latency budget not checked")
+            return []
+        changes = compare_profiles(baseline, candidate)
+        return [f"{field} {changes[field]['baseline']:.2f} -> {changes[field]['candidate']:.2f} "
+                f"({changes[field]['change']:+.1%}, budget {limit:+.0%})"
+                for field, limit in budget.items()
+                if field in changes and changes[field]['change'] > limit]
+    
     def compare_models(self, version1, version2):
-        """Compare two model versions"""
+        """
+        Compare two model versions
+        
+        Returns:
+            Dict of performance fields where version2 is worse than version1
+            -> {'baseline', 'candidate', 'change'} (change > 0 is worse)
+        """
+        from mlops.evaluation.benchmark import PROFILE_FIELDS, compare_profiles
+        
         model1 = self.get_model(version1)
         model2 = self.get_model(version2)
         
@@ -138,6 +334,21 @@ class ModelRegistry:
                 diff = value - model1['metrics'][metric]
                 pct = (diff / model1['metrics'][metric] * 100) if model1['metrics'][metric] > 0 else 0
                 print(f"    Improvement: {diff:+.4f} ({pct:+.2f}%)")
+        
+        baseline, candidate = self._comparable_profiles(model1, model2)
+        if baseline is None:
+            print(f"\n⏱️  Performance: no benchmark for {version1 if not model1.get('performance') else version2}")
+            return {}
+        
+        changes = compare_profiles(baseline, candidate)
+        regressions = {field: change for field, change in changes.items() if change['change'] > 0}
+        print(f"\n⏱️  Performance ({candidate['engine']}, {candidate['threads']} thread, {candidate['machine']}):")
+        for field, change in changes.items():
+            direction = 'higher' if PROFILE_FIELDS[field] else 'lower'
+            flag = '⚠️ ' if field in regressions else '✓'
+            print(f"  {flag} {field}: {change['baseline']:.2f} -> {change['candidate']:.2f} "
+                  f"({change['change']:+.1%} {'worse' if change['change'] > 0 else 'better'}, {direction} is worse)")
+        return regressions
     
     def get_production_model(self):
         """Get current production model"""
@@ -145,6 +356,24 @@ class ModelRegistry:
         if not version:
             raise ValueError("No production model set")
         return self.get_model(version)
+    
+    def set_reference_histograms(self, version, histograms):
+        """
+        Store drift reference histograms with a model version
+        
+        Args:
+            version: Model version
+            histograms: Dict of feature -> {'edges': [...], 'counts': [...]}
+        """
+        model = self.get_model(version)
+        model['reference_histograms'] = histograms
+        self._save_registry()
+        print(f"✅ Reference histograms stored for {version}: {', '.join(histograms)}")
+    
+    def get_reference_histograms(self, version=None):
+        """Drift reference histograms of a version (default: production), or None"""
+        model = self.get_model(version) if version else self.get_production_model()
+        return model.get('reference_histograms')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,280 @@
+"""
+Knowledge Distillation
+Trains the small DeepfakeStudent (MobileNetV3-small) against the
+DeepfakeEfficientNet teacher on precomputed face-crop shards
+
+Teacher logits are computed once up front (one teacher pass per crop, not
+per epoch); the student then trains on a mix of the softened teacher
+targets and the hard labels. The best student is registered in the
+ModelRegistry with accuracy, AUC and latency next to the teacher's.
+
+Usage:
+    python mlops/training/distill.py --shards mlops/data/shards/train --version v1.1.0-student
+    python mlops/deployment/deploy.py --version v1.1.0-student --env production
+    DEEPFAKE_SERVING_MODEL=student python backend_server.py
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+import torch.optim as optim
+from torch.utils.data import Dataset, Subset
+from tqdm import tqdm
+
+# Add repository root and mlops to path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from deepfake_detection import DEVICE, NORM_MEAN, NORM_STD, SERVING_MODEL, DeepfakeStudent, load_model, model
+from face_alignment import uint8_to_input
+from evaluation.evaluate import classification_metrics
+from registry.model_registry import ModelRegistry
+from train_model import BatchTransform, DeepfakeDataset, build_loader
+
+# Speed/quality targets the student is reported against
+TARGET_SPEEDUP = 3.0
+MAX_AUC_DROP = 0.02
+
+
+class DistillationDataset(Dataset):
+    """Shard crops as (uint8 image, label, teacher logit)"""
+
+    def __init__(self, shard_dir, teacher_logits, image_size=224):
+        self.crops = DeepfakeDataset(shard_dir, mode='shards', uint8_output=True, image_size=image_size)
+        self.teacher_logits = teacher_logits
+
+    def __len__(self):
+        return len(self.crops)
+
+    def __getitem__(self, idx):
+        image, label = self.crops[idx]
+        return image, label, float(self.teacher_logits[idx])
+
+
+def compute_teacher_logits(teacher, store, batch_size=64):
+    """
+    One teacher pass over every crop in a FaceShardStore
+
+    Returns:
+        float32 array of fake logits, aligned with the store
+    """
+    logits = []
+    with torch.no_grad():
+        for crops, _ in tqdm(store.iter_batches(batch_size), desc='Teacher logits',
+                             total=int(np.ceil(len(store) / batch_size))):
+            inputs = uint8_to_input(crops, NORM_MEAN, NORM_STD, DEVICE)
+            logits.append(teacher(inputs).view(-1).float().cpu().numpy())
+    return np.concatenate(logits) if logits else np.empty(0, dtype=np.float32)
+
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature=4.0, alpha=0.7):
+    """
+    Binary knowledge-distillation loss for single-logit models
+
+    alpha weights the soft term (BCE against the teacher's temperature-softened
+    probability, scaled by T^2 to keep gradient magnitudes comparable) against
+    the hard-label BCE.
+    """
+    soft_targets = torch.sigmoid(teacher_logits / temperature)
+    soft = F.binary_cross_entropy_with_logits(student_logits / temperature, soft_targets) * temperature ** 2
+    hard = F.binary_cross_entropy_with_logits(student_logits, labels.float())
+    return alpha * soft + (1 - alpha) * hard
+
+
+def predict_probabilities(net, loader, batch_transform):
+    """Fake probabilities and labels over a loader"""
+    net.eval()
+    probs, labels = [], []
+    with torch.no_grad():
+        for images, batch_labels, _ in loader:
+            logits = net(batch_transform(images)).view(-1)
+            probs.append(torch.sigmoid(logits).float().cpu().numpy())
+            labels.append(batch_labels.numpy())
+    return np.concatenate(probs), np.concatenate(labels)
+
+
+def measure_latency(net, runs=50, warmup=5):
+    """Median single-face latency in ms (batch size 1, as in real-time serving)"""
+    net.eval()
+    x = torch.randn(1, 3, 224, 224, device=DEVICE)
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + runs):
+            start = time.perf_counter()
+            net(x)
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def distill(shard_dir, output_dir, version, epochs=10, batch_size=64, learning_rate=1e-3,
+            temperature=4.0, alpha=0.7, val_split=0.15, num_workers=None,
+            register=True, registry_dir='mlops/registry'):
+    """
+    Distill the serving teacher into a DeepfakeStudent
+
+    Args:
+        shard_dir: Face-crop shard directory (mlops/preprocessing/face_shards.py)
+        output_dir: Registry models directory
+        version: Student model version string
+        epochs: Training epochs
+        batch_size: Batch size
+        learning_rate: Adam learning rate
+        temperature: Softening temperature for teacher targets
+        alpha: Weight of the soft (teacher) loss vs the hard-label loss
+        val_split: Fraction of crops held out for validation
+        num_workers: Loader processes (default: min(8, CPU count))
+        register: Register the student in the ModelRegistry
+        registry_dir: Registry root
+
+    Returns:
+        Dict with the student metadata
+    """
+    teacher = model if SERVING_MODEL == 'efficientnet' else load_model('efficientnet')
+    teacher.eval()
+
+    dataset = DistillationDataset(shard_dir, None)
+    store = dataset.crops.shard_store
+    if len(store) == 0:
+        raise ValueError(f"No face crops in {shard_dir}")
+    dataset.teacher_logits = compute_teacher_logits(teacher, store)
+
+    # Fixed split so teacher and student are scored on the same held-out crops
+    indices = torch.randperm(len(dataset), generator=torch.Generator().manual_seed(42)).tolist()
+    val_size = max(1, int(len(dataset) * val_split))
+    train_set, val_set = Subset(dataset, indices[val_size:]), Subset(dataset, indices[:val_size])
+
+    loader_config = {'num_workers': num_workers}
+    device = torch.device(DEVICE)
+    train_loader = build_loader(train_set, batch_size, True, loader_config, device)
+    val_loader = build_loader(val_set, batch_size, False, loader_config, device)
+    batch_transform = BatchTransform(device, augment=True)
+
+    student = DeepfakeStudent(pretrained=True).to(device)
+    optimizer = optim.Adam(student.parameters(), lr=learning_rate)
+
+    teacher_probs, val_labels = predict_probabilities(teacher, val_loader, batch_transform)
+    teacher_metrics = classification_metrics(val_labels, teacher_probs)
+
+    output_path = Path(output_dir) / version
+    output_path.mkdir(parents=True, exist_ok=True)
+    best_score, best_metrics = -1.0, None
+    history = []
+
+    print(f"\n🚀 Distilling into MobileNetV3-small for {epochs} epochs "
+          f"({len(train_set)} train / {len(val_set)} val crops, T={temperature}, alpha={alpha})")
+
+    for epoch in range(epochs):
+        student.train()
+        running_loss = 0.0
+        pbar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{epochs}')
+        for images, labels, teacher_logits in pbar:
+            images = batch_transform(images, train=True)
+            student_logits = student(images).view(-1)
+            loss = distillation_loss(student_logits, teacher_logits.to(device).float(), labels.to(device),
+                                     temperature, alpha)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item()
+            pbar.set_postfix({'loss': loss.item()})
+
+        probs, _ = predict_probabilities(student, val_loader, batch_transform)
+        metrics = classification_metrics(val_labels, probs)
+        metrics['train_loss'] = running_loss / max(len(train_loader), 1)
+        history.append(metrics)
+        print(f"Epoch {epoch+1}: loss {metrics['train_loss']:.4f}, val acc {metrics['accuracy']:.2%}"
+              + (f", val AUC {metrics['auc']:.4f}" if 'auc' in metrics else ''))
+
+        score = metrics.get('auc', metrics['accuracy'])
+        if score > best_score:
+            best_score, best_metrics = score, metrics
+            torch.save({
+                'epoch': epoch,
+                'architecture': 'student',
+                'model_state_dict': student.state_dict(),
+                'val_metrics': metrics,
+                'temperature': temperature,
+                'alpha': alpha
+            }, output_path / 'model.pth')
+
+    # Latency of the best student vs the teacher, same input and thread count
+    student.load_state_dict(torch.load(output_path / 'model.pth', map_location=DEVICE)['model_state_dict'])
+    student_latency = measure_latency(student)
+    teacher_latency = measure_latency(teacher)
+
+    metrics = {
+        'accuracy': best_metrics['accuracy'],
+        'latency_ms': student_latency,
+        'teacher_accuracy': teacher_metrics['accuracy'],
+        'teacher_latency_ms': teacher_latency,
+        'speedup': teacher_latency / student_latency if student_latency > 0 else 0.0
+    }
+    if 'auc' in best_metrics:
+        metrics['auc'] = best_metrics['auc']
+        metrics['teacher_auc'] = teacher_metrics['auc']
+
+    metadata = {
+        'version': version,
+        'architecture': 'student',
+        'timestamp': datetime.now().isoformat(),
+        'shard_dir': str(shard_dir),
+        'metrics': metrics,
+        'history': history,
+        'epochs_trained': epochs,
+        'temperature': temperature,
+        'alpha': alpha
+    }
+    with open(output_path / 'metadata.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    print_distillation_report(metrics)
+
+    if register:
+        ModelRegistry(registry_dir).register_model(
+            version, metrics, description='MobileNetV3-small distilled from the EfficientNet-B0 teacher',
+            architecture='student')
+
+    return metadata
+
+
+def print_distillation_report(metrics):
+    print("\n" + "=" * 60)
+    print("📊 STUDENT vs TEACHER")
+    print("=" * 60)
+    print(f"  Latency (batch 1): student {metrics['latency_ms']:.2f} ms, "
+          f"teacher {metrics['teacher_latency_ms']:.2f} ms ({metrics['speedup']:.1f}x)")
+    print(f"  Accuracy: student {metrics['accuracy']:.2%}, teacher {metrics['teacher_accuracy']:.2%}")
+    if 'auc' in metrics:
+        print(f"  AUC: student {metrics['auc']:.4f}, teacher {metrics['teacher_auc']:.4f}")
+    speed_ok = metrics['speedup'] >= TARGET_SPEEDUP
+    auc_ok = 'auc' not in metrics or metrics['teacher_auc'] - metrics['auc'] <= MAX_AUC_DROP
+    print(f"  {'✓' if speed_ok else '⚠️ '} Speedup target {TARGET_SPEEDUP:.0f}x")
+    print(f"  {'✓' if auc_ok else '⚠️ '} AUC within {MAX_AUC_DROP} of teacher")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distill the deepfake detector into a small CPU student')
+    parser.add_argument('--shards', type=str, required=True, help='Face-crop shard directory')
+    parser.add_argument('--output', type=str, default='mlops/registry/models', help='Output directory')
+    parser.add_argument('--version', type=str, required=True, help='Student model version')
+    parser.add_argument('--epochs', type=int, default=10, help='Training epochs')
+    parser.add_argument('--batch-size', type=int, default=64, help='Batch size')
+    parser.add_argument('--lr', type=float, default=1e-3, help='Learning rate')
+    parser.add_argument('--temperature', type=float, default=4.0, help='Distillation temperature')
+    parser.add_argument('--alpha', type=float, default=0.7, help='Weight of the teacher (soft) loss')
+    parser.add_argument('--workers', type=int, default=None, help='Loader processes')
+    parser.add_argument('--no-register', action='store_true', help='Do not register in the model registry')
+
+    args = parser.parse_args()
+
+    distill(args.shards, args.output, args.version, args.epochs, args.batch_size, args.lr,
+            args.temperature, args.alpha, num_workers=args.workers, register=not args.no_register)
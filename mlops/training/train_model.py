@@ -5,13 +5,23 @@ Trains deepfake detection model on videos or images
 
 import os
 import sys
+import time
+import queue
+import socket
 import argparse
+import tempfile
+import threading
 import yaml
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
+import torch.distributed as dist
+import torch.multiprocessing as mp
 from torch.utils.data import DataLoader, Dataset
-from torchvision import transforms
+from torch.utils.data.distributed import DistributedSampler
+import torchvision.transforms.functional as TF
+from torchvision.io import ImageReadMode, decode_image, read_file
 from PIL import Image
 import cv2
 from pathlib import Path
@@ -22,95 +32,232 @@ import numpy as np
 
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent.parent))
+sys.path.append(str(Path(__file__).parent.parent))
 
-from efficientnet_pytorch import EfficientNet
+from deepfake_models import build_model
+from preprocessing.face_shards import FaceShardStore
+from preprocessing.dedup import load_sample_list
+from preprocessing.manifest import MANIFEST_NAME, build_manifest, group_split, load_manifest, source_of
+from video_io import read_frame, sample_frame_indices, video_frame_count
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+# Trained architecture: the serving model, so model.pth registers and deploys as-is
+ARCHITECTURE = 'efficientnet'
+
+# Smallest per-rank batch: the classifier head's BatchNorm1d cannot train on one sample
+MIN_RANK_BATCH = 2
+
+
+def fake_logit_loss(logits, labels):
+    """BCE on the serving model's single fake logit (labels: 0 = real, 1 = fake)"""
+    return F.binary_cross_entropy_with_logits(logits.view(-1), labels.float())
+
+
+def predicted_labels(logits):
+    """0 = real / 1 = fake at probability 0.5"""
+    return (logits.view(-1) > 0).long()
 
 
 class DeepfakeDataset(Dataset):
     """Dataset for deepfake detection - supports images and video frames"""
     
-    def __init__(self, data_dir, transform=None, mode='images'):
+    def __init__(self, data_dir, transform=None, mode='images', frames_per_video=10,
+                 frame_cache_dir=None, cache_frame_size=224, uint8_output=False, image_size=224,
+                 manifest=None, refresh_manifest=False, sample_list=None):
         """
         Args:
             data_dir: Directory containing data
             transform: Image transformations
-            mode: 'images' or 'videos'
+            mode: 'images', 'videos' or 'shards' (data_dir is a face-crop
+                shard directory built by mlops/preprocessing/face_shards.py)
+            frames_per_video: Frames sampled per video (video mode)
+            frame_cache_dir: Optional directory for a memory-mapped cache of
+                decoded video frames (video mode)
+            cache_frame_size: Side length frames are resized to in the cache
+            uint8_output: Return uint8 (3, image_size, image_size) tensors
+                instead of PIL images; normalization is left to BatchTransform
+            image_size: Output side length when uint8_output is set
+            manifest: Manifest file for image mode (default:
+                data_dir/manifest.sqlite, built on first use)
+            refresh_manifest: Re-scan data_dir and update the manifest
+                incrementally before loading
+            sample_list: Optional file of data_dir-relative paths to keep
+                (e.g. near-duplicate-free list from mlops/preprocessing/dedup.py);
+                images mode only
+        
+        Raises:
+            ValueError: sample_list with a mode other than 'images'
         """
         self.data_dir = Path(data_dir)
         self.transform = transform
         self.mode = mode
+        self.frames_per_video = frames_per_video
+        self.uint8_output = uint8_output
+        self.image_size = image_size
         self.samples = []
+        self.groups = []  # source video per sample, for group-aware splits
+        self.manifest = Path(manifest) if manifest else self.data_dir / MANIFEST_NAME
+        self.refresh_manifest = refresh_manifest
+        self.sample_list = sample_list
+        
+        self.frame_cache_dir = Path(frame_cache_dir) if frame_cache_dir else None
+        self.cache_frame_size = cache_frame_size
+        self._cache_frames = None  # memmaps are opened lazily in each worker
+        self._cache_filled = None
+        self.shard_store = None
+        
+        if sample_list and mode != 'images':
+            # dedup.py only lists manifest images; silently training on everything would hide that
+            raise ValueError(f"sample_list is only supported in images mode, not '{mode}'")
         
         # Load data
         if mode == 'images':
             self._load_images()
         elif mode == 'videos':
             self._load_videos()
+            if self.frame_cache_dir is not None:
+                self._init_frame_cache()
+        elif mode == 'shards':
+            self._load_shards()
     
     def _load_images(self):
-        """Load image dataset"""
-        # Expect structure: data_dir/real/*.jpg, data_dir/fake/*.jpg
-        real_dir = self.data_dir / 'real'
-        fake_dir = self.data_dir / 'fake'
+        """Load image dataset from the manifest (built on first use)"""
+        # Expect structure: data_dir/{real,Real}/*.jpg, data_dir/{fake,Fake}/*.jpg
+        if self.refresh_manifest or not self.manifest.exists():
+            stats = build_manifest(self.data_dir, self.manifest)
+            print(f"Manifest {self.manifest}: {stats['added']} added, {stats['updated']} updated, "
+                  f"{stats['removed']} removed")
         
-        if real_dir.exists():
-            for img_path in real_dir.glob('*.jpg') + list(real_dir.glob('*.png')):
-                self.samples.append((str(img_path), 0))  # 0 = real
-        
-        if fake_dir.exists():
-            for img_path in fake_dir.glob('*.jpg') + list(fake_dir.glob('*.png')):
-                self.samples.append((str(img_path), 1))  # 1 = fake
+        keep = load_sample_list(self.sample_list) if self.sample_list else None
+        for path, label, source_video in load_manifest(self.manifest, self.data_dir):
+            if keep is not None and Path(path).relative_to(self.data_dir).as_posix() not in keep:
+                continue
+            self.samples.append((path, label))  # 0 = real, 1 = fake
+            self.groups.append(source_video)
         
         print(f"Loaded {len(self.samples)} images ({len([s for s in self.samples if s[1]==0])} real, {len([s for s in self.samples if s[1]==1])} fake)")
     
     def _load_videos(self):
-        """Load video dataset - extract frames"""
+        """Index video frames as (video path, frame index, label) - decoded lazily"""
         # Expect structure: data_dir/real/*.mp4, data_dir/fake/*.mp4
-        real_dir = self.data_dir / 'real'
-        fake_dir = self.data_dir / 'fake'
+        for class_dir, label in (('real', 0), ('fake', 1)):
+            video_dir = self.data_dir / class_dir
+            if not video_dir.exists():
+                continue
+            for video_path in sorted(video_dir.glob('*.mp4')):
+                for frame_idx in sample_frame_indices(video_frame_count(video_path), self.frames_per_video):
+                    self.samples.append((str(video_path), frame_idx, label))
+                    self.groups.append(str(video_path))
         
-        if real_dir.exists():
-            for video_path in real_dir.glob('*.mp4'):
-                frames = self._extract_frames(video_path, max_frames=10)
-                for frame in frames:
-                    self.samples.append((frame, 0))  # 0 = real
+        print(f"Indexed {len(self.samples)} frames from videos")
+    
+    def _load_shards(self):
+        """Use pre-aligned face crops; samples are (shard store index, label)"""
+        self.shard_store = FaceShardStore(self.data_dir)
+        self.samples = [(idx, int(label)) for idx, label in enumerate(self.shard_store.labels)]
+        # Crops from extracted frames group by the video the frame came from
+        self.groups = [source_of(self.shard_store.source(idx)[0])[0] for idx in range(len(self.samples))]
         
-        if fake_dir.exists():
-            for video_path in fake_dir.glob('*.mp4'):
-                frames = self._extract_frames(video_path, max_frames=10)
-                for frame in frames:
-                    self.samples.append((frame, 1))  # 1 = fake
+        print(f"Loaded {len(self.samples)} face crops from {len(self.shard_store.index['shards'])} shards")
+    
+    def _init_frame_cache(self):
+        """Create (or reuse) the on-disk frame cache for the current index"""
+        self.frame_cache_dir.mkdir(parents=True, exist_ok=True)
+        index_file = self.frame_cache_dir / 'index.json'
+        index = {
+            'samples': [[path, idx] for path, idx, _ in self.samples],
+            'frame_size': self.cache_frame_size
+        }
         
-        print(f"Loaded {len(self.samples)} frames from videos")
+        shape = (len(self.samples), self.cache_frame_size, self.cache_frame_size, 3)
+        frames_file, filled_file = self._cache_paths()
+        
+        reuse = False
+        if index_file.exists() and frames_file.exists() and filled_file.exists():
+            with open(index_file, 'r') as f:
+                reuse = json.load(f) == index
+        
+        if not reuse:
+            # Index changed (or first run): start with an empty cache
+            np.memmap(frames_file, dtype=np.uint8, mode='w+', shape=shape).flush()
+            np.memmap(filled_file, dtype=np.uint8, mode='w+', shape=(len(self.samples),)).flush()
+            with open(index_file, 'w') as f:
+                json.dump(index, f)
+        
+        cached = int(np.memmap(filled_file, dtype=np.uint8, mode='r').sum()) if self.samples else 0
+        print(f"Frame cache: {self.frame_cache_dir} ({cached}/{len(self.samples)} frames cached)")
+    
+    def _cache_paths(self):
+        return self.frame_cache_dir / 'frames.u8', self.frame_cache_dir / 'filled.u8'
+    
+    def _open_frame_cache(self):
+        frames_file, filled_file = self._cache_paths()
+        shape = (len(self.samples), self.cache_frame_size, self.cache_frame_size, 3)
+        self._cache_frames = np.memmap(frames_file, dtype=np.uint8, mode='r+', shape=shape)
+        self._cache_filled = np.memmap(filled_file, dtype=np.uint8, mode='r+', shape=(len(self.samples),))
+    
+    def __getstate__(self):
+        # Never pickle memmaps into DataLoader workers; each worker reopens them
+        state = self.__dict__.copy()
+        state['_cache_frames'] = None
+        state['_cache_filled'] = None
+        return state
     
-    def _extract_frames(self, video_path, max_frames=10):
-        """Extract frames from video"""
-        frames = []
-        cap = cv2.VideoCapture(str(video_path))
+    def _load_video_frame(self, idx):
+        """Decode one indexed frame (RGB), going through the frame cache if enabled"""
+        video_path, frame_idx, _ = self.samples[idx]
         
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        frame_indices = np.linspace(0, total_frames-1, max_frames, dtype=int)
+        if self.frame_cache_dir is not None:
+            if self._cache_frames is None:
+                self._open_frame_cache()
+            if self._cache_filled[idx]:
+                return np.array(self._cache_frames[idx])
         
-        for idx in frame_indices:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if ret:
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frames.append(frame_rgb)
+        frame = read_frame(video_path, frame_idx)
+        if frame is None:
+            raise RuntimeError(f"Could not decode frame {frame_idx} of {video_path}")
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
-        cap.release()
-        return frames
+        if self.frame_cache_dir is not None:
+            size = self.cache_frame_size
+            frame_rgb = cv2.resize(frame_rgb, (size, size), interpolation=cv2.INTER_AREA)
+            self._cache_frames[idx] = frame_rgb
+            self._cache_filled[idx] = 1
+        
+        return frame_rgb
     
     def __len__(self):
         return len(self.samples)
     
+    def _load_uint8(self, idx):
+        """Decode sample idx straight to a uint8 (3, H, W) tensor, resized to image_size"""
+        if self.mode == 'images':
+            image = decode_image(read_file(self.samples[idx][0]), mode=ImageReadMode.RGB)
+        elif self.mode == 'shards':
+            # Copy out of the read-only shard map; torch needs writable memory
+            image = torch.from_numpy(np.array(self.shard_store[idx][0])).permute(2, 0, 1)
+        else:
+            image = torch.from_numpy(self._load_video_frame(idx)).permute(2, 0, 1)
+        
+        if tuple(image.shape[1:]) != (self.image_size, self.image_size):
+            image = TF.resize(image, [self.image_size, self.image_size], antialias=True)
+        return image.contiguous()
+    
     def __getitem__(self, idx):
+        if self.uint8_output:
+            return self._load_uint8(idx), self.samples[idx][-1]
+        
         if self.mode == 'images':
             img_path, label = self.samples[idx]
             image = Image.open(img_path).convert('RGB')
+        elif self.mode == 'shards':
+            crop, label = self.shard_store[idx]
+            image = Image.fromarray(crop)
         else:
-            image, label = self.samples[idx]
-            image = Image.fromarray(image)
+            label = self.samples[idx][2]
+            image = Image.fromarray(self._load_video_frame(idx))
         
         if self.transform:
             image = self.transform(image)
@@ -118,7 +265,391 @@ class DeepfakeDataset(Dataset):
         return image, label
 
 
-def train_model(config_path, data_dir, output_dir, version):
+def collate_uint8(batch):
+    """
+    Stack (uint8 image, label, ...) samples; images stay uint8 until BatchTransform
+    
+    Extra per-sample scalars (e.g. teacher logits) are collated as tensors too.
+    """
+    images = torch.stack([sample[0] for sample in batch])
+    labels = torch.tensor([sample[1] for sample in batch], dtype=torch.long)
+    extras = [torch.tensor([sample[i] for sample in batch]) for i in range(2, len(batch[0]))]
+    return (images, labels, *extras)
+
+
+def _init_loader_worker(worker_id):
+    # Loader workers already run one per core; keep OpenCV from adding threads
+    cv2.setNumThreads(1)
+
+
+class BatchTransform:
+    """
+    Normalization and augmentation for whole uint8 batches
+    
+    Runs as tensor ops on the training device once per batch, instead of
+    PIL/float transforms per sample inside the loader workers.
+    """
+    
+    def __init__(self, device, augment=False, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+        self.device = device
+        self.augment = augment
+        self.mean = torch.tensor(mean, device=device).view(1, 3, 1, 1)
+        self.std = torch.tensor(std, device=device).view(1, 3, 1, 1)
+    
+    def __call__(self, images, train=False):
+        """
+        Args:
+            images: uint8 tensor (N, 3, H, W)
+            train: Apply random augmentation (if enabled)
+        
+        Returns:
+            Normalized float tensor (N, 3, H, W) on the device
+        """
+        images = images.to(self.device, non_blocking=True).float().div_(255.0)
+        
+        if train and self.augment:
+            n = images.size(0)
+            shape = (n, 1, 1, 1)
+            # Horizontal flip for half the batch
+            flip = torch.rand(shape, device=self.device) < 0.5
+            images = torch.where(flip, images.flip(3), images)
+            # Per-image brightness and contrast jitter
+            brightness = torch.empty(shape, device=self.device).uniform_(0.8, 1.2)
+            contrast = torch.empty(shape, device=self.device).uniform_(0.8, 1.2)
+            mean = images.mean(dim=(1, 2, 3), keepdim=True)
+            images = (((images - mean) * contrast + mean) * brightness).clamp_(0.0, 1.0)
+        
+        return (images - self.mean) / self.std
+
+
+def build_loader(dataset, batch_size, shuffle, data_config, device, sampler=None, default_workers=None):
+    """
+    DataLoader tuned for uint8 batches: worker processes, persistent workers,
+    prefetching and pinned memory (CUDA only by default)
+    
+    Training loaders (shuffle) drop a final single-sample batch, which the
+    BatchNorm1d layers of the classifier head cannot train on.
+    """
+    num_workers = data_config.get('num_workers')
+    if num_workers is None:
+        num_workers = default_workers if default_workers is not None else min(8, os.cpu_count() or 1)
+    pin_memory = data_config.get('pin_memory')
+    if pin_memory is None:
+        pin_memory = device.type == 'cuda'
+    
+    worker_options = {}
+    if num_workers > 0:
+        worker_options = {
+            'persistent_workers': data_config.get('persistent_workers', True),
+            'prefetch_factor': data_config.get('prefetch_factor', 4),
+            'worker_init_fn': _init_loader_worker
+        }
+    
+    drop_last = shuffle and len(sampler if sampler is not None else dataset) % batch_size == 1
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle and sampler is None, sampler=sampler,
+                      num_workers=num_workers, drop_last=drop_last,
+                      pin_memory=pin_memory, collate_fn=collate_uint8, **worker_options)
+
+
+def prepare_manifest(config, data_dir):
+    """
+    Build (or, with data.refresh_manifest, re-scan) the image manifest once
+    
+    Runs in the launching process before any rank or loader starts, so
+    data-parallel ranks only read the finished manifest.
+    """
+    data_config = config.get('data', {})
+    if data_config.get('mode', 'images') != 'images':
+        return
+    manifest = Path(data_config.get('manifest') or Path(data_dir) / MANIFEST_NAME)
+    if data_config.get('refresh_manifest', False) or not manifest.exists():
+        stats = build_manifest(data_dir, manifest)
+        print(f"Manifest {manifest}: {stats['added']} added, {stats['updated']} updated, "
+              f"{stats['removed']} removed")
+
+
+def create_data_loaders(config, data_dir, device, rank=0, world_size=1):
+    """
+    Build the dataset, train/val loaders and the per-batch transform
+    
+    With world_size > 1 each rank loads its own DistributedSampler shard
+    and the configured batch size is split evenly between ranks, so the
+    global batch (and the learning-rate behaviour) matches single-process
+    training (see data_parallel_ranks). Validation shards are strided and
+    unpadded, so every validation sample is scored exactly once.
+    
+    Returns:
+        tuple: (dataset, train_loader, val_loader, batch_transform)
+    
+    Raises:
+        ValueError: world_size does not split the batch into equal shares
+            of at least MIN_RANK_BATCH
+    """
+    data_config = config.get('data', {})
+    dataset = DeepfakeDataset(
+        data_dir, mode=data_config.get('mode', 'images'),
+        frames_per_video=data_config.get('frames_per_video', 10),
+        frame_cache_dir=data_config.get('frame_cache_dir'),
+        uint8_output=True, image_size=data_config.get('image_size', 224),
+        # Built or refreshed once up front by prepare_manifest, never per rank
+        manifest=data_config.get('manifest'), refresh_manifest=False,
+        sample_list=data_config.get('sample_list')
+    )
+    
+    # Split dataset (seeded so a resumed run trains and validates on the same split)
+    val_fraction = data_config.get('val_split', 0.15)
+    test_fraction = data_config.get('test_split', 0.15)
+    split_seed = data_config.get('split_seed', 42)
+    if data_config.get('group_split', True):
+        # Keep every frame of a source video in one split
+        train_idx, val_idx, test_idx = group_split(dataset.groups, val_fraction, test_fraction, split_seed)
+        train_dataset, val_dataset, test_dataset = (torch.utils.data.Subset(dataset, idx)
+                                                    for idx in (train_idx, val_idx, test_idx))
+    else:
+        train_size = int((1 - val_fraction - test_fraction) * len(dataset))
+        val_size = int(val_fraction * len(dataset))
+        test_size = len(dataset) - train_size - val_size
+        train_dataset, val_dataset, test_dataset = torch.utils.data.random_split(
+            dataset, [train_size, val_size, test_size],
+            generator=torch.Generator().manual_seed(split_seed)
+        )
+    
+    batch_size = config.get('training', {}).get('batch_size', 32)
+    train_sampler = default_workers = None
+    if world_size > 1:
+        if batch_size % world_size or batch_size // world_size < MIN_RANK_BATCH:
+            raise ValueError(f"batch_size {batch_size} cannot be split into {world_size} equal per-rank batches "
+                             f"of at least {MIN_RANK_BATCH} (use data_parallel_ranks)")
+        batch_size //= world_size
+        train_sampler = DistributedSampler(train_dataset, world_size, rank, shuffle=True, seed=split_seed)
+        # DistributedSampler pads with repeated samples to even out ranks, which
+        # would skew the metrics early stopping and model selection use
+        val_dataset = torch.utils.data.Subset(val_dataset, range(rank, len(val_dataset), world_size))
+        # Cores are already split between ranks; one loader process each by default
+        default_workers = 1
+    
+    train_loader = build_loader(train_dataset, batch_size, True, data_config, device, train_sampler, default_workers)
+    val_loader = build_loader(val_dataset, batch_size, False, data_config, device, None, default_workers)
+    batch_transform = BatchTransform(device, augment=data_config.get('augmentation', False))
+    return dataset, train_loader, val_loader, batch_transform
+
+
+def measure_input_throughput(loader, model, criterion, optimizer, batch_transform, device, num_batches=20):
+    """
+    Images per second for the input pipeline alone vs the full training step
+    
+    The first batch of each pass is excluded (worker start-up).
+    
+    Returns:
+        Dict with loader_images_per_s, train_step_images_per_s and
+        input_time_fraction (loader time per image / step time per image)
+    """
+    def timed_pass(step):
+        seen, start = 0, None
+        for i, (images, labels) in enumerate(loader):
+            if i == 0:
+                start = time.perf_counter()
+                continue
+            step(images, labels)
+            seen += labels.size(0)
+            if i >= num_batches:
+                break
+        elapsed = time.perf_counter() - start if start is not None else 0.0
+        return seen / elapsed if elapsed > 0 else 0.0
+    
+    def load_only(images, labels):
+        batch_transform(images, train=True)
+    
+    def train_step(images, labels):
+        images = batch_transform(images, train=True)
+        labels = labels.to(device, non_blocking=True)
+        optimizer.zero_grad()
+        loss = criterion(model(images), labels)
+        loss.backward()
+        optimizer.step()
+    
+    model.train()
+    loader_rate = timed_pass(load_only)
+    step_rate = timed_pass(train_step)
+    return {
+        'loader_images_per_s': loader_rate,
+        'train_step_images_per_s': step_rate,
+        # Share of a training step the input pipeline would cost if not overlapped
+        'input_time_fraction': step_rate / loader_rate if loader_rate > 0 else 0.0
+    }
+
+
+def input_throughput_report(config_path, data_dir, num_batches=20):
+    """Print loader-only vs full-step throughput for the configured pipeline"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    
+    prepare_manifest(config, data_dir)
+    dataset, train_loader, _, batch_transform = create_data_loaders(config, data_dir, device)
+    model = build_model(ARCHITECTURE, pretrained=True).to(device)
+    criterion = fake_logit_loss
+    optimizer = optim.Adam(model.parameters(), lr=config.get('training', {}).get('learning_rate', 0.001))
+    
+    report = measure_input_throughput(train_loader, model, criterion, optimizer, batch_transform,
+                                      device, num_batches)
+    print("\n" + "=" * 60)
+    print("📊 TRAINING INPUT THROUGHPUT")
+    print("=" * 60)
+    print(f"  Loader workers: {train_loader.num_workers}, batch size: {train_loader.batch_size}")
+    print(f"  Loader only:     {report['loader_images_per_s']:.1f} images/s")
+    print(f"  Full train step: {report['train_step_images_per_s']:.1f} images/s")
+    print(f"  Input cost per step: {report['input_time_fraction']:.0%} of step time")
+    print("=" * 60)
+    return report
+
+
+def _snapshot(obj):
+    """Deep copy of a (nested) state dict with every tensor cloned to CPU"""
+    if torch.is_tensor(obj):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {key: _snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_snapshot(value) for value in obj)
+    return obj
+
+
+class CheckpointWriter:
+    """
+    Writes checkpoints from a background thread
+    
+    save() snapshots the state on the caller's thread (so training can keep
+    updating the weights) and returns; serialization and disk I/O happen on
+    the writer thread. Files are written to a temp name and renamed, so a
+    crash mid-write never leaves a truncated checkpoint behind.
+    """
+    
+    def __init__(self, max_pending=2):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            state, path = item
+            try:
+                tmp_path = path.with_name(path.name + '.tmp')
+                torch.save(state, tmp_path)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+    
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Checkpoint write failed: {error}") from error
+    
+    def save(self, state, path):
+        """Queue a snapshot of state for writing to path (blocks only if writes fall behind)"""
+        self._raise_error()
+        self._queue.put((_snapshot(state), Path(path)))
+    
+    def wait(self):
+        """Block until every queued checkpoint is on disk"""
+        self._queue.join()
+        self._raise_error()
+    
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+
+class EarlyStopping:
+    """Patience-based early stopping on a validation metric"""
+    
+    def __init__(self, patience=5, min_delta=0.0, mode='max'):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.mode = mode
+        self.best = None
+        self.epochs_without_improvement = 0
+    
+    def step(self, value):
+        """
+        Record an epoch's metric
+        
+        Returns:
+            True if the metric improved on the best so far
+        """
+        if self.best is None:
+            improved = True
+        elif self.mode == 'max':
+            improved = value > self.best + self.min_delta
+        else:
+            improved = value < self.best - self.min_delta
+        
+        if improved:
+            self.best = value
+            self.epochs_without_improvement = 0
+        else:
+            self.epochs_without_improvement += 1
+        return improved
+    
+    @property
+    def should_stop(self):
+        return self.epochs_without_improvement >= self.patience
+    
+    def state_dict(self):
+        return {'best': self.best, 'epochs_without_improvement': self.epochs_without_improvement}
+    
+    def load_state_dict(self, state):
+        self.best = state['best']
+        self.epochs_without_improvement = state['epochs_without_improvement']
+
+
+def data_parallel_ranks(nproc, batch_size):
+    """
+    Ranks to launch for a global batch: at most nproc, splitting batch_size
+    into equal per-rank batches of at least MIN_RANK_BATCH
+    
+    Uneven shares would change the gradient average and give ranks different
+    batch counts; per-rank batches of 1 cannot train the BatchNorm1d head.
+    """
+    for world_size in range(min(nproc, batch_size // MIN_RANK_BATCH), 1, -1):
+        if batch_size % world_size == 0:
+            return world_size
+    return 1
+
+
+def _find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _init_distributed(rank, world_size, port):
+    """Join the local gloo process group and split the cores between ranks"""
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(port)
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+    # One share of the cores per rank so intra-op threads do not oversubscribe
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+
+
+def _all_reduce_sum(values):
+    """Sum a list of numbers over all ranks (identity when not distributed)"""
+    if not dist.is_initialized():
+        return values
+    totals = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(totals)
+    return totals.tolist()
+
+
+def train_model(config_path, data_dir, output_dir, version, resume=False, nproc=1, epochs=None):
     """
     Train deepfake detection model
     
@@ -127,131 +658,239 @@ def train_model(config_path, data_dir, output_dir, version):
         data_dir: Path to training data
         output_dir: Path to save model
         version: Model version string
+        resume: Continue from output_dir/version/checkpoint.pth if it exists
+        nproc: Local data-parallel processes (torch.distributed, gloo); each
+            trains on its own DistributedSampler shard with synchronized gradients.
+            Capped by data_parallel_ranks so the batch splits evenly
+        epochs: Override training.epochs from the config
+    
+    Returns:
+        tuple: (model, metadata); with nproc > 1 the model holds the best weights
     """
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    prepare_manifest(config, data_dir)
+    
+    batch_size = config.get('training', {}).get('batch_size', 32)
+    world_size = data_parallel_ranks(nproc, batch_size)
+    if world_size < nproc:
+        print(f"⚠️  Using {world_size} of {nproc} processes: batch_size {batch_size} splits into equal "
+              f"per-rank batches of at least {MIN_RANK_BATCH} only up to {world_size} ranks")
+    nproc = world_size
+    
+    if nproc <= 1:
+        return _train_worker(0, 1, None, config_path, data_dir, output_dir, version, resume, epochs)
+    
+    port = _find_free_port()
+    print(f"🚀 Launching {nproc} data-parallel training processes (gloo)")
+    mp.spawn(_train_worker, args=(nproc, port, config_path, data_dir, output_dir, version, resume, epochs),
+             nprocs=nproc, join=True)
+    
+    output_path = Path(output_dir) / version
+    with open(output_path / 'metadata.json', 'r') as f:
+        metadata = json.load(f)
+    model = build_model(ARCHITECTURE)
+    if (output_path / 'model.pth').exists():
+        model.load_state_dict(torch.load(output_path / 'model.pth', map_location='cpu')['model_state_dict'])
+    return model, metadata
+
+
+def _train_worker(rank, world_size, port, config_path, data_dir, output_dir, version, resume=False, epochs=None):
+    """Training loop for one rank (rank 0 of 1 when not distributed)"""
+    distributed = world_size > 1
+    if distributed:
+        _init_distributed(rank, world_size, port)
+    is_main = rank == 0
+    log = print if is_main else (lambda *args, **kwargs: None)
+    
     # Load config
     with open(config_path, 'r') as f:
         config = yaml.safe_load(f)
+    training_config = config.get('training', {})
     
     # Set device
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Using device: {device}")
-    
-    # Data transforms
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
-    ])
-    
-    # Load dataset
-    mode = config.get('data', {}).get('mode', 'images')
-    dataset = DeepfakeDataset(data_dir, transform=transform, mode=mode)
-    
-    # Split dataset
-    train_size = int(0.7 * len(dataset))
-    val_size = int(0.15 * len(dataset))
-    test_size = len(dataset) - train_size - val_size
-    
-    train_dataset, val_dataset, test_dataset = torch.utils.data.random_split(
-        dataset, [train_size, val_size, test_size]
-    )
+    device = torch.device('cuda' if torch.cuda.is_available() and not distributed else 'cpu')
+    log(f"Using device: {device}" + (f" x {world_size} processes" if distributed else ""))
     
-    # Data loaders
-    batch_size = config.get('training', {}).get('batch_size', 32)
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
+    # Data: uint8 loaders, normalization/augmentation applied per batch
+    dataset, train_loader, val_loader, batch_transform = create_data_loaders(
+        config, data_dir, device, rank, world_size)
     
     # Model
-    model = EfficientNet.from_pretrained('efficientnet-b0', num_classes=2)
-    model = model.to(device)
+    net = build_model(ARCHITECTURE, pretrained=True)
+    net = net.to(device)
     
     # Loss and optimizer
-    criterion = nn.CrossEntropyLoss()
-    optimizer = optim.Adam(model.parameters(), lr=config.get('training', {}).get('learning_rate', 0.001))
+    criterion = fake_logit_loss
+    optimizer = optim.Adam(net.parameters(), lr=training_config.get('learning_rate', 0.001))
     
     # Training loop
-    epochs = config.get('training', {}).get('epochs', 50)
-    best_val_acc = 0.0
+    epochs = epochs or training_config.get('epochs', 50)
+    monitor = training_config.get('monitor', 'val_acc')
+    early_stopping = EarlyStopping(
+        patience=training_config.get('patience', 5) if training_config.get('early_stopping', True) else float('inf'),
+        min_delta=training_config.get('min_delta', 0.0),
+        mode='min' if monitor.endswith('loss') else 'max'
+    )
+    checkpoint_interval = training_config.get('checkpoint_interval', 1)
+    max_minutes = training_config.get('max_train_minutes')
+    
+    output_path = Path(output_dir) / version
+    output_path.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = output_path / 'checkpoint.pth'
     
     training_history = {
         'train_loss': [],
         'train_acc': [],
         'val_loss': [],
-        'val_acc': []
+        'val_acc': [],
+        'train_images_per_s': []
     }
+    best_val_acc = 0.0
+    start_epoch = 0
     
-    print(f"\n🚀 Starting training for {epochs} epochs...")
+    if resume and checkpoint_path.exists():
+        checkpoint = torch.load(checkpoint_path, map_location=device)
+        net.load_state_dict(checkpoint['model_state_dict'])
+        optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        early_stopping.load_state_dict(checkpoint['early_stopping'])
+        training_history.update(checkpoint['training_history'])
+        best_val_acc = checkpoint['best_val_acc']
+        start_epoch = checkpoint['epoch'] + 1
+        torch.set_rng_state(checkpoint['rng_state'])
+        log(f"🔄 Resumed from {checkpoint_path} (epoch {start_epoch}/{epochs})")
+    elif resume:
+        log(f"⚠️  No checkpoint at {checkpoint_path}, starting from scratch")
     
-    for epoch in range(epochs):
-        # Training
-        model.train()
-        train_loss = 0.0
-        train_correct = 0
-        train_total = 0
-        
-        pbar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{epochs}')
-        for images, labels in pbar:
-            images, labels = images.to(device), labels.to(device)
-            
-            optimizer.zero_grad()
-            outputs = model(images)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
+    # Wrap after loading so every rank starts from identical weights
+    model = nn.parallel.DistributedDataParallel(net) if distributed else net
+    
+    writer = CheckpointWriter() if is_main else None
+    stop_reason = 'completed'
+    epochs_trained = start_epoch
+    start_time = time.time()
+    
+    log(f"\n🚀 Starting training for {epochs} epochs...")
+    
+    try:
+        for epoch in range(start_epoch, epochs):
+            if isinstance(train_loader.sampler, DistributedSampler):
+                train_loader.sampler.set_epoch(epoch)
             
-            train_loss += loss.item()
-            _, predicted = outputs.max(1)
-            train_total += labels.size(0)
-            train_correct += predicted.eq(labels).sum().item()
+            # Training
+            model.train()
+            train_loss = 0.0
+            train_correct = 0
+            train_total = 0
+            train_batches = 0
+            epoch_start = time.perf_counter()
             
-            pbar.set_postfix({'loss': loss.item(), 'acc': 100.*train_correct/train_total})
-        
-        train_acc = 100. * train_correct / train_total
-        train_loss = train_loss / len(train_loader)
-        
-        # Validation
-        model.eval()
-        val_loss = 0.0
-        val_correct = 0
-        val_total = 0
-        
-        with torch.no_grad():
-            for images, labels in val_loader:
-                images, labels = images.to(device), labels.to(device)
+            pbar = tqdm(train_loader, desc=f'Epoch {epoch+1}/{epochs}', disable=not is_main)
+            for images, labels in pbar:
+                images = batch_transform(images, train=True)
+                labels = labels.to(device, non_blocking=True)
+                
+                optimizer.zero_grad()
                 outputs = model(images)
                 loss = criterion(outputs, labels)
+                loss.backward()
+                optimizer.step()
                 
-                val_loss += loss.item()
-                _, predicted = outputs.max(1)
-                val_total += labels.size(0)
-                val_correct += predicted.eq(labels).sum().item()
-        
-        val_acc = 100. * val_correct / val_total
-        val_loss = val_loss / len(val_loader)
-        
-        # Save history
-        training_history['train_loss'].append(train_loss)
-        training_history['train_acc'].append(train_acc)
-        training_history['val_loss'].append(val_loss)
-        training_history['val_acc'].append(val_acc)
-        
-        print(f'Epoch {epoch+1}: Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%, Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%')
-        
-        # Save best model
-        if val_acc > best_val_acc:
-            best_val_acc = val_acc
-            output_path = Path(output_dir) / version
-            output_path.mkdir(parents=True, exist_ok=True)
+                train_loss += loss.item()
+                train_batches += 1
+                predicted = predicted_labels(outputs)
+                train_total += labels.size(0)
+                train_correct += predicted.eq(labels).sum().item()
+                
+                pbar.set_postfix({'loss': loss.item(), 'acc': 100.*train_correct/train_total})
+            
+            epoch_time = time.perf_counter() - epoch_start
+            train_loss, train_correct, train_total, train_batches = _all_reduce_sum(
+                [train_loss, train_correct, train_total, train_batches])
+            train_acc = 100. * train_correct / train_total
+            train_loss = train_loss / train_batches
+            
+            # Validation (each rank scores its own unpadded shard, totals are summed;
+            # the loss is weighted per sample so it does not depend on the split)
+            model.eval()
+            val_loss = 0.0
+            val_correct = 0
+            val_total = 0
+            
+            with torch.no_grad():
+                for images, labels in val_loader:
+                    images = batch_transform(images)
+                    labels = labels.to(device, non_blocking=True)
+                    outputs = net(images)
+                    loss = criterion(outputs, labels)
+                    
+                    val_loss += loss.item() * labels.size(0)
+                    predicted = predicted_labels(outputs)
+                    val_total += labels.size(0)
+                    val_correct += predicted.eq(labels).sum().item()
+            
+            val_loss, val_correct, val_total = _all_reduce_sum([val_loss, val_correct, val_total])
+            val_acc = 100. * val_correct / val_total
+            val_loss = val_loss / val_total
+            
+            # Save history
+            training_history['train_loss'].append(train_loss)
+            training_history['train_acc'].append(train_acc)
+            training_history['val_loss'].append(val_loss)
+            training_history['val_acc'].append(val_acc)
+            training_history['train_images_per_s'].append(train_total / epoch_time)
+            epochs_trained = epoch + 1
+            
+            log(f'Epoch {epoch+1}: Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%, Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}% ({train_total / epoch_time:.1f} images/s)')
+            
+            # Metrics are identical on every rank, so every rank takes the same decisions
+            improved = early_stopping.step(training_history[monitor][-1])
+            if improved:
+                best_val_acc = val_acc
+                # Save best model (weights only; the optimizer lives in checkpoint.pth)
+                if is_main:
+                    writer.save({
+                        'epoch': epoch,
+                        'model_state_dict': net.state_dict(),
+                        'val_acc': val_acc,
+                        'config': config
+                    }, output_path / 'model.pth')
+                log(f'✅ Saved best model with {monitor}: {training_history[monitor][-1]:.4f}')
             
-            torch.save({
-                'epoch': epoch,
-                'model_state_dict': model.state_dict(),
-                'optimizer_state_dict': optimizer.state_dict(),
-                'val_acc': val_acc,
-                'config': config
-            }, output_path / 'model.pth')
+            # Wall-clock limit is rank 0's call, shared so all ranks stop together
+            out_of_time = max_minutes is not None and (time.time() - start_time) / 60 >= max_minutes
+            out_of_time = bool(_all_reduce_sum([float(out_of_time and is_main)])[0])
+            stopping = early_stopping.should_stop or out_of_time or epoch + 1 == epochs
             
-            print(f'✅ Saved best model with val_acc: {val_acc:.2f}%')
+            # Resumable checkpoint
+            if is_main and ((epoch + 1) % checkpoint_interval == 0 or stopping):
+                writer.save({
+                    'epoch': epoch,
+                    'model_state_dict': net.state_dict(),
+                    'optimizer_state_dict': optimizer.state_dict(),
+                    'early_stopping': early_stopping.state_dict(),
+                    'training_history': training_history,
+                    'best_val_acc': best_val_acc,
+                    'rng_state': torch.get_rng_state(),
+                    'config': config
+                }, checkpoint_path)
+            
+            if early_stopping.should_stop:
+                stop_reason = 'early_stopping'
+                log(f'⏹️  Early stopping: no {monitor} improvement for {early_stopping.patience} epochs')
+                break
+            if out_of_time:
+                stop_reason = 'time_limit'
+                log(f'⏹️  Stopping: max_train_minutes ({max_minutes}) reached, resume with --resume')
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+        if distributed:
+            dist.destroy_process_group()
+    
+    if not is_main:
+        return None
     
     # Save training history
     with open(output_path / 'training_history.json', 'w') as f:
@@ -263,9 +902,11 @@ def train_model(config_path, data_dir, output_dir, version):
         'timestamp': datetime.now().isoformat(),
         'config': config,
         'best_val_acc': best_val_acc,
-        'epochs_trained': epochs,
+        'epochs_trained': epochs_trained,
+        'stop_reason': stop_reason,
         'dataset_size': len(dataset),
-        'device': str(device)
+        'device': str(device),
+        'world_size': world_size
     }
     
     with open(output_path / 'metadata.json', 'w') as f:
@@ -275,7 +916,88 @@ def train_model(config_path, data_dir, output_dir, version):
     print(f'   Best validation accuracy: {best_val_acc:.2f}%')
     print(f'   Model saved to: {output_path}')
     
-    return model, metadata
+    return net, metadata
+
+
+def _benchmark_worker(rank, world_size, port, config, data_dir, steps, result_path):
+    """Time `steps` synchronized training steps on one rank; rank 0 writes images/s"""
+    if world_size > 1:
+        _init_distributed(rank, world_size, port)
+    device = torch.device('cpu')
+    _, train_loader, _, batch_transform = create_data_loaders(config, data_dir, device, rank, world_size)
+    net = build_model(ARCHITECTURE, pretrained=True)
+    model = nn.parallel.DistributedDataParallel(net) if world_size > 1 else net
+    criterion = fake_logit_loss
+    optimizer = optim.Adam(model.parameters(), lr=config.get('training', {}).get('learning_rate', 0.001))
+    model.train()
+    
+    warmup, done, images_seen, start = 2, 0, 0, None
+    while done < warmup + steps:
+        for images, labels in train_loader:
+            if done == warmup:
+                start = time.perf_counter()
+            optimizer.zero_grad()
+            loss = criterion(model(batch_transform(images, train=True)), labels)
+            loss.backward()
+            optimizer.step()
+            if done >= warmup:
+                images_seen += labels.size(0)
+            done += 1
+            if done == warmup + steps:
+                break
+    elapsed = time.perf_counter() - start
+    
+    images_seen = _all_reduce_sum([images_seen])[0]
+    if world_size > 1:
+        dist.destroy_process_group()
+    if rank == 0:
+        with open(result_path, 'w') as f:
+            json.dump({'images_per_s': images_seen / elapsed}, f)
+
+
+def scaling_report(config_path, data_dir, nproc, steps=20):
+    """
+    Training throughput with nproc data-parallel processes vs a single process
+    
+    Scaling efficiency = throughput(nproc) / (nproc * throughput(1)).
+    
+    Returns:
+        Dict with per-process-count images/s, speedup and efficiency
+    """
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    prepare_manifest(config, data_dir)
+    batch_size = config.get('training', {}).get('batch_size', 32)
+    if data_parallel_ranks(nproc, batch_size) < nproc:
+        nproc = data_parallel_ranks(nproc, batch_size)
+        print(f"⚠️  Comparing {nproc} processes: batch_size {batch_size} does not split further")
+    
+    throughput = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sorted({1, nproc}):
+            result_path = Path(tmp) / f'{n}.json'
+            print(f"⏱️  Timing {steps} steps with {n} process(es)...")
+            # Single-process runs are spawned too, so both see the same cold start
+            mp.spawn(_benchmark_worker, args=(n, _find_free_port(), config, data_dir, steps, str(result_path)),
+                     nprocs=n, join=True)
+            with open(result_path, 'r') as f:
+                throughput[n] = json.load(f)['images_per_s']
+    
+    speedup = throughput[nproc] / throughput[1] if throughput[1] > 0 else 0.0
+    report = {
+        'images_per_s': throughput,
+        'speedup': speedup,
+        'scaling_efficiency': speedup / nproc
+    }
+    print("\n" + "=" * 60)
+    print("📊 DATA-PARALLEL SCALING")
+    print("=" * 60)
+    for n, rate in throughput.items():
+        print(f"  {n:>3} process(es): {rate:.1f} images/s")
+    print(f"  Speedup: {speedup:.2f}x on {nproc} processes")
+    print(f"  Scaling efficiency: {report['scaling_efficiency']:.0%}")
+    print("=" * 60)
+    return report
 
 
 if __name__ == '__main__':
@@ -284,7 +1006,23 @@ if __name__ == '__main__':
     parser.add_argument('--data', type=str, default='mlops/data/train', help='Path to training data')
     parser.add_argument('--output', type=str, default='mlops/registry/models', help='Output directory')
     parser.add_argument('--version', type=str, default='v1.0.0', help='Model version')
+    parser.add_argument('--epochs', type=int, default=None, help='Override training.epochs from the config')
+    parser.add_argument('--nproc', type=int, default=1,
+                        help='Data-parallel CPU processes (torch.distributed gloo); 0 = one per core')
+    parser.add_argument('--scaling-report', action='store_true',
+                        help='Compare --nproc processes against a single process instead of training')
+    parser.add_argument('--resume', action='store_true', help='Resume from the version\'s checkpoint.pth')
+    parser.add_argument('--throughput-report', action='store_true',
+                        help='Measure loader-only vs full-step images/s instead of training')
+    parser.add_argument('--report-batches', type=int, default=20, help='Batches timed by --throughput-report and --scaling-report')
     
     args = parser.parse_args()
     
-    train_model(args.config, args.data, args.output, args.version)
+    nproc = args.nproc or os.cpu_count() or 1
+    
+    if args.throughput_report:
+        input_throughput_report(args.config, args.data, args.report_batches)
+    elif args.scaling_report:
+        scaling_report(args.config, args.data, nproc, args.report_batches)
+    else:
+        train_model(args.config, args.data, args.output, args.version, args.resume, nproc, args.epochs)
@@ -0,0 +1,246 @@
+"""
+Hot Model Reload
+Loads new serving weights in the background, warms them up and swaps them
+into a running detector between batches
+
+A reload loads the new model (its prebuilt engine when one was built, see
+serving_artifacts.py, otherwise the eager model over its memory-mapped,
+verified safetensors weights), pushes a few synthetic batches through it and only
+then hands it to DeepfakeDetector.swap_model. Requests never wait on the
+load or the warmup: the swap itself is one attribute assignment, and
+batches already running finish on the model they started with. If any
+step fails, the current model keeps serving and the error is reported.
+
+Reloads come from the model registry (a version, by default the current
+production one) or, on hosts without a registry, from the weights file
+that mlops/deployment/deploy.py writes into weights/. When the watcher's
+reload of a production version fails, it is retried with exponential
+backoff (up to MAX_RETRY_INTERVAL) until it loads or registry.json changes.
+"""
+
+import os
+import time
+import threading
+from datetime import datetime
+
+from deepfake_detection import (ARTIFACTS_DIR, SERVING_ENGINE, SERVING_PRECISION, load_engine,
+                                serving_weights_path, warmup_model)
+from model_weights import file_sha256
+
+MAX_RETRY_INTERVAL = 3600.0
+
+
+class ModelReloader:
+    """Background reload of a DeepfakeDetector's model, with an optional registry watcher"""
+
+    def __init__(self, detector, architecture, registry_dir=None, poll_interval=30.0,
+                 precision=SERVING_PRECISION, engine=SERVING_ENGINE, on_swap=None):
+        """
+        Args:
+            detector: DeepfakeDetector whose model gets replaced
+            architecture: Architecture currently served (key of SERVING_MODELS)
+            registry_dir: Model registry to reload versions from (None: weights/ only)
+            poll_interval: Seconds between registry checks when watching
+            precision: Inference precision to configure on new models
+            engine: Engine to load (see deepfake_detection.load_engine)
+            on_swap: Optional callable(version) run after each swap
+        """
+        self.detector = detector
+        self.architecture = architecture
+        self.registry_dir = registry_dir
+        self.poll_interval = poll_interval
+        self.precision = precision
+        self.engine = engine
+        self.on_swap = on_swap
+
+        self.version = None
+        self.sha256 = None
+        self.last_reload = None
+        self.last_error = None
+        self.reloads = 0
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._registry_mtime = None
+        # (version, registry mtime, failures, monotonic time of the next retry)
+        self._failed = None
+
+    def _registry(self):
+        from mlops.registry.model_registry import ModelRegistry
+
+        return ModelRegistry(self.registry_dir)
+
+    def _resolve(self, version):
+        """(version, architecture, weights path, sha256, artifacts dir) to load"""
+        if self.registry_dir is None:
+            if version is not None:
+                raise ValueError("Reloading a specific version needs a model registry")
+            path = serving_weights_path(self.architecture)
+            sha256 = file_sha256(path)
+            return sha256[:12], self.architecture, path, sha256, ARTIFACTS_DIR
+
+        registry = self._registry()
+        entry = registry.get_model(version) if version else registry.get_production_model()
+        if 'weights_sha256' not in entry:
+            raise ValueError(f"Model {entry['version']} has no exported serving weights")
+        path = os.path.join(entry['path'], entry['weights_file'])
+        return (entry['version'], entry.get('architecture', 'efficientnet'), path, entry['weights_sha256'],
+                registry.artifacts_dir)
+
+    def reload(self, version=None):
+        """
+        Load, warm up and swap in a model (blocks the calling thread)
+
+        Args:
+            version: Registry version (default: production, or the deployed
+                weights file when there is no registry)
+
+        Returns:
+            Dict with version, architecture and load/warmup/swap timings
+
+        Raises:
+            RuntimeError: Another reload is in progress
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A model reload is already in progress")
+        try:
+            started = time.perf_counter()
+            version, architecture, path, sha256, artifacts_dir = self._resolve(version)
+
+            net = load_engine(architecture, path, self.engine, artifacts_dir, expected_sha256=sha256)
+            net.configure_precision(self.precision)
+            loaded = time.perf_counter()
+
+            warmup_model(net)
+            warmed = time.perf_counter()
+
+            self.detector.swap_model(net, version)
+            swapped = time.perf_counter()
+
+            self.version, self.sha256, self.architecture = version, sha256, architecture
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload = {
+                'version': version,
+                'architecture': architecture,
+                'timestamp': datetime.now().isoformat(),
+                'load_ms': (loaded - started) * 1000,
+                'warmup_ms': (warmed - loaded) * 1000,
+                'swap_ms': (swapped - warmed) * 1000,
+                'total_ms': (swapped - started) * 1000
+            }
+            print(f"✓ Model {version} ({architecture}) swapped in after "
+                  f"{self.last_reload['total_ms']:.0f} ms (swap {self.last_reload['swap_ms']:.3f} ms)")
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._lock.release()
+
+        if self.on_swap is not None:
+            self.on_swap(version)
+        return self.last_reload
+
+    def reload_async(self, version=None):
+        """
+        Start a reload on a background thread
+
+        Returns:
+            False if a reload is already in progress
+        """
+        if self.reloading:
+            return False
+
+        def run():
+            try:
+                self.reload(version)
+            except Exception as e:
+                print(f"⚠️  Model reload failed, keeping {self.detector.model_version}: {e}")
+
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+        return True
+
+    @property
+    def reloading(self):
+        return self._lock.locked()
+
+    def adopt_deployed(self):
+        """
+        Record the production version if it is what weights/ already serves
+
+        Lets the watcher skip a reload of the model loaded at startup.
+        """
+        try:
+            entry = self._registry().get_production_model()
+            if entry.get('weights_sha256') == file_sha256(serving_weights_path(self.architecture)):
+                self.version, self.sha256 = entry['version'], entry['weights_sha256']
+                self.detector.model_version = self.version
+        except (OSError, ValueError):
+            pass
+
+    def check_registry(self):
+        """
+        Reload if the registry's production version changed
+
+        Returns:
+            True if a reload ran
+        """
+        registry_file = os.path.join(self.registry_dir, 'registry.json')
+        try:
+            mtime = os.stat(registry_file).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._registry_mtime:
+            return False
+
+        production = self._registry().registry.get('production_version')
+        reload = bool(production) and production != self.version
+        if reload:
+            failed = self._failed if self._failed and self._failed[:2] == (production, mtime) else None
+            if failed and time.monotonic() < failed[3]:
+                return False
+            print(f"🔄 Production model changed to {production}, reloading...")
+            try:
+                self.reload(production)
+            except Exception:
+                # The mtime stays unrecorded, so a later poll retries after the backoff
+                failures = failed[2] + 1 if failed else 1
+                delay = min(self.poll_interval * 2 ** failures, MAX_RETRY_INTERVAL)
+                self._failed = (production, mtime, failures, time.monotonic() + delay)
+                raise
+        self._failed = None
+        self._registry_mtime = mtime
+        return reload
+
+    def _watch_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check_registry()
+            except Exception as e:
+                print(f"⚠️  Model reload failed, keeping {self.detector.model_version}: {e}")
+
+    def start_watching(self):
+        """Poll the registry for production changes on a daemon thread"""
+        if self.registry_dir is None:
+            raise ValueError("Watching needs a model registry")
+        if self._watcher is None:
+            self.adopt_deployed()
+            self._watcher = threading.Thread(target=self._watch_loop, name="model-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get_status(self):
+        """Serving version, last reload timings and error (for /health)"""
+        return {
+            'version': self.version,
+            'architecture': self.architecture,
+            'reloading': self.reloading,
+            'reloads': self.reloads,
+            'last_reload': self.last_reload,
+            'last_error': self.last_error,
+            'failed_reloads': self._failed[2] if self._failed else 0,
+            'watching': self._watcher is not None
+        }
@@ -0,0 +1,132 @@
+"""
+Serving Weight Files
+Verified, key-normalized safetensors weights for the deepfake models
+
+Training checkpoints (model.pth) are pickles holding optimizer state and
+metrics next to the tensors. export_safetensors converts one once, at
+registration: keys are normalized, checked strictly against the serving
+architecture, and written as safetensors with a sha256 of the result.
+load_weights memory-maps that file and assigns the tensors straight into
+the model, so nothing is unpickled at startup and every worker process on
+a host shares the same page-cache copy of the weights.
+
+Usage:
+    python model_weights.py weights/best_model.pth --architecture efficientnet
+"""
+
+import os
+import hashlib
+import argparse
+
+import torch
+from safetensors.torch import load_file, save_file
+
+WEIGHTS_SUFFIX = '.safetensors'
+
+
+def normalize_state_dict(checkpoint):
+    """
+    Bare state dict with serving key names
+
+    Accepts a training checkpoint ({'model_state_dict': ...}) or a state
+    dict; strips the DistributedDataParallel 'module.' prefix and renames
+    the early 'net.' backbone prefix to 'efficientnet.'.
+    """
+    state_dict = checkpoint.get('model_state_dict', checkpoint)
+    normalized = {}
+    for key, value in state_dict.items():
+        if key.startswith('module.'):
+            key = key[len('module.'):]
+        if key.startswith('net.'):
+            key = 'efficientnet.' + key[len('net.'):]
+        normalized[key] = value
+    return normalized
+
+
+def file_sha256(path):
+    """sha256 of a file (hex)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_state_dict(state_dict, architecture):
+    """
+    Check keys and shapes against a serving architecture
+
+    The model is built on the meta device, so no memory is allocated and
+    no ImageNet weights are fetched.
+
+    Raises:
+        RuntimeError: Missing, unexpected or mis-shaped tensors
+    """
+    from deepfake_models import build_model  # imported here: deepfake_models loads weights through this module
+
+    with torch.device('meta'):
+        skeleton = build_model(architecture)
+    skeleton.load_state_dict(state_dict, strict=True, assign=True)
+
+
+def export_safetensors(checkpoint_path, output_path, architecture='efficientnet'):
+    """
+    Convert a training checkpoint into a verified safetensors file
+
+    Args:
+        checkpoint_path: model.pth from training or distillation
+        output_path: Destination .safetensors file
+        architecture: Serving architecture the tensors must match
+
+    Returns:
+        sha256 of the written file
+    """
+    checkpoint = torch.load(checkpoint_path, map_location='cpu', weights_only=True)
+    state_dict = normalize_state_dict(checkpoint)
+    verify_state_dict(state_dict, architecture)
+
+    tensors = {key: value.contiguous() for key, value in state_dict.items()}
+    tmp_path = f"{output_path}.tmp"
+    save_file(tensors, tmp_path, metadata={'architecture': architecture})
+    os.replace(tmp_path, output_path)
+    return file_sha256(output_path)
+
+
+def load_weights(net, path, expected_sha256=None):
+    """
+    Assign memory-mapped safetensors weights to a model
+
+    Build the model on the meta device first to skip allocating (and
+    initializing) parameters that are replaced here anyway. The mapping is
+    private, so in-place changes to a tensor never reach the file.
+
+    Args:
+        net: Model with the matching architecture
+        path: .safetensors file
+        expected_sha256: Optional hash to check the file against
+
+    Returns:
+        net, with every parameter and buffer backed by the file
+    """
+    if expected_sha256 is not None and file_sha256(path) != expected_sha256:
+        raise ValueError(f"{path} does not match its recorded sha256")
+    net.load_state_dict(load_file(path, device='cpu'), strict=True, assign=True)
+
+    leftover = [name for name, tensor in list(net.named_parameters()) + list(net.named_buffers()) if tensor.is_meta]
+    if leftover:
+        raise RuntimeError(f"{path} does not initialize {', '.join(leftover[:5])}")
+    return net
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert a .pth checkpoint to verified safetensors')
+    parser.add_argument('checkpoint', type=str, help='Checkpoint (.pth)')
+    parser.add_argument('--output', type=str, default=None, help='Output path (default: checkpoint with .safetensors)')
+    parser.add_argument('--architecture', type=str, default='efficientnet', help='Serving architecture')
+
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.checkpoint)[0] + WEIGHTS_SUFFIX
+    sha256 = export_safetensors(args.checkpoint, output, args.architecture)
+    print(f"✅ Wrote {output}")
+    print(f"   sha256: {sha256}")
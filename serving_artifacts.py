@@ -0,0 +1,395 @@
+"""
+Serving Artifacts
+Prebuilt inference engines for a serving weights file, cached by weights hash
+
+Registration (and deployment, for versions registered earlier) converts
+the eager model once into each engine:
+
+    torchscript  traced and frozen from the optimize_for_inference graph
+                 (BatchNorm folded, dropout removed, see inference_graph.py)
+    int8         linear layers dynamically quantized to int8, then traced
+                 and frozen like torchscript
+    onnx         ONNX graph run with onnxruntime (only built when onnx and
+                 onnxruntime are installed)
+
+Next to the engines goes model.folded.safetensors: the eager model's
+weights with BatchNorm already folded (the optimize_for_inference graph,
+GradCAM layer kept). Folding at load time would write new tensors in every
+worker; loading the prebuilt file keeps them on shared, memory-mapped pages.
+
+Every engine is compared with the eager model on a fixed batch and only
+kept within PARITY_TOLERANCE. Artifacts live in <cache>/<key>/ with a
+manifest.json, where the key is the weights sha256 plus the torch version:
+a TorchScript file is only guaranteed to load in the version that wrote
+it, so a server running another torch finds no artifact and serves eager.
+
+Usage:
+    python serving_artifacts.py weights/best_model.safetensors --architecture efficientnet
+"""
+
+import os
+import copy
+import json
+import shutil
+import argparse
+import threading
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+from safetensors.torch import load_file, save_file
+
+from model_weights import file_sha256, load_weights
+from inference_graph import optimize_for_inference
+
+ENGINES = ('torchscript', 'int8', 'onnx')
+
+ENGINE_FILES = {
+    'torchscript': 'model.torchscript.pt',
+    'int8': 'model.int8.pt',
+    'onnx': 'model.onnx',
+}
+
+# BatchNorm-folded eager weights (see load_folded_weights)
+FOLDED_WEIGHTS = 'model.folded.safetensors'
+
+# Max |fake probability difference| to the eager model on the parity batch
+PARITY_TOLERANCE = {
+    'torchscript': 1e-4,
+    'int8': 2e-2,
+    'onnx': 1e-4,
+    'folded': 1e-4,
+}
+
+MANIFEST = 'manifest.json'
+
+
+def artifact_key(weights_sha256):
+    """Cache key of the artifacts built from a weights file with this torch"""
+    return f"{weights_sha256[:16]}-torch{torch.__version__}"
+
+
+def artifact_dir(cache_dir, weights_sha256):
+    return Path(cache_dir) / artifact_key(weights_sha256)
+
+
+def load_manifest(cache_dir, weights_sha256):
+    """Manifest of the cached artifacts for a weights file, or None if not built"""
+    path = artifact_dir(cache_dir, weights_sha256) / MANIFEST
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _export_copy(net):
+    """fp32, fully BatchNorm-folded copy of a serving model that can be traced"""
+    net = copy.deepcopy(net).eval()
+    net.configure_precision('fp32')
+    # Engines are never explained with GradCAM, so the head folds too; this
+    # also replaces EfficientNet's memory-efficient swish (a custom autograd
+    # function tracing cannot record) with SiLU
+    return optimize_for_inference(net, explainable=False)
+
+
+def _parity_batch(batch_size=4):
+    generator = torch.Generator().manual_seed(0)
+    return torch.randn(batch_size, 3, 224, 224, generator=generator)
+
+
+def _save_frozen(net, example, path):
+    with torch.no_grad(), warnings.catch_warnings():
+        # torch.jit deprecation notices; TorchScript is still what loads fastest here
+        warnings.simplefilter('ignore', FutureWarning)
+        torch.jit.save(torch.jit.freeze(torch.jit.trace(net, example)), str(path))
+
+
+def _build_torchscript(net, example, path):
+    _save_frozen(net, example, path)
+
+
+def _build_int8(net, example, path):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        warnings.simplefilter('ignore', UserWarning)
+        quantized = torch.ao.quantization.quantize_dynamic(net, {nn.Linear}, dtype=torch.qint8)
+    _save_frozen(quantized, example, path)
+
+
+def _build_onnx(net, example, path):
+    import onnx  # noqa: F401 (needed by torch.onnx.export)
+    import onnxruntime  # noqa: F401 (needed to load the result)
+
+    torch.onnx.export(net, example, str(path), input_names=['input'], output_names=['logit'],
+                      dynamic_axes={'input': {0: 'batch'}, 'logit': {0: 'batch'}})
+
+
+def _build_folded(net, path, example, reference):
+    """Write the folded eager weights; returns the parity error of a reload from the file"""
+    folded = optimize_for_inference(copy.deepcopy(net).eval())
+    folded.configure_precision('fp32')
+    save_file({key: value.contiguous() for key, value in folded.state_dict().items()}, str(path))
+    folded.load_state_dict(load_file(str(path)), strict=True)
+    with torch.no_grad():
+        return (torch.sigmoid(folded(example)) - reference).abs().max().item()
+
+
+BUILDERS = {
+    'torchscript': _build_torchscript,
+    'int8': _build_int8,
+    'onnx': _build_onnx,
+}
+
+
+class OnnxEngine:
+    """onnxruntime session called like a model"""
+
+    def __init__(self, path):
+        import onnxruntime
+
+        self.session = onnxruntime.InferenceSession(str(path), providers=['CPUExecutionProvider'])
+
+    def __call__(self, x):
+        return torch.from_numpy(self.session.run(None, {'input': x.detach().cpu().numpy()})[0])
+
+
+def load_engine_module(path, engine):
+    """Load one engine file"""
+    if engine == 'onnx':
+        return OnnxEngine(path)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        return torch.jit.load(str(path), map_location='cpu')
+
+
+def build_artifacts(net, weights_sha256, cache_dir, engines=ENGINES):
+    """
+    Build, check and cache the serving engines of a model
+
+    Already-built artifacts for the same key are reused as they are.
+
+    Args:
+        net: Eager serving model loaded from the weights file
+        weights_sha256: sha256 of that weights file
+        cache_dir: Artifact cache directory
+        engines: Engines to build
+
+    Returns:
+        Manifest dict: {'key', 'weights_sha256', 'torch_version', 'built_at',
+        'engines': {engine: {'file', 'sha256', 'parity_max_abs'}},
+        'folded': {'file', 'sha256', 'parity_max_abs'} (when built),
+        'skipped': {engine: reason}}
+    """
+    manifest = load_manifest(cache_dir, weights_sha256)
+    if manifest is not None:
+        return manifest
+
+    target = artifact_dir(cache_dir, weights_sha256)
+    tmp_dir = target.with_name(f"{target.name}.tmp{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    export_net = _export_copy(net)
+    example = _parity_batch()
+    with torch.no_grad():
+        reference = torch.sigmoid(export_net(example))
+
+    manifest = {
+        'key': target.name,
+        'weights_sha256': weights_sha256,
+        'torch_version': torch.__version__,
+        'built_at': datetime.now().isoformat(),
+        'engines': {},
+        'skipped': {}
+    }
+    for engine in engines:
+        path = tmp_dir / ENGINE_FILES[engine]
+        try:
+            BUILDERS[engine](export_net, example, path)
+            with torch.no_grad():
+                error = (torch.sigmoid(load_engine_module(path, engine)(example)) - reference).abs().max().item()
+        except ImportError as e:
+            manifest['skipped'][engine] = f"{e.name or e} not installed"
+            continue
+        except Exception as e:
+            path.unlink(missing_ok=True)
+            manifest['skipped'][engine] = f"build failed: {type(e).__name__}: {e}"
+            continue
+
+        if not error <= PARITY_TOLERANCE[engine]:
+            path.unlink()
+            manifest['skipped'][engine] = f"parity error {error:.2e} above {PARITY_TOLERANCE[engine]:.0e}"
+            continue
+        manifest['engines'][engine] = {
+            'file': path.name,
+            'sha256': file_sha256(path),
+            'parity_max_abs': error
+        }
+
+    path = tmp_dir / FOLDED_WEIGHTS
+    try:
+        error = _build_folded(net, path, example, reference)
+    except Exception as e:
+        error = None
+        manifest['skipped']['folded'] = f"build failed: {type(e).__name__}: {e}"
+    if error is not None and not error <= PARITY_TOLERANCE['folded']:
+        manifest['skipped']['folded'] = f"parity error {error:.2e} above {PARITY_TOLERANCE['folded']:.0e}"
+    elif error is not None:
+        manifest['folded'] = {'file': path.name, 'sha256': file_sha256(path), 'parity_max_abs': error}
+    if 'folded' not in manifest:
+        path.unlink(missing_ok=True)
+
+    with open(tmp_dir / MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    try:
+        os.rename(tmp_dir, target)
+    except OSError:
+        # Built concurrently by another process: keep theirs
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return load_manifest(cache_dir, weights_sha256)
+    return manifest
+
+
+def copy_artifacts(cache_dir, weights_sha256, target_cache_dir):
+    """
+    Copy cached artifacts into another cache (e.g. a host's weights/artifacts)
+
+    The directory appears under its final name only once every file is
+    copied and verified.
+
+    Returns:
+        Path of the copied artifact directory
+    """
+    source = artifact_dir(cache_dir, weights_sha256)
+    target = artifact_dir(target_cache_dir, weights_sha256)
+    if (target / MANIFEST).exists():
+        return target
+
+    manifest = load_manifest(cache_dir, weights_sha256)
+    if manifest is None:
+        raise FileNotFoundError(f"No artifacts built for {source.name}")
+    tmp_dir = target.with_name(f"{target.name}.tmp{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    shutil.copytree(source, tmp_dir)
+    entries = dict(manifest['engines'], **({'folded': manifest['folded']} if 'folded' in manifest else {}))
+    for engine, entry in entries.items():
+        if file_sha256(tmp_dir / entry['file']) != entry['sha256']:
+            shutil.rmtree(tmp_dir)
+            raise ValueError(f"Copy of the {engine} artifact failed verification")
+    os.rename(tmp_dir, target)
+    return target
+
+
+class ArtifactModel(nn.Module):
+    """
+    Prebuilt engine behind the serving model interface
+
+    Engines are fp32 only. GradCAM needs the eager graph, which is loaded
+    from the weights file on first access to .eager.
+    """
+
+    precision = 'fp32'
+
+    def __init__(self, engine_module, engine, key, eager_loader=None):
+        super().__init__()
+        self.engine_module = engine_module
+        self.engine = engine
+        self.key = key
+        self._eager_loader = eager_loader
+        self._eager = None
+        self._eager_lock = threading.Lock()
+
+    def forward(self, x):
+        return self.engine_module(x)
+
+    def configure_precision(self, precision='fp32', force=False):
+        if precision != 'fp32':
+            print(f"⚠️  {self.engine} engine runs in fp32 only, ignoring {precision}")
+        return 'fp32'
+
+    @property
+    def eager(self):
+        """Eager model with the same weights (for GradCAM)"""
+        with self._eager_lock:
+            if self._eager is None:
+                if self._eager_loader is None:
+                    raise RuntimeError(f"No eager model available for the {self.engine} engine")
+                self._eager = self._eager_loader()
+            return self._eager
+
+
+def load_artifact(cache_dir, weights_sha256, engine, eager_loader=None):
+    """
+    Load a cached engine for a weights file
+
+    Raises:
+        LookupError: The engine was not built for these weights and this torch version
+        ValueError: The artifact does not match its recorded sha256
+
+    Returns:
+        ArtifactModel in eval mode
+    """
+    manifest = load_manifest(cache_dir, weights_sha256)
+    if manifest is None:
+        raise LookupError(f"No artifacts built for {artifact_key(weights_sha256)}")
+    if engine not in manifest['engines']:
+        raise LookupError(f"No {engine} artifact for {manifest['key']}: "
+                          f"{manifest['skipped'].get(engine, 'not built')}")
+
+    entry = manifest['engines'][engine]
+    path = artifact_dir(cache_dir, weights_sha256) / entry['file']
+    if file_sha256(path) != entry['sha256']:
+        raise ValueError(f"{path} does not match its recorded sha256")
+    return ArtifactModel(load_engine_module(path, engine), engine, manifest['key'], eager_loader).eval()
+
+
+def load_folded_weights(cache_dir, weights_sha256, net):
+    """
+    Assign the prebuilt BatchNorm-folded weights of a weights file to a model
+
+    Args:
+        cache_dir: Artifact cache
+        weights_sha256: sha256 of the registered weights file
+        net: Serving architecture built on the meta device; folded here
+            (structure only) to match the file
+
+    Raises:
+        LookupError: No folded weights built for these weights and this torch version
+        ValueError: The file does not match its recorded sha256
+
+    Returns:
+        net in eval mode, every tensor memory-mapped from the file
+    """
+    manifest = load_manifest(cache_dir, weights_sha256)
+    if manifest is None or 'folded' not in manifest:
+        raise LookupError(f"No folded weights built for {artifact_key(weights_sha256)}")
+    path = artifact_dir(cache_dir, weights_sha256) / manifest['folded']['file']
+    return load_weights(optimize_for_inference(net), path, expected_sha256=manifest['folded']['sha256'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build serving engines for a safetensors weights file')
+    parser.add_argument('weights', type=str, help='Serving weights (.safetensors)')
+    parser.add_argument('--architecture', type=str, default='efficientnet', help='Serving architecture')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Artifact cache (default: artifacts/ next to the weights)')
+    parser.add_argument('--engines', type=str, nargs='+', default=list(ENGINES), choices=ENGINES)
+
+    args = parser.parse_args()
+
+    from deepfake_models import load_engine
+
+    cache_dir = args.cache_dir or os.path.join(os.path.dirname(args.weights), 'artifacts')
+    sha256 = file_sha256(args.weights)
+    manifest = build_artifacts(load_engine(args.architecture, args.weights, 'eager', expected_sha256=sha256),
+                               sha256, cache_dir, args.engines)
+
+    print(f"✅ Artifacts in {artifact_dir(cache_dir, sha256)}")
+    for engine, entry in manifest['engines'].items():
+        print(f"   {engine}: parity {entry['parity_max_abs']:.2e}")
+    if 'folded' in manifest:
+        print(f"   folded eager weights: parity {manifest['folded']['parity_max_abs']:.2e}")
+    for engine, reason in manifest['skipped'].items():
+        print(f"   {engine}: skipped ({reason})")
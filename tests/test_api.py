@@ -2,6 +2,7 @@
 Unit tests for Flask API endpoints
 """
 
+import io
 import pytest
 import sys
 import os
@@ -65,6 +66,112 @@ def test_analyze_endpoint_no_file(client):
     data = response.get_json()
     assert 'error' in data
 
+def test_explain_endpoint_no_file(client):
+    """Test /explain endpoint without file"""
+    response = client.post('/explain')
+    
+    assert response.status_code == 400
+    data = response.get_json()
+    assert 'error' in data
+
+def test_forensics_unknown_job(client):
+    """Test /forensics returns 404 for unknown job ids"""
+    response = client.get('/forensics/does-not-exist')
+    
+    assert response.status_code == 404
+    data = response.get_json()
+    assert 'error' in data
+
+def test_stats_includes_forensic_queue(client):
+    """Test /stats reports forensic queue state"""
+    response = client.get('/stats')
+    data = response.get_json()
+    
+    assert 'forensics' in data
+    assert 'pending' in data['forensics']
+    assert 'dropped' in data['forensics']
+
+def test_health_reports_model_version(client):
+    """Test /health reports the serving model version and reload status"""
+    data = client.get('/health').get_json()
+    
+    assert 'model_version' in data
+    assert data['model_reload']['reloading'] == False
+    assert 'last_reload' in data['model_reload']
+
+def test_admin_reload_requires_admin(client, monkeypatch):
+    """Test /admin/reload rejects requests without the admin token"""
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    response = client.post('/admin/reload', headers={'X-Admin-Token': 'wrong'})
+    
+    assert response.status_code == 403
+
+def test_placeholder_admin_token_refuses_to_start():
+    """Test the server will not start with the .env.example placeholder token"""
+    import subprocess
+    
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, '-c', 'import backend_server'], cwd=root,
+                            env={**os.environ, 'ADMIN_TOKEN': 'change-me'},
+                            capture_output=True, text=True, timeout=300)
+    
+    assert result.returncode != 0
+    assert 'change-me' in result.stderr
+    assert 'Loading models' not in result.stdout
+
+def test_ready_after_warmup(client):
+    """Test /ready turns 200 once startup warmup has run, with its timings"""
+    import time
+    
+    deadline = time.time() + 60
+    response = client.get('/ready')
+    while response.status_code == 503 and time.time() < deadline:
+        assert response.get_json()['ready'] == False
+        time.sleep(0.2)
+        response = client.get('/ready')
+    
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['ready'] == True
+    assert data['warmup']['total_ms'] > 0
+
+def test_failed_warmup_is_unhealthy(client, monkeypatch):
+    """Test a failed warmup keeps /ready at 503 and turns /health unhealthy"""
+    import backend_server
+    
+    monkeypatch.setitem(backend_server.warmup_status, 'ready', False)
+    monkeypatch.setitem(backend_server.warmup_status, 'error', 'RuntimeError: boom')
+    
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'RuntimeError: boom'
+    response = client.get('/health')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'unhealthy'
+
+def test_monitor_logs_service_verdict(client, monkeypatch):
+    """Test logged predictions use FAKE_THRESHOLD like the rest of the service"""
+    import cv2
+    import numpy as np
+    import backend_server
+    from deepfake_detection import FAKE_THRESHOLD
+
+    probability = (FAKE_THRESHOLD + 0.5) / 2
+    face = {'bbox': (0, 0, 32, 32), 'fake_probability': probability, 'raw_probability': probability}
+    monkeypatch.setattr(backend_server.detector, 'score_frames',
+                        lambda frames, max_faces_per_frame=None: [{'faces_detected': 1, 'faces': [face]}])
+    records = []
+    monkeypatch.setattr(backend_server, 'monitor', type('Monitor', (), {'log_prediction': staticmethod(records.append)}))
+
+    _, image = cv2.imencode('.jpg', np.zeros((64, 64, 3), dtype=np.uint8))
+    response = client.post('/analyze', data={'frame': (io.BytesIO(image.tobytes()), 'frame.jpg')},
+                           content_type='multipart/form-data')
+    client.post('/reset')
+
+    assert response.status_code == 200
+    assert records[0]['prediction'] == 'fake'
+    assert records[0]['raw_probability'] == pytest.approx(probability)
+
 def test_cors_headers(client):
     """Test CORS headers are present"""
     response = client.get('/health')
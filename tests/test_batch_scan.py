@@ -0,0 +1,61 @@
+"""
+Unit tests for the offline batch scanner
+"""
+
+import pytest
+import sys
+import os
+import numpy as np
+import cv2
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch_scan import ScanReport, decode_media, find_media_files
+
+def make_record(name):
+    return {'file': name, 'type': 'image', 'verdict': 'REAL', 'avg_fake_probability': 0.1,
+            'fake_percentage': 0.0, 'frames_sampled': 1, 'frames_with_faces': 1, 'error': None}
+
+@pytest.mark.parametrize('suffix', ['.jsonl', '.csv'])
+def test_report_resumes_completed_files(tmp_path, suffix):
+    """Test files written to the report are skipped on the next run"""
+    path = tmp_path / f'report{suffix}'
+    
+    report = ScanReport(path)
+    report.write(make_record('a.jpg'))
+    report.write(make_record('b.mp4'))
+    report.close()
+    
+    resumed = ScanReport(path)
+    resumed.close()
+    
+    assert resumed.completed == {'a.jpg', 'b.mp4'}
+
+def test_report_ignores_truncated_line(tmp_path):
+    """Test a partially written last line does not break resume"""
+    path = tmp_path / 'report.jsonl'
+    
+    report = ScanReport(path)
+    report.write(make_record('a.jpg'))
+    report.close()
+    with open(path, 'a') as f:
+        f.write('{"file": "b.j')
+    
+    assert ScanReport(path).completed == {'a.jpg'}
+
+def test_find_and_decode_media(tmp_path):
+    """Test media discovery and image decoding with downscaling"""
+    image = np.zeros((400, 800, 3), dtype=np.uint8)
+    cv2.imwrite(str(tmp_path / 'frame.jpg'), image)
+    (tmp_path / 'notes.txt').write_text('not media')
+    
+    files = find_media_files(tmp_path)
+    assert [p.name for p in files] == ['frame.jpg']
+    
+    _, frames, error = decode_media(files[0], frames_per_video=4, max_side=200)
+    assert error is None
+    assert frames[0].shape == (100, 200, 3)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
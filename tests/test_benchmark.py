@@ -0,0 +1,117 @@
+"""
+Unit tests for registration benchmarks and the production latency budget
+"""
+
+import pytest
+import sys
+import os
+import json
+import torch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from deepfake_detection import DeepfakeStudent
+from mlops.registry.model_registry import ModelRegistry
+
+def profile(p50, p99, throughput=100.0, **host):
+    """Performance profile as stored by registration"""
+    return dict({
+        'engine': 'torchscript', 'latency_p50_ms': p50, 'latency_p99_ms': p99,
+        'throughput_per_s': throughput, 'load_time_ms': 100.0, 'peak_rss_mb': 500.0,
+        'machine': 'x86_64', 'cpu_count': 4, 'threads': 1, 'torch_version': '2.0'
+    }, **host)
+
+@pytest.fixture
+def registry(tmp_path):
+    """Registry with two unexported versions, v1 in production"""
+    registry = ModelRegistry(tmp_path / 'registry')
+    for version in ('v1', 'v2'):
+        (registry.models_dir / version).mkdir()
+        registry.register_model(version, {'accuracy': 0.9})
+    registry.promote_to_production('v1')
+    return registry
+
+def test_registration_records_performance_profile(tmp_path):
+    """Test registering exported weights stores a benchmark in registry.json"""
+    registry = ModelRegistry(tmp_path / 'registry')
+    (registry.models_dir / 'v1').mkdir()
+    torch.save({'model_state_dict': DeepfakeStudent(pretrained=False).state_dict()},
+               registry.models_dir / 'v1' / 'model.pth')
+    registry.register_model('v1', {'accuracy': 0.9}, architecture='student')
+
+    with open(registry.metadata_file) as f:
+        performance = json.load(f)['models'][0]['performance']
+    assert performance['engine'] == 'torchscript' and performance['threads'] == 1
+    assert performance['latency_runs'] == 1000
+    assert 0 < performance['latency_p50_ms'] <= performance['latency_p99_ms']
+    for field in ('throughput_per_s', 'peak_rss_mb', 'load_time_ms'):
+        assert performance[field] > 0
+
+def test_profiles_from_another_host_are_remeasured_and_saved(tmp_path):
+    """Test a profile from another host is re-benchmarked once and persisted"""
+    registry = ModelRegistry(tmp_path / 'registry')
+    for version in ('v1', 'v2'):
+        (registry.models_dir / version).mkdir()
+        torch.save({'model_state_dict': DeepfakeStudent(pretrained=False).state_dict()},
+                   registry.models_dir / version / 'model.pth')
+        registry.register_model(version, {'accuracy': 0.9}, architecture='student', build_artifacts=False,
+                                benchmark=False)
+    registry.benchmark_model('v2')
+    measured = registry.get_model('v2')['performance']['timestamp']
+    registry.get_model('v1')['performance'] = profile(10.0, 20.0, torch_version='0.0.0')
+
+    registry.compare_models('v1', 'v2')
+
+    saved = ModelRegistry(tmp_path / 'registry')
+    assert saved.get_model('v1')['performance']['torch_version'] == torch.__version__
+    # Only the foreign profile was re-measured
+    assert saved.get_model('v2')['performance']['timestamp'] == measured
+
+def test_compare_models_reports_regressions(registry, capsys):
+    """Test compare_models flags slower latency and lower throughput only"""
+    registry.get_model('v1')['performance'] = profile(10.0, 20.0, throughput=100.0)
+    registry.get_model('v2')['performance'] = profile(12.0, 18.0, throughput=80.0)
+
+    regressions = registry.compare_models('v1', 'v2')
+
+    assert sorted(regressions) == ['latency_p50_ms', 'throughput_per_s']
+    assert regressions['latency_p50_ms']['change'] == pytest.approx(0.2)
+    assert regressions['throughput_per_s']['change'] == pytest.approx(0.2)
+    assert '⚠️  latency_p50_ms' in capsys.readouterr().out
+
+def test_promotion_blocked_over_latency_budget(registry):
+    """Test promotion fails over the p50 or p99 budget and passes within it or when forced"""
+    registry.get_model('v1')['performance'] = profile(10.0, 20.0)
+    registry.get_model('v2')['performance'] = profile(12.0, 20.0)
+
+    with pytest.raises(ValueError, match='latency_p50_ms'):
+        registry.promote_to_production('v2')
+    assert registry.registry['production_version'] == 'v1'
+
+    # p99 is gated too, with more room than p50
+    registry.get_model('v2')['performance'] = profile(10.5, 60.0)
+    violations = registry.check_latency_budget('v2')
+    assert len(violations) == 1 and violations[0].startswith('latency_p99_ms')
+    registry.get_model('v2')['performance'] = profile(10.5, 24.0)
+    assert registry.check_latency_budget('v2') == []
+
+    # Registry-level budget overrides the default
+    registry.get_model('v2')['performance'] = profile(12.0, 20.0)
+    registry.registry['latency_budget'] = {'latency_p50_ms': 0.3}
+    registry.promote_to_production('v2')
+    assert registry.registry['production_version'] == 'v2'
+
+    registry.get_model('v1')['performance'] = profile(5.0, 10.0)
+    registry.promote_to_production('v1', force=True)
+    assert registry.get_model('v1')['status'] == 'production'
+
+def test_promotion_without_profiles_is_not_gated(registry):
+    """Test versions registered before benchmarking can still be promoted"""
+    registry.get_model('v2')['performance'] = profile(50.0, 90.0)
+
+    registry.promote_to_production('v2')
+    assert registry.registry['production_version'] == 'v2'
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
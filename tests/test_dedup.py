@@ -0,0 +1,132 @@
+"""
+Unit tests for near-duplicate deduplication
+"""
+
+import pytest
+import sys
+import os
+import numpy as np
+import cv2
+
+# Add parent directory and mlops packages to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops', 'training')))
+
+from preprocessing.dedup import (cluster_pairs, dedup_dataset, hamming_distance, load_sample_list,
+                                 near_duplicate_pairs)
+
+def brute_force_pairs(hashes, max_distance):
+    return {(i, j) for i in range(len(hashes)) for j in range(i + 1, len(hashes))
+            if hamming_distance(hashes[i], hashes[j]) <= max_distance}
+
+def test_multi_index_matches_brute_force():
+    """Test the block index finds exactly the pairs an all-pairs scan finds"""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 2**63, size=20, dtype=np.uint64)
+    hashes = np.repeat(base, 5)
+    # Flip up to 8 random bits per copy so some pairs fall just outside the threshold
+    for i in range(len(hashes)):
+        for bit in rng.choice(64, size=rng.integers(0, 5), replace=False):
+            hashes[i] ^= np.uint64(1) << np.uint64(bit)
+    
+    for max_distance in (0, 3, 6):
+        assert near_duplicate_pairs(hashes, max_distance) == brute_force_pairs(hashes, max_distance)
+
+def test_chunked_bucket_check_matches_brute_force(monkeypatch):
+    """Test buckets checked a few rows at a time find the same pairs"""
+    import preprocessing.dedup as dedup
+    monkeypatch.setattr(dedup, 'CHUNK_PAIRS', 7)
+    rng = np.random.default_rng(5)
+    # One shared block value puts every hash in the same bucket
+    hashes = (rng.integers(0, 2**20, size=60, dtype=np.uint64) << np.uint64(44)) | np.uint64(0xABC)
+    
+    assert near_duplicate_pairs(hashes, 6) == brute_force_pairs(hashes, 6)
+
+def test_cluster_pairs_uses_lowest_index_as_root():
+    """Test clusters keep their first sample and only take its direct near-duplicates"""
+    roots = cluster_pairs(6, {(3, 4), (1, 3), (0, 5)})
+    # 4 is close to 3 but not to the kept 1, so it is kept too
+    assert roots.tolist() == [0, 1, 2, 1, 4, 0]
+
+def test_slowly_changing_clip_does_not_collapse():
+    """Test a drifting clip keeps a frame each time it moves past the threshold"""
+    # Frame k differs from frame 0 in k bits, so neighbours are always within 2 bits
+    hashes = np.array([(1 << k) - 1 for k in range(12)], dtype=np.uint64)
+    roots = cluster_pairs(len(hashes), near_duplicate_pairs(hashes, max_distance=2))
+    
+    kept = np.flatnonzero(roots == np.arange(len(hashes)))
+    assert kept.tolist() == [0, 3, 6, 9]
+    assert all(hamming_distance(hashes[i], hashes[roots[i]]) <= 2 for i in range(len(hashes)))
+
+def test_dedup_dataset_writes_reduced_list(tmp_path):
+    """Test near-identical frames collapse to one sample per clip and class"""
+    rng = np.random.default_rng(1)
+    for class_dir, prefix in (('Real', 'real'), ('Fake', 'fake')):
+        (tmp_path / class_dir).mkdir()
+        for clip in range(2):
+            scene = cv2.resize(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8), (128, 128),
+                               interpolation=cv2.INTER_CUBIC)
+            for frame in range(4):
+                noisy = np.clip(scene.astype(int) + rng.integers(-2, 3, scene.shape), 0, 255).astype(np.uint8)
+                cv2.imwrite(str(tmp_path / class_dir / f'{prefix}_clip{clip}_frame_{frame:04d}.png'), noisy)
+    
+    stats = dedup_dataset(tmp_path, max_distance=6, num_workers=1)
+    
+    assert stats['samples'] == 16
+    assert stats['kept'] == 4
+    with open(tmp_path / 'dedup_samples.txt') as f:
+        kept = [line.strip() for line in f if not line.startswith('#')]
+    assert all(path.endswith('_frame_0000.png') for path in kept)
+    
+    # Hashes persist in the manifest, so a re-run decodes nothing
+    assert dedup_dataset(tmp_path, max_distance=6, num_workers=1)['hashed'] == 0
+    
+    from train_model import DeepfakeDataset
+    dataset = DeepfakeDataset(tmp_path, mode='images', sample_list=tmp_path / 'dedup_samples.txt')
+    assert len(dataset) == 4
+
+def test_identical_frames_collapse_without_pairing(tmp_path, monkeypatch):
+    """Test a run of blank frames keeps one per label and never builds their pairs"""
+    import preprocessing.dedup as dedup
+    for class_dir in ('Real', 'Fake'):
+        (tmp_path / class_dir).mkdir()
+        for frame in range(40):
+            cv2.imwrite(str(tmp_path / class_dir / f'{class_dir}_frame_{frame:04d}.png'),
+                        np.zeros((64, 64, 3), dtype=np.uint8))
+    
+    compared = []
+    def recording(hashes, max_distance=6):
+        compared.append(len(hashes))
+        return near_duplicate_pairs(hashes, max_distance)
+    monkeypatch.setattr(dedup, 'near_duplicate_pairs', recording)
+    
+    stats = dedup_dataset(tmp_path, max_distance=6, num_workers=1)
+    
+    assert stats['kept'] == 2
+    # One distinct hash per label reaches the pair search
+    assert compared == [1, 1]
+
+def test_undecodable_images_are_recorded_and_kept(tmp_path):
+    """Test images that fail to decode are hashed once, kept in the list and reported"""
+    from train_model import DeepfakeDataset
+    for class_dir in ('Real', 'Fake'):
+        (tmp_path / class_dir).mkdir()
+        cv2.imwrite(str(tmp_path / class_dir / f'{class_dir}_frame_0000.png'),
+                    np.random.default_rng(6).integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    (tmp_path / 'Real' / 'Real_frame_0001.jpg').write_bytes(b'truncated upload')
+    
+    stats = dedup_dataset(tmp_path, max_distance=6, num_workers=1)
+    
+    assert stats['undecodable'] == 1
+    assert stats['kept'] == stats['samples'] == 3
+    assert 'Real/Real_frame_0001.jpg' in load_sample_list(tmp_path / 'dedup_samples.txt')
+    # The failure is recorded, so a re-run does not decode it again
+    assert dedup_dataset(tmp_path, max_distance=6, num_workers=1)['hashed'] == 0
+    
+    # Sample lists only describe manifest images
+    with pytest.raises(ValueError, match='images mode'):
+        DeepfakeDataset(tmp_path, mode='shards', sample_list=tmp_path / 'dedup_samples.txt')
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
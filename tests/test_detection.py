@@ -130,5 +130,150 @@ def test_voting_stats():
     assert stats['real_count'] == 1
     assert stats['total_frames'] == 3
 
+def test_forensic_pool_processes_job():
+    """Test forensic jobs run in the background and store a result"""
+    import time
+    from forensic_analysis import ForensicWorkerPool
+    
+    detector = DeepfakeDetector(use_tta=False)
+    pool = ForensicWorkerPool(detector, queue_size=2, max_height=240, max_width=320,
+                              num_tta_augmentations=2)
+    pool.start()
+    
+    frame = np.random.randint(0, 255, (240, 320, 3), dtype=np.uint8)
+    job_id = pool.submit(frame, (50, 50, 100, 100))
+    assert job_id is not None
+    
+    deadline = time.time() + 30
+    while pool.get_job(job_id)['status'] in ('queued', 'running') and time.time() < deadline:
+        time.sleep(0.05)
+    pool.stop()
+    
+    job = pool.get_job(job_id)
+    assert job['status'] == 'done'
+    assert 'frequency_adjustment' in job['result']
+    assert job['result']['face_bbox'] == {'x': 50, 'y': 50, 'width': 100, 'height': 100}
+
+def test_gradcam_explainer_caches_overlays():
+    """Test GradCAM overlays are PNG encoded and cached by face hash"""
+    import torch
+    from deepfake_detection import model
+    from gradcam_explainer import GradCAMExplainer
+    
+    explainer = GradCAMExplainer(model, lambda face: torch.randn(1, 3, 224, 224), cache_size=1)
+    face_a = np.full((100, 100, 3), 10, dtype=np.uint8)
+    face_b = np.full((100, 100, 3), 20, dtype=np.uint8)
+    
+    png, cache_hit = explainer.explain(face_a)
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    assert not cache_hit
+    
+    png_again, cache_hit = explainer.explain(face_a)
+    assert cache_hit
+    assert png_again == png
+    
+    # cache_size=1: explaining another face evicts the first
+    explainer.explain(face_b)
+    _, cache_hit = explainer.explain(face_a)
+    assert not cache_hit
+
+def test_gradcam_explainer_coalesces_and_skips_failures():
+    """Test identical concurrent requests share one pass and failed encodes are not cached"""
+    import threading
+    import time
+    import torch
+    from deepfake_detection import model
+    from gradcam_explainer import GradCAMExplainer
+    
+    explainer = GradCAMExplainer(model, lambda face: torch.randn(1, 3, 224, 224))
+    face = np.full((100, 100, 3), 30, dtype=np.uint8)
+    release = threading.Event()
+    batches = []
+    def explain_batch(inputs):
+        release.wait(10)
+        batches.append(len(inputs))
+        return [None] * len(inputs) if len(batches) == 1 else [b'png'] * len(inputs)
+    explainer._explain_batch = explain_batch
+    
+    errors = []
+    def request():
+        try:
+            explainer.explain(face)
+        except RuntimeError as e:
+            errors.append(e)
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while explainer.get_stats()['coalesced'] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    # One GradCAM pass for all four; its encode failure reaches every caller
+    assert batches == [1] and len(errors) == 4
+    assert explainer.get_stats()['cached'] == 0
+    
+    assert explainer.explain(face) == (b'png', False)
+    assert explainer.explain(face) == (b'png', True)
+
+def test_bf16_precision_matches_fp32():
+    """Test bf16/channels_last inference stays close to fp32"""
+    import copy
+    import torch
+    from deepfake_detection import model
+    
+    net = copy.deepcopy(model).eval()
+    inputs = torch.randn(2, 3, 224, 224)
+    
+    assert net.configure_precision('fp32') == 'fp32'
+    with torch.no_grad():
+        fp32_out = net(inputs)
+    
+    assert net.configure_precision('bf16', force=True) == 'bf16'
+    with torch.no_grad():
+        bf16_out = net(inputs)
+    
+    assert bf16_out.dtype == torch.float32
+    assert torch.allclose(torch.sigmoid(fp32_out), torch.sigmoid(bf16_out), atol=0.05)
+
+def test_warmup_reports_stage_timings():
+    """Test warmup runs every inference stage and reports its timings"""
+    detector = DeepfakeDetector(use_tta=False)
+    
+    timings = detector.warmup(batch_sizes=(1, 2))
+    
+    for stage in ('face_detection_ms', 'alignment_ms', 'model_ms'):
+        assert timings[stage] > 0
+    assert abs(timings['total_ms'] - sum(timings[s] for s in ('face_detection_ms', 'alignment_ms', 'model_ms'))) < 1e-6
+
+def test_score_frames_without_faces():
+    """Test batched scoring returns one entry per frame"""
+    detector = DeepfakeDetector(use_tta=False)
+    frames = [np.zeros((240, 320, 3), dtype=np.uint8) for _ in range(3)]
+    
+    results = detector.score_frames(frames)
+    
+    assert len(results) == 3
+    for result in results:
+        assert result['faces_detected'] == 0
+        assert result['faces'] == []
+
+def test_score_faces_matches_single_face_analysis():
+    """Test batched face scores equal the one-face-at-a-time path"""
+    import torch
+    
+    detector = DeepfakeDetector(use_tta=False)
+    # Deterministic stand-in for MTCNN alignment
+    detector._prepare_face_tensor = lambda face: torch.full((1, 3, 224, 224), float(face.mean()) / 255.0)
+    crops = [np.full((100, 100, 3), value, dtype=np.uint8) for value in (30, 120, 220)]
+    
+    batch_scores = detector.score_faces(crops)
+    
+    for crop, (raw_prob, fake_prob) in zip(crops, batch_scores):
+        single_prob, _, _ = detector.analyze_face(crop)
+        assert abs(fake_prob - single_prob) < 1e-5
+        assert 0.0 <= raw_prob <= 1.0
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
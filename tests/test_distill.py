@@ -0,0 +1,45 @@
+"""
+Unit tests for student distillation
+"""
+
+import pytest
+import sys
+import os
+import torch
+import torch.nn.functional as F
+
+# Add parent directory and mlops packages to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops', 'training')))
+
+from deepfake_detection import DeepfakeStudent
+from distill import distillation_loss
+
+def test_student_outputs_single_logit():
+    """Test the student matches the serving interface (one fake logit per face)"""
+    student = DeepfakeStudent(pretrained=False).eval()
+    
+    with torch.no_grad():
+        logits = student(torch.randn(2, 3, 224, 224))
+    
+    assert logits.shape == (2, 1)
+    assert student.get_feature_extractor() is student.mobilenet.features[-1]
+    assert student.configure_precision('fp32') == 'fp32'
+
+def test_distillation_loss_weights_soft_and_hard_terms():
+    """Test alpha blends the teacher term with plain hard-label BCE"""
+    student_logits = torch.tensor([2.0, -1.0, 0.5])
+    teacher_logits = torch.tensor([3.0, -2.0, 0.0])
+    labels = torch.tensor([1, 0, 1])
+    
+    hard_only = distillation_loss(student_logits, teacher_logits, labels, alpha=0.0)
+    assert torch.isclose(hard_only, F.binary_cross_entropy_with_logits(student_logits, labels.float()))
+    
+    # Matching the teacher exactly minimizes the soft term
+    matched = distillation_loss(teacher_logits, teacher_logits, labels, alpha=1.0)
+    mismatched = distillation_loss(-teacher_logits, teacher_logits, labels, alpha=1.0)
+    assert matched < mismatched
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,73 @@
+"""
+Unit tests for model evaluation
+"""
+
+import pytest
+import sys
+import os
+import numpy as np
+import torch
+
+# Add parent directory and mlops packages to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops')))
+
+from deepfake_detection import DeepfakeStudent, load_engine
+from model_weights import file_sha256
+from safetensors.torch import save_file
+from serving_artifacts import build_artifacts
+from preprocessing.face_shards import FaceShardWriter
+from evaluation import evaluate
+
+def test_precision_sweep_uses_eager_model_behind_engines(tmp_path, monkeypatch):
+    """Test the bf16 run really computes in bf16 when a TorchScript engine is serving"""
+    torch.manual_seed(0)
+    net = DeepfakeStudent(pretrained=False).eval()
+    path = tmp_path / 'student.safetensors'
+    save_file({key: value.contiguous() for key, value in net.state_dict().items()}, str(path))
+    sha256 = file_sha256(path)
+    build_artifacts(net, sha256, tmp_path / 'artifacts', engines=('torchscript',))
+    engine = load_engine('student', path, 'torchscript', tmp_path / 'artifacts')
+    assert engine.engine == 'torchscript'
+    monkeypatch.setattr(evaluate, 'model', engine)
+
+    writer = FaceShardWriter(tmp_path / 'shards', image_size=224)
+    rng = np.random.default_rng(0)
+    for i in range(4):
+        writer.add(rng.integers(0, 256, (224, 224, 3), dtype=np.uint8), i % 2, f'img_{i}.jpg')
+    writer.close()
+
+    results = evaluate.compare_precision(None, batch_size=4, shard_dir=tmp_path / 'shards')
+
+    assert results['samples'] == 4
+    # An fp32 "bf16" run would give identical probabilities
+    assert results['max_abs_prob_diff'] > 0
+
+def test_shards_are_scored_one_batch_at_a_time(tmp_path):
+    """Test shard inputs are normalized per batch and score like the full tensor"""
+    writer = FaceShardWriter(tmp_path / 'shards', image_size=224, shard_size=3)
+    rng = np.random.default_rng(0)
+    for i in range(5):
+        writer.add(rng.integers(0, 256, (224, 224, 3), dtype=np.uint8), i % 2, f'img_{i}.jpg')
+    writer.close()
+    torch.manual_seed(0)
+    net = DeepfakeStudent(pretrained=False).eval()
+
+    batches, labels, skipped = evaluate.load_inputs(shard_dir=tmp_path / 'shards')
+    assert [len(batch) for batch in batches(2)] == [2, 1, 2]
+    assert list(labels) == [0, 1, 0, 1, 0] and skipped == 0
+
+    probs, _ = evaluate.score(net, batches(2))
+    full, _ = evaluate.score(net, [torch.cat(list(batches(5)))])
+    assert np.allclose(probs, full, atol=1e-5)
+
+def test_metrics_default_to_serving_threshold():
+    """Test accuracy is scored at the threshold the backend serves with"""
+    labels = np.array([0, 1])
+    probs = np.array([0.2, 0.4])
+    
+    assert evaluate.classification_metrics(labels, probs)['accuracy'] == 1.0
+    assert evaluate.classification_metrics(labels, probs, threshold=0.5)['accuracy'] == 0.5
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
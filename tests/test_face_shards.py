@@ -0,0 +1,109 @@
+"""
+Unit tests for the face-crop shard store
+"""
+
+import pytest
+import sys
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+
+# Add parent directory and mlops packages to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops', 'training')))
+
+from preprocessing.face_shards import FaceShardStore, FaceShardWriter, build_face_shards
+
+TEST_IMAGES = Path(__file__).parent.parent / 'dataset' / 'Dataset' / 'Test'
+
+def write_store(path, count=10, shard_size=4, image_size=8):
+    """Store whose crop i is filled with value i"""
+    writer = FaceShardWriter(path, shard_size=shard_size, image_size=image_size)
+    for i in range(count):
+        writer.add(np.full((image_size, image_size, 3), i, dtype=np.uint8), i % 2, f'img_{i}.jpg')
+    writer.close()
+    return FaceShardStore(path)
+
+def test_store_round_trip(tmp_path):
+    """Test crops and labels come back in order across shard boundaries"""
+    store = write_store(tmp_path)
+
+    assert len(store) == 10
+    assert len(store.index['shards']) == 3
+    for i in range(10):
+        crop, label = store[i]
+        assert crop[0, 0, 0] == i
+        assert label == i % 2
+    assert store.source(5) == ('img_5.jpg', 0)
+    with pytest.raises(IndexError):
+        store[10]
+
+def test_store_slices_are_zero_copy(tmp_path):
+    """Test slices inside a shard are views of the memory map"""
+    store = write_store(tmp_path)
+
+    crops, labels = store.get_range(4, 7)
+    assert isinstance(crops.base, np.memmap) or isinstance(crops, np.memmap)
+    assert not crops.flags.writeable
+    assert list(crops[:, 0, 0, 0]) == [4, 5, 6]
+
+    # Ranges spanning shards are stitched together
+    crops, labels = store.get_range(2, 9)
+    assert list(crops[:, 0, 0, 0]) == list(range(2, 9))
+    assert list(labels) == [i % 2 for i in range(2, 9)]
+
+def test_iter_batches_stays_inside_shards(tmp_path):
+    """Test batches never cross a shard and cover every crop once"""
+    store = write_store(tmp_path)
+
+    seen = []
+    for crops, labels in store.iter_batches(3):
+        assert len(crops) == len(labels) <= 3
+        seen.extend(crops[:, 0, 0, 0].tolist())
+    assert seen == list(range(10))
+
+def test_dataset_shards_mode(tmp_path):
+    """Test DeepfakeDataset reads crops from a shard directory"""
+    from train_model import DeepfakeDataset
+    write_store(tmp_path, count=5, image_size=224)
+
+    dataset = DeepfakeDataset(tmp_path, mode='shards')
+    image, label = dataset[3]
+
+    assert len(dataset) == 5
+    assert image.size == (224, 224)
+    assert np.asarray(image)[0, 0, 0] == 3
+    assert label == 1
+
+@pytest.mark.skipif(not (TEST_IMAGES / 'Real').exists(), reason='Test images not available')
+def test_build_matches_serving_alignment(tmp_path):
+    """Test built crops match the detector's own alignment of the same image"""
+    from deepfake_detection import DeepfakeDetector, NORM_MEAN, NORM_STD
+    from face_alignment import uint8_to_input
+    from face_detection import detect_bounding_box
+    import cv2
+
+    data_dir = tmp_path / 'data'
+    for class_dir in ('Real', 'Fake'):
+        (data_dir / class_dir).mkdir(parents=True)
+        for image in sorted((TEST_IMAGES / class_dir).glob('*.jpg'))[:2]:
+            shutil.copy(image, data_dir / class_dir / image.name)
+
+    stats = build_face_shards(data_dir, tmp_path / 'shards', num_workers=1, shard_size=2)
+    store = FaceShardStore(tmp_path / 'shards')
+    assert stats['frames'] == 4
+    assert len(store) == stats['crops'] > 0
+
+    detector = DeepfakeDetector(use_tta=False)
+    crop, _ = store[0]
+    frame = cv2.imread(store.source(0)[0])
+    x, y, w, h = detect_bounding_box(frame)[0]
+    expected = detector._prepare_face_tensor(detector.preprocess_face_quality(frame[y:y + h, x:x + w]))
+    actual = uint8_to_input(crop[None], NORM_MEAN, NORM_STD)
+    # Only uint8 rounding separates the stored crop from the serving tensor
+    assert (actual - expected).abs().max().item() < 0.02
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,73 @@
+"""
+Unit tests for the preallocated frame ring buffer
+"""
+
+import pytest
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from frame_buffer import FrameRingBuffer
+
+def make_frame(value, height=48, width=64):
+    """Create a solid test frame"""
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+def test_put_get_release_roundtrip():
+    """Test frames come back in order with their metadata"""
+    buffer = FrameRingBuffer(capacity=2, max_height=48, max_width=64)
+    
+    buffer.put(make_frame(1), meta='a')
+    buffer.put(make_frame(2), meta='b')
+    
+    slot, frame, meta = buffer.get(timeout=1)
+    assert meta == 'a'
+    assert frame.shape == (48, 64, 3)
+    assert frame[0, 0, 0] == 1
+    buffer.release(slot)
+    
+    _, frame, meta = buffer.get(timeout=1)
+    assert meta == 'b'
+    assert frame[0, 0, 0] == 2
+
+def test_full_buffer_rejects_new_frames():
+    """Test new frames are dropped when every slot is in use"""
+    buffer = FrameRingBuffer(capacity=1, max_height=48, max_width=64)
+    
+    assert buffer.put(make_frame(1)) is not None
+    assert buffer.put(make_frame(2)) is None
+    assert buffer.dropped == 1
+
+def test_drop_oldest_overwrites_pending_frame():
+    """Test drop_oldest keeps the most recent frames"""
+    buffer = FrameRingBuffer(capacity=2, max_height=48, max_width=64)
+    
+    for value in (1, 2, 3):
+        buffer.put(make_frame(value), meta=value, drop_oldest=True)
+    
+    assert buffer.dropped == 1
+    assert buffer.get(timeout=1)[2] == 2
+    assert buffer.get(timeout=1)[2] == 3
+
+def test_oversized_frame_is_downscaled():
+    """Test frames larger than a slot are resized to fit"""
+    buffer = FrameRingBuffer(capacity=1, max_height=48, max_width=64)
+    
+    buffer.put(make_frame(7, height=96, width=128))
+    _, frame, _ = buffer.get(timeout=1)
+    
+    assert frame.shape == (48, 64, 3)
+    assert frame[10, 10, 0] == 7
+
+def test_get_returns_none_when_closed():
+    """Test closing the buffer wakes consumers"""
+    buffer = FrameRingBuffer(capacity=1, max_height=48, max_width=64)
+    buffer.close()
+    
+    assert buffer.get(timeout=1) is None
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
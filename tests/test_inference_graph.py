@@ -0,0 +1,70 @@
+"""
+Unit tests for BatchNorm folding and dropout stripping
+"""
+
+import pytest
+import sys
+import os
+import copy
+import torch
+import torch.nn as nn
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from deepfake_detection import build_model
+from inference_graph import optimize_for_inference
+
+BATCHNORM_AND_DROPOUT = (nn.BatchNorm1d, nn.BatchNorm2d, nn.Dropout)
+
+def trained_looking(kind):
+    """Serving model with non-trivial BatchNorm statistics and affine parameters"""
+    torch.manual_seed(0)
+    net = build_model(kind).eval()
+    for module in net.modules():
+        if isinstance(module, (nn.BatchNorm1d, nn.BatchNorm2d)):
+            module.running_mean.uniform_(-0.5, 0.5)
+            module.running_var.uniform_(0.5, 2.0)
+            module.weight.data.uniform_(0.5, 1.5)
+            module.bias.data.uniform_(-0.2, 0.2)
+    return net
+
+def feature_map(net, x):
+    """Output of the GradCAM layer"""
+    captured = []
+    handle = net.get_feature_extractor().register_forward_hook(lambda m, i, output: captured.append(output))
+    with torch.no_grad():
+        net(x)
+    handle.remove()
+    return captured[0]
+
+@pytest.mark.parametrize('kind', ['efficientnet', 'student'])
+def test_optimized_graph_matches_original(kind):
+    """Test folding changes neither the logits nor the GradCAM activations"""
+    net = trained_looking(kind)
+    optimized = optimize_for_inference(copy.deepcopy(net))
+    x = torch.randn(3, 3, 224, 224)
+    
+    with torch.no_grad():
+        assert torch.allclose(optimized(x), net(x), atol=1e-5)
+    assert torch.allclose(feature_map(optimized, x), feature_map(net, x), atol=1e-5)
+    
+    remaining = [m for m in optimized.modules() if isinstance(m, BATCHNORM_AND_DROPOUT)]
+    # Only the BatchNorm right after the GradCAM layer is kept
+    assert len(remaining) == (1 if kind == 'efficientnet' else 0)
+
+def test_full_folding_before_export():
+    """Test explainable=False also folds the head and a second pass is harmless"""
+    net = trained_looking('efficientnet')
+    optimized = optimize_for_inference(copy.deepcopy(net))
+    optimize_for_inference(optimized, explainable=False)
+    x = torch.randn(2, 3, 224, 224)
+    
+    assert not any(isinstance(m, BATCHNORM_AND_DROPOUT) for m in optimized.modules())
+    assert [type(m) for m in optimized.efficientnet._fc] == [nn.Linear, nn.ReLU, nn.Linear, nn.ReLU, nn.Linear]
+    assert isinstance(optimized.efficientnet._swish, nn.SiLU)
+    with torch.no_grad():
+        assert torch.allclose(optimized(x), net(x), atol=1e-5)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
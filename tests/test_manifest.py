@@ -0,0 +1,97 @@
+"""
+Unit tests for the dataset manifest
+"""
+
+import pytest
+import sys
+import os
+import numpy as np
+import cv2
+
+# Add parent directory and mlops packages to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops', 'training')))
+
+from preprocessing.manifest import build_manifest, group_split, load_manifest, source_of
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """Capitalized Real/ and Fake/ folders of extracted frames from two videos each"""
+    for class_dir, prefix in (('Real', 'real'), ('Fake', 'fake')):
+        (tmp_path / class_dir).mkdir()
+        for video in ('clip a', 'clip_b'):
+            for frame in range(3):
+                path = tmp_path / class_dir / f'{prefix}_{prefix} {video}_frame_{frame:04d}.jpg'
+                cv2.imwrite(str(path), np.full((8, 8, 3), frame * 40, dtype=np.uint8))
+    return tmp_path
+
+def test_source_of_parses_extracted_frames():
+    """Test frame filenames map back to their source video"""
+    assert source_of('Fake/fake_Obama speech_frame_0119.jpg') == ('Obama speech', 119)
+    assert source_of('Real/real_some_clip_frame_0002.png') == ('some_clip', 2)
+    assert source_of('Real/portrait.jpg') == ('portrait', None)
+
+def test_manifest_updates_incrementally(image_dir):
+    """Test only new, changed and deleted files touch the manifest"""
+    stats = build_manifest(image_dir)
+    assert stats['added'] == 12
+    
+    stats = build_manifest(image_dir)
+    assert (stats['added'], stats['updated'], stats['removed'], stats['unchanged']) == (0, 0, 0, 12)
+    
+    changed = next((image_dir / 'Real').iterdir())
+    cv2.imwrite(str(changed), np.full((16, 16, 3), 255, dtype=np.uint8))
+    os.remove(next((image_dir / 'Fake').iterdir()))
+    stats = build_manifest(image_dir)
+    assert (stats['updated'], stats['removed'], stats['unchanged']) == (1, 1, 10)
+    
+    samples = load_manifest(image_dir / 'manifest.sqlite')
+    assert len(samples) == 11
+    assert {label for _, label, _ in samples} == {0, 1}
+    assert all(os.path.exists(path) for path, _, _ in samples)
+
+def test_training_prepares_manifest_once(image_dir, monkeypatch):
+    """Test the launcher builds the manifest and ranks only read it"""
+    import train_model
+    config = {'data': {'mode': 'images'}}
+    train_model.prepare_manifest(config, image_dir)
+    
+    builds = []
+    monkeypatch.setattr(train_model, 'build_manifest',
+                        lambda *args: builds.append(args) or {'added': 0, 'updated': 0, 'removed': 0})
+    dataset = train_model.DeepfakeDataset(image_dir)
+    assert len(dataset) == 12 and builds == []
+    
+    # Existing manifests are reused unless a refresh is configured
+    train_model.prepare_manifest(config, image_dir)
+    assert builds == []
+    config['data']['refresh_manifest'] = True
+    train_model.prepare_manifest(config, image_dir)
+    assert len(builds) == 1
+
+def test_group_split_keeps_videos_together():
+    """Test no source video appears in more than one split"""
+    groups = [f'video_{i // 5}' for i in range(100)]
+    train, val, test = group_split(groups, val_fraction=0.15, test_fraction=0.15)
+    
+    assert sorted(train + val + test) == list(range(100))
+    assert len(val) >= 15 and len(test) >= 15
+    split_groups = [{groups[i] for i in split} for split in (train, val, test)]
+    assert not (split_groups[0] & split_groups[1])
+    assert not (split_groups[0] & split_groups[2])
+    assert not (split_groups[1] & split_groups[2])
+
+def test_dataset_loads_from_manifest(image_dir):
+    """Test image mode reads capitalized class folders through the manifest"""
+    from train_model import DeepfakeDataset
+    dataset = DeepfakeDataset(image_dir, mode='images')
+    
+    assert len(dataset) == 12
+    assert (image_dir / 'manifest.sqlite').exists()
+    assert sorted(set(dataset.groups)) == ['fake clip a', 'fake clip_b', 'real clip a', 'real clip_b']
+    image, label = dataset[0]
+    assert image.size == (8, 8)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
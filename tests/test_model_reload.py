@@ -0,0 +1,151 @@
+"""
+Unit tests for hot model reload
+"""
+
+import pytest
+import sys
+import os
+import threading
+import time
+import torch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from deepfake_detection import DeepfakeDetector, DeepfakeStudent
+from model_reload import ModelReloader
+
+@pytest.fixture
+def registry(tmp_path):
+    """Registry with two exported student versions, v1 in production"""
+    from mlops.registry.model_registry import ModelRegistry
+
+    registry = ModelRegistry(tmp_path / 'registry')
+    nets = {}
+    for seed, version in enumerate(('v1', 'v2')):
+        torch.manual_seed(seed)
+        nets[version] = DeepfakeStudent(pretrained=False).eval()
+        (registry.models_dir / version).mkdir()
+        torch.save({'model_state_dict': nets[version].state_dict()}, registry.models_dir / version / 'model.pth')
+        registry.register_model(version, {'accuracy': 0.9}, architecture='student', benchmark=False)
+    registry.promote_to_production('v1')
+    return registry, nets
+
+class ConstantModel(torch.nn.Module):
+    """Stand-in model returning one logit per input, optionally blocking mid-batch"""
+
+    def __init__(self, logit, gate=None):
+        super().__init__()
+        self.logit = logit
+        self.gate = gate
+        self.entered = threading.Event()
+
+    def forward(self, x):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return torch.full((x.shape[0], 1), self.logit)
+
+def test_in_flight_batch_finishes_on_old_model():
+    """Test a swap during a running batch only affects the next batch"""
+    detector = DeepfakeDetector(use_tta=False)
+    gate = threading.Event()
+    detector.swap_model(ConstantModel(-10.0, gate), 'old')
+    inputs = [torch.zeros(1, 3, 224, 224)] * 2
+
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(probs=detector._predict_batch(inputs, max_batch_size=1)))
+    worker.start()
+    detector.model.entered.wait(5)
+    detector.swap_model(ConstantModel(10.0), 'new')
+    gate.set()
+    worker.join(5)
+
+    # Both chunks of the in-flight call ran on the old model
+    assert all(p < 0.01 for p in result['probs'])
+    assert detector._predict_batch(inputs)[0] > 0.99
+    assert detector.model_version == 'new'
+
+def test_swap_invalidates_explainer():
+    """Test the GradCAM explainer is rebuilt around the new model"""
+    detector = DeepfakeDetector(use_tta=False)
+    explainer = detector.get_explainer()
+
+    new_model = ConstantModel(0.0)
+    detector.swap_model(new_model, 'v2')
+
+    assert detector.get_explainer() is not explainer
+    assert detector.get_explainer().model is new_model
+
+def test_reload_from_registry(registry):
+    """Test a registry version is loaded, warmed up and swapped in"""
+    registry, nets = registry
+    detector = DeepfakeDetector(use_tta=False)
+    swapped = []
+    reloader = ModelReloader(detector, 'efficientnet', registry_dir=registry.registry_dir,
+                             precision='fp32', on_swap=swapped.append)
+
+    status = reloader.reload('v2')
+
+    assert detector.model_version == 'v2' and swapped == ['v2']
+    assert status['architecture'] == 'student'
+    assert status['swap_ms'] < status['load_ms'] + status['warmup_ms']
+    x = torch.randn(2, 3, 224, 224)
+    with torch.no_grad():
+        assert torch.allclose(detector.model(x), nets['v2'](x), atol=1e-5)
+
+def test_watcher_follows_production_and_survives_bad_weights(registry):
+    """Test promotion triggers a reload and corrupt weights keep the old model"""
+    registry, _ = registry
+    detector = DeepfakeDetector(use_tta=False)
+    reloader = ModelReloader(detector, 'student', registry_dir=registry.registry_dir,
+                             precision='fp32', engine='eager')
+
+    assert reloader.check_registry()
+    assert detector.model_version == 'v1'
+    assert not reloader.check_registry()
+
+    with open(registry.models_dir / 'v2' / 'model.safetensors', 'ab') as f:
+        f.write(b'\0')
+    registry.promote_to_production('v2')
+    serving = detector.model
+
+    with pytest.raises(ValueError):
+        reloader.check_registry()
+    assert detector.model is serving and detector.model_version == 'v1'
+    assert 'sha256' in reloader.get_status()['last_error']
+
+def test_failed_reload_is_retried_after_backoff(registry):
+    """Test a production version whose files are not ready yet is reloaded once they are, without reloading on every poll"""
+    registry, _ = registry
+    detector = DeepfakeDetector(use_tta=False)
+    reloader = ModelReloader(detector, 'student', registry_dir=registry.registry_dir,
+                             precision='fp32', engine='eager')
+    assert reloader.check_registry()
+
+    weights = registry.models_dir / 'v2' / 'model.safetensors'
+    intact = weights.read_bytes()
+    weights.write_bytes(intact[:100])
+    registry.promote_to_production('v2')
+    with pytest.raises(ValueError):
+        reloader.check_registry()
+
+    # registry.json is unchanged: polls inside the backoff skip the reload
+    assert not reloader.check_registry()
+    assert reloader.get_status()['failed_reloads'] == 1
+    reloader._failed = reloader._failed[:3] + (0.0,)
+    with pytest.raises(ValueError):
+        reloader.check_registry()
+    assert reloader.get_status()['failed_reloads'] == 2
+    assert reloader._failed[3] - time.monotonic() > reloader.poll_interval * 3
+
+    # Once the backoff passes, the fixed files are picked up
+    weights.write_bytes(intact)
+    reloader._failed = reloader._failed[:3] + (0.0,)
+    assert reloader.check_registry()
+    assert reloader.get_status()['failed_reloads'] == 0
+    assert detector.model_version == 'v2'
+    assert not reloader.check_registry()
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,152 @@
+"""
+Unit tests for safetensors serving weights
+"""
+
+import pytest
+import sys
+import os
+import json
+import subprocess
+import torch
+
+# Add parent directory and mlops packages to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops')))
+
+from deepfake_detection import DeepfakeStudent, build_model
+from model_weights import export_safetensors, file_sha256, load_weights, normalize_state_dict
+
+@pytest.fixture
+def student_checkpoint(tmp_path):
+    """Training-style checkpoint of a student saved from DistributedDataParallel"""
+    torch.manual_seed(0)
+    net = DeepfakeStudent(pretrained=False).eval()
+    state_dict = {f'module.{key}': value for key, value in net.state_dict().items()}
+    path = tmp_path / 'model.pth'
+    torch.save({'epoch': 3, 'model_state_dict': state_dict, 'val_metrics': {'accuracy': 0.9}}, path)
+    return net, path
+
+def test_normalize_state_dict_prefixes():
+    """Test DDP and legacy backbone prefixes are normalized"""
+    tensor = torch.zeros(1)
+    normalized = normalize_state_dict({'model_state_dict': {
+        'module.mobilenet.a': tensor, 'net._fc.weight': tensor, 'efficientnet._bn0.bias': tensor}})
+    assert sorted(normalized) == ['efficientnet._bn0.bias', 'efficientnet._fc.weight', 'mobilenet.a']
+
+def test_export_and_memory_mapped_load(student_checkpoint, tmp_path):
+    """Test exported weights load into a meta-device model and match the original"""
+    net, checkpoint = student_checkpoint
+    output = tmp_path / 'model.safetensors'
+    sha256 = export_safetensors(checkpoint, output, 'student')
+    assert sha256 == file_sha256(output)
+    
+    with torch.device('meta'):
+        loaded = build_model('student')
+    load_weights(loaded, output, expected_sha256=sha256).eval()
+    
+    x = torch.randn(2, 3, 224, 224)
+    with torch.no_grad():
+        assert torch.equal(loaded(x), net(x))
+    
+    # Private mapping: changing a loaded tensor never writes back to the file
+    with torch.no_grad():
+        next(loaded.parameters()).add_(1.0)
+    assert file_sha256(output) == sha256
+    with pytest.raises(ValueError):
+        load_weights(build_model('student'), output, expected_sha256='0' * 64)
+
+def test_export_rejects_mismatched_checkpoint(student_checkpoint, tmp_path):
+    """Test a checkpoint with missing tensors fails verification instead of loading partially"""
+    _, checkpoint = student_checkpoint
+    state_dict = torch.load(checkpoint)['model_state_dict']
+    state_dict.pop(next(iter(state_dict)))
+    torch.save(state_dict, tmp_path / 'broken.pth')
+    
+    with pytest.raises(RuntimeError):
+        export_safetensors(tmp_path / 'broken.pth', tmp_path / 'broken.safetensors', 'student')
+    assert not (tmp_path / 'broken.safetensors').exists()
+
+def test_legacy_checkpoint_loads_or_fails_loudly(student_checkpoint, tmp_path, monkeypatch):
+    """Test a legacy .pth serves its weights, and a broken one raises instead of serving ImageNet"""
+    import deepfake_detection
+    net, checkpoint = student_checkpoint
+    monkeypatch.setattr(deepfake_detection, 'serving_weights_path',
+                        lambda kind: str(tmp_path / 'weights' / 'student.safetensors'))
+    (tmp_path / 'weights').mkdir()
+    legacy = tmp_path / 'weights' / 'student.pth'
+    os.replace(checkpoint, legacy)
+    
+    x = torch.randn(2, 3, 224, 224)
+    with torch.no_grad():
+        assert torch.allclose(deepfake_detection.load_model('student')(x), net(x), atol=1e-5)
+    
+    # A checkpoint for another architecture no longer falls back silently
+    torch.save({'model_state_dict': build_model('efficientnet').state_dict()}, legacy)
+    with pytest.raises(RuntimeError, match='student.pth'):
+        deepfake_detection.load_model('student')
+    legacy.write_bytes(b'not a checkpoint')
+    with pytest.raises(RuntimeError, match='student.pth'):
+        deepfake_detection.load_model('student')
+
+def test_export_does_not_boot_the_detector(student_checkpoint, tmp_path):
+    """Test exporting weights never imports deepfake_detection (face detector, serving model)"""
+    _, checkpoint = student_checkpoint
+    script = ("import sys; from model_weights import export_safetensors; "
+              f"export_safetensors({str(checkpoint)!r}, {str(tmp_path / 'out.safetensors')!r}, 'student'); "
+              "assert 'deepfake_detection' not in sys.modules")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+def test_register_and_deploy_verified_weights(student_checkpoint, tmp_path, monkeypatch):
+    """Test registration exports hashed weights and deploy refuses modified files"""
+    from registry.model_registry import ModelRegistry
+    from deployment.deploy import deploy_model
+    _, checkpoint = student_checkpoint
+    monkeypatch.chdir(tmp_path)
+    
+    registry = ModelRegistry()
+    (registry.models_dir / 'v1').mkdir()
+    os.replace(checkpoint, registry.models_dir / 'v1' / 'model.pth')
+    metadata = registry.register_model('v1', {'accuracy': 0.9}, architecture='student')
+    assert metadata['weights_file'] == 'model.safetensors'
+    
+    assert deploy_model('v1', 'staging')
+    deployed = tmp_path / 'weights' / 'staging' / 'student_model.safetensors'
+    assert file_sha256(deployed) == metadata['weights_sha256']
+    # Prebuilt engines travel with the weights
+    key = metadata['artifacts']['key']
+    assert 'torchscript' in metadata['artifacts']['engines']
+    assert (tmp_path / 'weights' / 'staging' / 'artifacts' / key / 'manifest.json').exists()
+    
+    with open(registry.models_dir / 'v1' / 'model.safetensors', 'ab') as f:
+        f.write(b'tampered')
+    assert not deploy_model('v1', 'staging')
+    assert file_sha256(deployed) == metadata['weights_sha256']
+
+def test_deploy_promotes_after_files_are_in_place(student_checkpoint, tmp_path, monkeypatch):
+    """Test registry.json names the new version only once its weights and engines are deployed"""
+    from registry.model_registry import ModelRegistry
+    from deployment.deploy import deploy_model
+    _, checkpoint = student_checkpoint
+    monkeypatch.chdir(tmp_path)
+    
+    registry = ModelRegistry()
+    (registry.models_dir / 'v1').mkdir()
+    os.replace(checkpoint, registry.models_dir / 'v1' / 'model.pth')
+    metadata = registry.register_model('v1', {'accuracy': 0.9}, architecture='student', benchmark=False)
+    
+    deployed_at_promotion = []
+    promote = ModelRegistry.promote_to_production
+    def checked_promote(self, version, **kwargs):
+        weights = tmp_path / 'weights' / 'student_model.safetensors'
+        manifest = tmp_path / 'weights' / 'artifacts' / metadata['artifacts']['key'] / 'manifest.json'
+        deployed_at_promotion.append(weights.exists() and manifest.exists())
+        return promote(self, version, **kwargs)
+    monkeypatch.setattr(ModelRegistry, 'promote_to_production', checked_promote)
+    
+    assert deploy_model('v1', 'production')
+    assert deployed_at_promotion == [True]
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,241 @@
+"""
+Unit tests for production prediction logging
+"""
+
+import pytest
+import sys
+import os
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mlops.monitoring.monitor import ProductionMonitor
+from mlops.monitoring.prediction_log import PredictionLogStore
+
+def make_prediction(i):
+    return {'prediction': 'fake' if i % 2 else 'real', 'confidence': 0.9, 'latency_ms': 10.0, 'model_version': 'test'}
+
+def read_log(log_dir):
+    """Every record on disk, across segments"""
+    return PredictionLogStore(log_dir / 'predictions').read_records()
+
+def hourly_records(hours, per_hour, end=None):
+    """per_hour records in each of the last `hours` hours, oldest first"""
+    end = end or datetime(2026, 1, 2, 0, 0)
+    records = []
+    for h in range(hours, 0, -1):
+        for i in range(per_hour):
+            timestamp = end - timedelta(hours=h) + timedelta(seconds=i)
+            record = make_prediction(i)
+            record['timestamp'] = timestamp.isoformat()
+            records.append(record)
+    return records
+
+def test_async_logging_flushes_in_batches(tmp_path):
+    """Test queued predictions reach disk in order on flush, with metrics"""
+    monitor = ProductionMonitor(tmp_path, async_logging=True, flush_interval=60, max_buffer=1000)
+    for i in range(250):
+        monitor.log_prediction(make_prediction(i))
+    
+    # Metrics are live before anything is written
+    assert monitor.get_metrics()['total_predictions'] == 250
+    assert monitor.flush(timeout=5)
+    
+    lines = read_log(tmp_path)
+    assert [line['prediction'] for line in lines] == [make_prediction(i)['prediction'] for i in range(250)]
+    with open(tmp_path / 'metrics.json') as f:
+        assert json.load(f)['fake_count'] == 125
+    # A handful of batched writes, not one per prediction
+    assert monitor.get_logging_stats()['flushes'] < 10
+    monitor.close()
+
+def test_async_logging_writes_on_interval_and_close(tmp_path):
+    """Test the writer flushes on its own timer and on close"""
+    monitor = ProductionMonitor(tmp_path, async_logging=True, flush_interval=0.05, metrics_interval=0.05)
+    monitor.log_prediction(make_prediction(1))
+    
+    import time
+    deadline = time.time() + 5
+    while monitor.get_logging_stats()['written'] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert monitor.get_logging_stats()['written'] == 1
+    
+    monitor.log_prediction({'error': 'boom', 'latency_ms': 1.0})
+    monitor.close()
+    assert len(read_log(tmp_path)) == 2
+    with open(tmp_path / 'metrics.json') as f:
+        assert json.load(f)['errors'] == 1
+
+def test_segments_split_by_size(tmp_path):
+    """Test a full hourly segment continues in a new part and history stays readable"""
+    monitor = ProductionMonitor(tmp_path, async_logging=True, max_buffer=10, max_log_bytes=1000)
+    for i in range(100):
+        monitor.log_prediction(make_prediction(i))
+    monitor.close()
+    
+    assert monitor.get_logging_stats()['segments'] > 1
+    assert len(monitor.get_recent_predictions(hours=1)) == 100
+
+def test_range_query_reads_only_overlapping_segments(tmp_path):
+    """Test the index selects hours in range and filters the boundary segment"""
+    store = PredictionLogStore(tmp_path)
+    store.append(hourly_records(hours=48, per_hour=10))
+    
+    start = datetime(2026, 1, 1, 12, 0, 5)
+    segments = store.segments(start=start)
+    assert [entry['hour'] for entry in segments][:2] == ['2026-01-01T12', '2026-01-01T13']
+    assert len(segments) == 12
+    
+    records = store.read_records(start=start)
+    assert len(records) == 11 * 10 + 5
+    assert all(record['timestamp'] >= start.isoformat() for record in records)
+
+def test_columnar_compaction_round_trip(tmp_path):
+    """Test finished hours compact to .npz and read back like the JSONL form"""
+    records = hourly_records(hours=3, per_hour=4)
+    records[1]['error'] = 'no face'
+    plain = PredictionLogStore(tmp_path / 'plain')
+    plain.append(records)
+    
+    store = PredictionLogStore(tmp_path / 'columnar', columnar=True)
+    store.append(records)
+    
+    # Hours before the newest are sealed and compacted automatically
+    assert store.stats()['columnar_segments'] == 2
+    assert len(list((tmp_path / 'columnar').glob('*.npz'))) == 2
+    start = datetime(2026, 1, 1, 21, 0, 2)
+    assert store.read_records(start=start) == plain.read_records(start=start)
+    
+    columns = store.read_columns(['prediction', 'confidence', 'error'], start=start)
+    assert list(columns['prediction']) == [r['prediction'] for r in plain.read_records(start=start)]
+    assert len(columns['confidence']) == len(columns['error']) == 10
+    assert store.compact(before=datetime(2026, 1, 2)) == 1
+
+def test_compaction_crash_keeps_segments_readable(tmp_path, monkeypatch):
+    """Test a crash at any point of compaction leaves every record readable exactly once"""
+    store = PredictionLogStore(tmp_path)
+    store.append(hourly_records(hours=2, per_hour=4))
+    store.close()
+    records = PredictionLogStore(tmp_path).read_records()
+    
+    # Crash before the index is saved: the JSONL must still be there
+    store = PredictionLogStore(tmp_path)
+    def crash():
+        raise RuntimeError('killed')
+    monkeypatch.setattr(store, '_save_index', crash)
+    with pytest.raises(RuntimeError):
+        store.compact(before=datetime(2026, 1, 2))
+    assert PredictionLogStore(tmp_path).read_records() == records
+    
+    # Crash after the index is saved but before the JSONL is deleted
+    from pathlib import Path
+    store = PredictionLogStore(tmp_path)
+    monkeypatch.setattr(Path, 'unlink', lambda path, missing_ok=False: crash())
+    with pytest.raises(RuntimeError):
+        store.compact(before=datetime(2026, 1, 2))
+    monkeypatch.undo()
+    assert len(list(tmp_path.glob('*.jsonl'))) == 2
+    reopened = PredictionLogStore(tmp_path)
+    assert reopened.read_records() == records
+    assert not list(tmp_path.glob('*.jsonl'))
+
+def test_index_recovers_unsaved_appends(tmp_path):
+    """Test records written after the last index save survive a crash"""
+    store = PredictionLogStore(tmp_path, index_interval=3600)
+    records = hourly_records(hours=1, per_hour=5)
+    store.append(records[:2])
+    store.append(records[2:])
+    # Simulate a crash: index.json only knows the first batch, plus a torn line
+    with open(tmp_path / f"{records[0]['timestamp'][:13]}.jsonl", 'a') as f:
+        f.write('{"prediction": "fa')
+    
+    reopened = PredictionLogStore(tmp_path)
+    assert len(reopened.read_records()) == 5
+    reopened.append(hourly_records(hours=1, per_hour=1))
+    assert len(PredictionLogStore(tmp_path).read_records()) == 6
+
+def test_flat_log_is_imported(tmp_path):
+    """Test a predictions.jsonl from the old layout is moved into segments"""
+    with open(tmp_path / 'predictions.jsonl', 'w') as f:
+        for record in hourly_records(hours=2, per_hour=3, end=datetime.now()):
+            f.write(json.dumps(record) + '\n')
+    
+    monitor = ProductionMonitor(tmp_path)
+    assert not (tmp_path / 'predictions.jsonl').exists()
+    assert len(monitor.get_recent_predictions(hours=3)) == 6
+
+def test_segments_are_keyed_by_utc(tmp_path, monkeypatch):
+    """Test logged and imported timestamps are UTC, so DST cannot repeat an hour"""
+    monkeypatch.setenv('TZ', 'Asia/Kolkata')
+    time.tzset()
+    try:
+        record = make_prediction(0)
+        record['timestamp'] = '2026-01-01T12:00:00'
+        with open(tmp_path / 'predictions.jsonl', 'w') as f:
+            f.write(json.dumps(record) + '\n')
+        
+        monitor = ProductionMonitor(tmp_path)
+        monitor.log_prediction(make_prediction(1))
+        first, logged = read_log(tmp_path)
+        assert first['timestamp'].startswith('2026-01-01T06:30:00')
+        utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+        assert abs(datetime.fromisoformat(logged['timestamp']) - utc_now) < timedelta(minutes=1)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    """Test a full queue drops records and counts them"""
+    monitor = ProductionMonitor(tmp_path, async_logging=True, queue_size=1)
+    # Stop the writer so the queue cannot drain, then accept records again
+    monitor.close()
+    monitor._closed = False
+    monitor._queue.put_nowait('occupied')
+    monitor.log_prediction(make_prediction(0))
+    assert monitor.get_logging_stats()['dropped'] == 1
+
+def test_closed_monitor_drops_records(tmp_path):
+    """Test records logged after close are counted as dropped, not left on the queue"""
+    monitor = ProductionMonitor(tmp_path, async_logging=True)
+    monitor.log_prediction(make_prediction(0))
+    monitor.close()
+    monitor.log_prediction(make_prediction(1))
+    
+    stats = monitor.get_logging_stats()
+    assert stats['queued'] == 1 and stats['written'] == 1 and stats['dropped'] == 1
+    assert stats['pending'] == 0
+    assert len(read_log(tmp_path)) == 1
+
+def test_concurrent_logging_counts_every_record(tmp_path):
+    """Test queued + dropped adds up when many threads log at once"""
+    import threading
+    
+    monitor = ProductionMonitor(tmp_path, async_logging=True, queue_size=500, flush_interval=0.01)
+    def log_many():
+        for i in range(1000):
+            monitor.log_prediction(make_prediction(i))
+    threads = [threading.Thread(target=log_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    monitor.close()
+    
+    stats = monitor.get_logging_stats()
+    assert stats['queued'] + stats['dropped'] == 8000
+    assert stats['written'] == stats['queued']
+
+def test_sync_logging_unchanged(tmp_path):
+    """Test the default mode still writes each prediction immediately"""
+    monitor = ProductionMonitor(tmp_path)
+    monitor.log_prediction(make_prediction(1))
+    
+    assert len(read_log(tmp_path)) == 1
+    with open(tmp_path / 'metrics.json') as f:
+        assert json.load(f)['total_predictions'] == 1
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
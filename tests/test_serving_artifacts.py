@@ -0,0 +1,105 @@
+"""
+Unit tests for prebuilt serving engines
+"""
+
+import pytest
+import sys
+import os
+import torch
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import serving_artifacts
+from deepfake_detection import DeepfakeDetector, DeepfakeStudent, load_engine
+from model_weights import file_sha256
+from safetensors.torch import save_file
+from serving_artifacts import artifact_dir, build_artifacts, load_artifact
+
+@pytest.fixture
+def student_weights(tmp_path):
+    """Student serving weights file and its sha256"""
+    torch.manual_seed(0)
+    net = DeepfakeStudent(pretrained=False).eval()
+    path = tmp_path / 'student.safetensors'
+    save_file({key: value.contiguous() for key, value in net.state_dict().items()}, str(path))
+    return net, path, file_sha256(path)
+
+def test_build_and_load_engines(student_weights, tmp_path):
+    """Test engines are parity-checked, cached by key and served with an eager twin"""
+    net, path, sha256 = student_weights
+    manifest = build_artifacts(net, sha256, tmp_path / 'artifacts')
+    
+    assert manifest['key'] == f"{sha256[:16]}-torch{torch.__version__}"
+    assert {'torchscript', 'int8'} <= set(manifest['engines'])
+    assert set(manifest['engines']) | set(manifest['skipped']) == set(serving_artifacts.ENGINES)
+    assert manifest['engines']['torchscript']['parity_max_abs'] <= 1e-4
+    # Second build reuses the cache
+    assert build_artifacts(net, sha256, tmp_path / 'artifacts')['built_at'] == manifest['built_at']
+    
+    engine = load_engine('student', path, 'torchscript', tmp_path / 'artifacts')
+    assert engine.engine == 'torchscript'
+    x = torch.randn(2, 3, 224, 224)
+    with torch.no_grad():
+        assert torch.allclose(engine(x), net(x), atol=1e-5)
+        assert torch.equal(engine.eager(x), net(x))
+    
+    # GradCAM hooks the eager model, not the frozen graph
+    detector = DeepfakeDetector(use_tta=False)
+    detector.swap_model(engine, 'v1')
+    assert detector.get_explainer().model is engine.eager
+
+def test_engine_failing_parity_is_not_kept(student_weights, tmp_path, monkeypatch):
+    """Test an engine outside the parity tolerance is skipped and not written"""
+    net, _, sha256 = student_weights
+    monkeypatch.setitem(serving_artifacts.PARITY_TOLERANCE, 'int8', -1.0)
+    
+    manifest = build_artifacts(net, sha256, tmp_path / 'artifacts', engines=('torchscript', 'int8'))
+    
+    assert 'int8' not in manifest['engines']
+    assert manifest['skipped']['int8'].startswith('parity error')
+    assert not (artifact_dir(tmp_path / 'artifacts', sha256) / 'model.int8.pt').exists()
+
+def test_stale_or_tampered_artifacts_fall_back_to_eager(student_weights, tmp_path, monkeypatch):
+    """Test another torch version or a modified artifact serves the eager model"""
+    net, path, sha256 = student_weights
+    build_artifacts(net, sha256, tmp_path / 'artifacts', engines=('torchscript',))
+    
+    with monkeypatch.context() as m:
+        m.setattr(torch, '__version__', '0.0.0')
+        with pytest.raises(LookupError):
+            load_artifact(tmp_path / 'artifacts', sha256, 'torchscript')
+    
+    with open(artifact_dir(tmp_path / 'artifacts', sha256) / 'model.torchscript.pt', 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(ValueError):
+        load_artifact(tmp_path / 'artifacts', sha256, 'torchscript')
+    assert isinstance(load_engine('student', path, 'auto', tmp_path / 'artifacts'), DeepfakeStudent)
+
+def file_backed(tensor, path):
+    """True if a tensor's memory lies in a mapping of the file (Linux)"""
+    with open('/proc/self/maps') as f:
+        for line in f:
+            if line.rstrip().endswith(str(path)):
+                start, end = (int(address, 16) for address in line.split()[0].split('-'))
+                if start <= tensor.data_ptr() < end:
+                    return True
+    return False
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason='needs /proc/self/maps')
+def test_eager_model_maps_prebuilt_folded_weights(student_weights, tmp_path):
+    """Test the eager model loads BatchNorm-folded weights as shared file pages"""
+    net, path, sha256 = student_weights
+    manifest = build_artifacts(net, sha256, tmp_path / 'artifacts', engines=())
+    folded_path = artifact_dir(tmp_path / 'artifacts', sha256) / manifest['folded']['file']
+
+    eager = load_engine('student', path, 'eager', tmp_path / 'artifacts')
+
+    assert not any(isinstance(m, torch.nn.BatchNorm2d) for m in eager.mobilenet.features[0].modules())
+    assert all(file_backed(p, folded_path) for p in eager.parameters())
+    x = torch.randn(2, 3, 224, 224)
+    with torch.no_grad():
+        assert torch.allclose(eager(x), net(x), atol=1e-5)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
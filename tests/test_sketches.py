@@ -0,0 +1,237 @@
+"""
+Unit tests for streaming monitoring statistics
+"""
+
+import pytest
+import sys
+import os
+import json
+import time
+import subprocess
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mlops.monitoring.monitor import ProductionMonitor, build_reference_histograms
+from mlops.monitoring.sketches import (DDSketch, FixedHistogram, SlidingHistogram, SlidingWindow,
+                                       kl_divergence, population_stability_index)
+
+def test_ddsketch_quantiles_within_relative_accuracy():
+    """Test quantiles stay within the configured relative error"""
+    values = np.random.default_rng(0).lognormal(mean=3.0, sigma=1.0, size=20000)
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(float(value))
+    
+    for q in (0.5, 0.95, 0.99):
+        # Same rank convention as the sketch: value at index q * (n - 1)
+        expected = np.sort(values)[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - expected) / expected <= 0.0101
+    assert len(sketch.bins) < 1000
+
+def test_ddsketch_merge_and_round_trip():
+    """Test merged sketches equal one sketch of all values, and survive JSON"""
+    values = np.random.default_rng(1).exponential(50.0, size=2000)
+    whole, left, right = DDSketch(), DDSketch(), DDSketch()
+    for i, value in enumerate(values):
+        whole.add(float(value))
+        (left if i % 2 else right).add(float(value))
+    
+    merged = left.merge(right)
+    restored = DDSketch.from_dict(json.loads(json.dumps(merged.to_dict())))
+    for q in (0.5, 0.95, 0.99):
+        assert merged.quantile(q) == whole.quantile(q) == restored.quantile(q)
+    assert restored.count == 2000
+    with pytest.raises(ValueError):
+        whole.merge(DDSketch(relative_accuracy=0.05))
+
+def test_sliding_window_expires_old_slots():
+    """Test predictions age out of the window"""
+    window = SlidingWindow(seconds=60, slots=6)
+    for t in range(0, 60):
+        window.add(1000.0 + t, latency_ms=10.0, error=(t % 10 == 0))
+    
+    stats = window.snapshot(1059.0)
+    assert stats['count'] == 60
+    assert stats['errors'] == 6
+    assert stats['latency_p99_ms'] == pytest.approx(10.0, rel=0.01)
+    
+    # 30s later only the newest half remains; 2 minutes later nothing
+    assert window.snapshot(1089.0)['count'] == 30
+    assert window.snapshot(1180.0)['count'] == 0
+    assert window.snapshot(1180.0)['latency_p95_ms'] is None
+
+def test_alerts_see_fresh_regression_despite_history(tmp_path):
+    """Test a recent latency/error spike alerts even with a healthy lifetime average"""
+    with open(tmp_path / 'metrics.json', 'w') as f:
+        json.dump({'total_predictions': 1000000, 'fake_count': 500000, 'real_count': 500000,
+                   'avg_confidence': 0.9, 'avg_latency_ms': 20.0, 'errors': 0, 'last_updated': None}, f)
+    monitor = ProductionMonitor(tmp_path)
+    for i in range(50):
+        monitor.log_prediction({'prediction': 'real', 'confidence': 0.9, 'latency_ms': 900.0})
+    monitor.log_prediction({'error': 'decode failed', 'latency_ms': 5.0})
+    
+    # The lifetime average barely moves, the windows do not
+    assert monitor.get_metrics()['avg_latency_ms'] < 25.0
+    alerts = {alert['type']: alert for alert in monitor.check_alerts()}
+    assert alerts['high_latency_p95']['window'] == '1m'
+    assert alerts['high_error_rate']['window'] == '1m'
+    assert 'high_latency_p99' not in alerts
+    
+    with open(tmp_path / 'metrics.json') as f:
+        saved = json.load(f)
+    assert saved['latency_p95_ms'] == pytest.approx(900.0, rel=0.01)
+    assert ProductionMonitor(tmp_path).latency_sketch.count == 51
+
+def run_report(log_dir, registry_dir):
+    """Run the monitor.py report CLI in its own process, as an operator would"""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run(
+        [sys.executable, os.path.join('mlops', 'monitoring', 'monitor.py'),
+         '--log-dir', str(log_dir), '--registry-dir', str(registry_dir)],
+        capture_output=True, text=True, cwd=root, timeout=120)
+    assert result.returncode == 0, result.stderr
+    with open(os.path.join(log_dir, 'alerts.json')) as f:
+        return result.stdout, {alert['type']: alert for alert in json.load(f)}
+
+def test_sliding_window_round_trip():
+    """Test a restored window reports the same stats and keeps ageing"""
+    window = SlidingWindow(seconds=60, slots=6)
+    for t in range(60):
+        window.add(1000.0 + t, latency_ms=float(t), error=(t % 10 == 0), fake=(t % 2 == 0))
+    
+    restored = SlidingWindow.from_dict(json.loads(json.dumps(window.to_dict())))
+    for now in (1059.0, 1089.0, 1180.0):
+        assert restored.snapshot(now) == window.snapshot(now)
+
+def test_report_cli_alerts_on_server_windows(tmp_path):
+    """Test the report CLI alerts on the windows a server process logged"""
+    server = ProductionMonitor(tmp_path / 'logs', async_logging=True)
+    for i in range(50):
+        server.log_prediction({'prediction': 'real', 'confidence': 0.9, 'latency_ms': 900.0})
+    server.log_prediction({'error': 'decode failed', 'latency_ms': 5.0})
+    server.close()
+    
+    output, alerts = run_report(tmp_path / 'logs', tmp_path / 'registry')
+    
+    assert alerts['high_latency_p95']['window'] == '1m'
+    assert alerts['high_error_rate']['window'] == '1m'
+    assert 'Active Alerts: 2' in output
+    assert '1m: 51 predictions' in output
+
+def test_writer_thread_checks_alerts(tmp_path, capsys):
+    """Test the serving process raises alerts itself, once per condition"""
+    monitor = ProductionMonitor(tmp_path, async_logging=True, flush_interval=0.02, alert_interval=0.05)
+    for i in range(30):
+        monitor.log_prediction({'prediction': 'real', 'confidence': 0.9, 'latency_ms': 900.0})
+    
+    deadline = time.time() + 5
+    while not monitor.alerts and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.2)
+    monitor.close()
+    
+    assert [alert['type'] for alert in monitor.alerts] == ['high_latency_p95']
+    assert capsys.readouterr().out.count('p95 latency over last 1m') == 1
+    with open(tmp_path / 'alerts.json') as f:
+        assert json.load(f)[0]['type'] == 'high_latency_p95'
+
+def test_psi_and_kl_separate_shifted_distributions():
+    """Test PSI/KL are ~0 for the same distribution and large for a shifted one"""
+    rng = np.random.default_rng(2)
+    edges = [i / 20 for i in range(21)]
+    reference, same, shifted = FixedHistogram(edges), FixedHistogram(edges), FixedHistogram(edges)
+    for value in rng.beta(2, 5, 5000):
+        reference.add(value)
+    for value in rng.beta(2, 5, 5000):
+        same.add(value)
+    for value in rng.beta(5, 2, 5000):
+        shifted.add(value)
+    
+    assert population_stability_index(reference, same) < 0.02
+    assert population_stability_index(reference, shifted) > 1.0
+    assert kl_divergence(reference, same) < 0.01 < kl_divergence(reference, shifted)
+    # Out-of-range values are clamped into the end bins
+    reference.add(-1.0)
+    reference.add(7.0)
+    assert reference.total == 5002
+    with pytest.raises(ValueError):
+        population_stability_index(reference, FixedHistogram([0, 1]))
+
+def test_sliding_histogram_window():
+    """Test the sliding histogram only counts live slots"""
+    histogram = SlidingHistogram([0, 0.5, 1.0], seconds=60, slots=6)
+    for t in range(60):
+        histogram.add(t, 0.25 if t < 30 else 0.75)
+    assert histogram.snapshot(59).counts == [30, 30]
+    assert histogram.snapshot(89).counts == [0, 30]
+
+def test_monitor_detects_score_drift_against_registry_reference(tmp_path):
+    """Test drift from the stored reference raises a PSI alert, a matching stream does not"""
+    from mlops.registry.model_registry import ModelRegistry
+    rng = np.random.default_rng(3)
+    
+    def prediction(p):
+        return {'prediction': 'fake' if p > 0.5 else 'real', 'confidence': max(p, 1 - p), 'latency_ms': 20.0,
+                'fake_probability': float(p), 'face_size': 150.0, 'frame_width': 1280, 'frame_height': 720}
+    
+    registry = ModelRegistry(tmp_path / 'registry')
+    (registry.models_dir / 'v1').mkdir()
+    registry.register_model('v1', {'accuracy': 0.9})
+    registry.promote_to_production('v1')
+    registry.set_reference_histograms('v1', build_reference_histograms(
+        prediction(p) for p in rng.beta(2, 5, 5000)))
+    
+    stable = ProductionMonitor(tmp_path / 'stable')
+    assert stable.load_reference_from_registry(tmp_path / 'registry')
+    for p in rng.beta(2, 5, 500):
+        stable.log_prediction(prediction(p))
+    assert not [a for a in stable.check_alerts() if a['type'] == 'distribution_drift']
+    
+    # A new platform's compression pushes scores up
+    shifted = ProductionMonitor(tmp_path / 'shifted')
+    shifted.load_reference_from_registry(tmp_path / 'registry')
+    for p in rng.beta(4, 3, 500):
+        shifted.log_prediction(prediction(p))
+    drift = shifted.get_drift()
+    assert drift['1h']['fake_probability']['psi'] > 0.2
+    assert drift['1h']['face_size']['psi'] < 0.01
+    alerts = [a for a in shifted.check_alerts() if a['type'] == 'distribution_drift']
+    assert [(a['feature'], a['window']) for a in alerts] == [('fake_probability', '1h')]
+
+def test_drift_is_checked_in_the_server_and_reported_by_the_cli(tmp_path):
+    """Test a reference stored after startup drives server-side and CLI drift alerts"""
+    from mlops.registry.model_registry import ModelRegistry
+    rng = np.random.default_rng(4)
+    
+    def prediction(p):
+        return {'prediction': 'fake' if p > 0.5 else 'real', 'confidence': max(p, 1 - p), 'latency_ms': 20.0,
+                'fake_probability': float(p), 'face_size': 150.0, 'frame_width': 1280, 'frame_height': 720}
+    
+    registry = ModelRegistry(tmp_path / 'registry')
+    (registry.models_dir / 'v1').mkdir()
+    registry.register_model('v1', {'accuracy': 0.9})
+    registry.promote_to_production('v1')
+    
+    server = ProductionMonitor(tmp_path / 'logs', async_logging=True, flush_interval=0.02, alert_interval=0.05)
+    assert not server.load_reference_from_registry(tmp_path / 'registry')
+    for p in rng.beta(4, 3, 300):
+        server.log_prediction(prediction(p))
+    
+    # The reference is stored while the server runs
+    time.sleep(0.05)
+    registry.set_reference_histograms('v1', build_reference_histograms(
+        prediction(p) for p in rng.beta(2, 5, 5000)))
+    deadline = time.time() + 5
+    while not server.alerts and time.time() < deadline:
+        time.sleep(0.01)
+    server.close()
+    assert [(a['type'], a['feature']) for a in server.alerts] == [('distribution_drift', 'fake_probability')]
+    
+    _, alerts = run_report(tmp_path / 'logs', tmp_path / 'registry')
+    assert alerts['distribution_drift']['window'] == '1h'
+    assert alerts['distribution_drift']['feature'] == 'fake_probability'
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,163 @@
+"""
+Unit tests for checkpointing, resume and early stopping in training
+"""
+
+import pytest
+import sys
+import os
+import json
+import yaml
+import numpy as np
+import torch
+
+# Add parent directory and mlops packages to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops', 'training')))
+
+from preprocessing.face_shards import FaceShardWriter
+from train_model import CheckpointWriter, EarlyStopping, create_data_loaders, data_parallel_ranks, train_model
+
+@pytest.fixture
+def tiny_run(tmp_path):
+    """Small shard dataset and a fast config"""
+    writer = FaceShardWriter(tmp_path / 'shards', image_size=32)
+    rng = np.random.default_rng(0)
+    for i in range(24):
+        writer.add(rng.integers(0, 256, (32, 32, 3), dtype=np.uint8), i % 2, f'img_{i}.jpg')
+    writer.close()
+    
+    config = {
+        'training': {'batch_size': 8, 'epochs': 2, 'learning_rate': 0.0, 'early_stopping': True, 'patience': 5},
+        'data': {'mode': 'shards', 'image_size': 32, 'num_workers': 0}
+    }
+    
+    def run(resume=False, nproc=1, **training):
+        config['training'].update(training)
+        config_path = tmp_path / 'config.yaml'
+        with open(config_path, 'w') as f:
+            yaml.safe_dump(config, f)
+        torch.manual_seed(0)
+        return train_model(config_path, tmp_path / 'shards', tmp_path / 'models', 'v0', resume=resume, nproc=nproc)
+    
+    return run, tmp_path / 'models' / 'v0'
+
+def test_early_stopping_patience():
+    """Test stopping after `patience` epochs without improvement"""
+    stopper = EarlyStopping(patience=2, mode='max')
+    
+    assert stopper.step(0.5)
+    assert stopper.step(0.6)
+    assert not stopper.step(0.6)
+    assert not stopper.should_stop
+    assert not stopper.step(0.55)
+    assert stopper.should_stop
+    
+    loss_stopper = EarlyStopping(patience=1, mode='min')
+    assert loss_stopper.step(1.0)
+    assert loss_stopper.step(0.9)
+    assert not loss_stopper.step(0.95)
+    assert loss_stopper.should_stop
+
+def test_checkpoint_writer_snapshots_state(tmp_path):
+    """Test the saved checkpoint is the state at save() time, not after later updates"""
+    weights = torch.zeros(3)
+    writer = CheckpointWriter()
+    writer.save({'weights': weights, 'epoch': 0}, tmp_path / 'ckpt.pth')
+    weights += 1  # training keeps going while the write is in flight
+    writer.close()
+    
+    saved = torch.load(tmp_path / 'ckpt.pth')
+    assert torch.equal(saved['weights'], torch.zeros(3))
+    assert not (tmp_path / 'ckpt.pth.tmp').exists()
+
+def test_training_stops_early_and_resumes(tiny_run):
+    """Test a plateaued run stops early and a resumed run continues from the checkpoint"""
+    run, output_path = tiny_run
+    
+    # learning_rate 0 -> validation metrics never improve after epoch 1
+    _, metadata = run(epochs=10, patience=2)
+    assert metadata['stop_reason'] == 'early_stopping'
+    assert metadata['epochs_trained'] == 3
+    assert (output_path / 'model.pth').exists()
+    
+    checkpoint = torch.load(output_path / 'checkpoint.pth')
+    assert checkpoint['epoch'] == 2
+    assert 'optimizer_state_dict' in checkpoint
+    
+    _, metadata = run(resume=True, epochs=10, patience=4)
+    with open(output_path / 'training_history.json') as f:
+        history = json.load(f)
+    assert metadata['epochs_trained'] == 5
+    assert len(history['val_acc']) == 5
+
+def test_data_parallel_training(tiny_run):
+    """Test gloo data-parallel training across two local processes"""
+    run, output_path = tiny_run
+    
+    model, metadata = run(nproc=2, epochs=1, learning_rate=0.001)
+    
+    assert metadata['world_size'] == 2
+    assert metadata['epochs_trained'] == 1
+    assert (output_path / 'checkpoint.pth').exists()
+    # The returned model carries the saved best weights
+    saved = torch.load(output_path / 'model.pth')['model_state_dict']
+    assert all(torch.equal(saved[k], v) for k, v in model.state_dict().items())
+
+def test_data_parallel_ranks_split_the_batch_evenly():
+    """Test ranks are capped so every rank trains on an equal batch of at least 2"""
+    assert data_parallel_ranks(64, 32) == 16
+    assert data_parallel_ranks(12, 32) == 8
+    assert data_parallel_ranks(2, 8) == 2
+    assert data_parallel_ranks(4, 6) == 3
+    assert data_parallel_ranks(8, 3) == 1
+    assert data_parallel_ranks(1, 32) == 1
+
+def test_rank_loaders_keep_the_global_batch(tiny_run, tmp_path):
+    """Test per-rank loaders split the global batch and reject splits below 2 per rank"""
+    config = {'training': {'batch_size': 8}, 'data': {'mode': 'shards', 'image_size': 32, 'num_workers': 0}}
+    device = torch.device('cpu')
+    
+    _, train_loader, _, _ = create_data_loaders(config, tmp_path / 'shards', device, rank=0, world_size=4)
+    assert train_loader.batch_size == 2
+    assert all(labels.size(0) == 2 for _, labels in train_loader)
+    for world_size in (3, 8):
+        with pytest.raises(ValueError, match='per-rank'):
+            create_data_loaders(config, tmp_path / 'shards', device, rank=0, world_size=world_size)
+
+def test_rank_validation_covers_each_sample_once(tiny_run, tmp_path):
+    """Test validation shards are disjoint, unpadded and cover the whole validation split"""
+    config = {'training': {'batch_size': 6},
+              'data': {'mode': 'shards', 'image_size': 32, 'num_workers': 0, 'val_split': 0.3}}
+    device = torch.device('cpu')
+    _, _, full, _ = create_data_loaders(config, tmp_path / 'shards', device)
+    expected = sorted(full.dataset.indices)
+    
+    seen = []
+    for rank in range(3):
+        _, _, val_loader, _ = create_data_loaders(config, tmp_path / 'shards', device, rank, world_size=3)
+        seen += [full.dataset.indices[i] for i in val_loader.dataset.indices]
+    # A DistributedSampler would pad this split with repeated samples
+    assert len(expected) % 3 != 0
+    assert sorted(seen) == expected
+
+def test_trained_model_registers_for_serving(tiny_run):
+    """Test a train_model checkpoint exports to the serving architecture at registration"""
+    from registry.model_registry import ModelRegistry
+    from model_weights import load_weights
+    from deepfake_models import build_model
+    run, output_path = tiny_run
+    
+    model, _ = run(epochs=1)
+    registry = ModelRegistry(output_path.parent.parent)
+    metadata = registry.register_model('v0', {'accuracy': 0.5}, build_artifacts=False, benchmark=False)
+    
+    with torch.device('meta'):
+        served = build_model('efficientnet')
+    load_weights(served, output_path / metadata['weights_file'], expected_sha256=metadata['weights_sha256'])
+    x = torch.randn(2, 3, 32, 32)
+    with torch.no_grad():
+        assert torch.allclose(served.eval()(x), model.eval()(x), atol=1e-5)
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
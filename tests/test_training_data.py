@@ -0,0 +1,98 @@
+"""
+Unit tests for the training dataset
+"""
+
+import pytest
+import sys
+import os
+import numpy as np
+import cv2
+
+# Add parent directory and training package to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'mlops', 'training')))
+
+import torch
+
+from train_model import BatchTransform, DeepfakeDataset, build_loader, collate_uint8
+
+def write_video(path, num_frames=12, value_step=10):
+    """Write a short mp4 whose frame i is filled with value i * value_step"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+    for i in range(num_frames):
+        writer.write(np.full((48, 64, 3), i * value_step, dtype=np.uint8))
+    writer.release()
+
+@pytest.fixture
+def video_dir(tmp_path):
+    """data_dir/real/*.mp4 and data_dir/fake/*.mp4"""
+    for class_dir in ('real', 'fake'):
+        (tmp_path / class_dir).mkdir()
+        write_video(tmp_path / class_dir / f'{class_dir}.mp4')
+    return tmp_path
+
+def test_video_mode_indexes_without_decoding(video_dir):
+    """Test video mode stores (path, frame index, label) instead of frames"""
+    dataset = DeepfakeDataset(video_dir, mode='videos', frames_per_video=4)
+    
+    assert len(dataset) == 8
+    for path, frame_idx, label in dataset.samples:
+        assert isinstance(path, str)
+        assert isinstance(frame_idx, int)
+        assert label in (0, 1)
+
+def test_video_mode_frame_cache(video_dir, tmp_path):
+    """Test decoded frames are cached on disk and reused"""
+    cache_dir = tmp_path / 'cache'
+    dataset = DeepfakeDataset(video_dir, mode='videos', frames_per_video=4,
+                              frame_cache_dir=cache_dir, cache_frame_size=32)
+    
+    image, label = dataset[1]
+    assert image.size == (32, 32)
+    
+    reopened = DeepfakeDataset(video_dir, mode='videos', frames_per_video=4,
+                               frame_cache_dir=cache_dir, cache_frame_size=32)
+    reopened._open_frame_cache()
+    assert reopened._cache_filled[1] == 1
+    assert reopened._cache_filled[0] == 0
+    assert np.array_equal(np.asarray(reopened[1][0]), np.asarray(image))
+
+def test_uint8_output_and_collation(video_dir):
+    """Test uint8 mode returns resized CHW tensors that collate without float conversion"""
+    dataset = DeepfakeDataset(video_dir, mode='videos', frames_per_video=2,
+                              uint8_output=True, image_size=32)
+    image, label = dataset[0]
+    assert image.dtype == torch.uint8
+    assert image.shape == (3, 32, 32)
+    
+    images, labels = collate_uint8([dataset[i] for i in range(len(dataset))])
+    assert images.dtype == torch.uint8
+    assert images.shape == (4, 3, 32, 32)
+    assert labels.tolist() == [0, 0, 1, 1]
+
+def test_batch_transform_normalizes_like_torchvision():
+    """Test per-batch normalization matches ToTensor + Normalize"""
+    from torchvision import transforms
+    images = torch.randint(0, 256, (2, 3, 8, 8), dtype=torch.uint8)
+    expected = transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])(images.float() / 255.0)
+    
+    output = BatchTransform(torch.device('cpu'), augment=True)(images, train=False)
+    assert torch.allclose(output, expected, atol=1e-6)
+    
+    augmented = BatchTransform(torch.device('cpu'), augment=True)(images, train=True)
+    assert augmented.shape == images.shape
+    assert torch.isfinite(augmented).all()
+
+def test_build_loader_uses_workers(video_dir):
+    """Test the tuned loader yields uint8 batches from worker processes"""
+    dataset = DeepfakeDataset(video_dir, mode='videos', frames_per_video=2,
+                              uint8_output=True, image_size=32)
+    loader = build_loader(dataset, 2, False, {'num_workers': 1, 'prefetch_factor': 2},
+                          torch.device('cpu'))
+    assert loader.persistent_workers
+    assert not loader.pin_memory
+    batches = list(loader)
+    assert [images.dtype for images, _ in batches] == [torch.uint8, torch.uint8]
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
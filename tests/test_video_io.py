@@ -0,0 +1,81 @@
+"""
+Unit tests for video frame sampling
+"""
+
+import pytest
+import sys
+import os
+import numpy as np
+import cv2
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from video_io import read_frames, sample_frame_indices, sample_video_frames
+
+@pytest.fixture
+def video_path(tmp_path):
+    """Write a short video whose frame i is filled with value i * 8"""
+    path = tmp_path / 'clip.avi'
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for i in range(20):
+        writer.write(np.full((48, 64, 3), i * 8, dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_sample_frame_indices():
+    """Test indices are evenly spaced, unique and in range"""
+    assert sample_frame_indices(100, 5) == [0, 24, 49, 74, 99]
+    assert sample_frame_indices(3, 10) == [0, 1, 2]
+    assert sample_frame_indices(0, 10) == []
+
+def test_read_frames_matches_seek(video_path):
+    """Test sequential decode returns the same frames as seeking"""
+    indices = [0, 3, 11, 19]
+    frames = dict(read_frames(video_path, indices))
+    
+    assert sorted(frames) == indices
+    cap = cv2.VideoCapture(str(video_path))
+    for idx in indices:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        ok, expected = cap.read()
+        assert ok
+        assert np.array_equal(frames[idx], expected)
+    cap.release()
+
+def test_read_frames_past_end(video_path):
+    """Test indices beyond the last frame are skipped"""
+    frames = dict(read_frames(video_path, [18, 19, 25]))
+    
+    assert sorted(frames) == [18, 19]
+
+def test_sample_video_frames_downscales(video_path):
+    """Test sampled frames honour max_side"""
+    frames = sample_video_frames(video_path, 4, max_side=32)
+    
+    assert len(frames) == 4
+    assert frames[0][1].shape == (24, 32, 3)
+
+def test_extracted_frames_are_numbered_by_successful_reads(tmp_path, monkeypatch):
+    """Test a video that reads fewer frames than sampled leaves no gap in frame numbers"""
+    import extract_test_images_from_videos as extract
+    
+    for name in ('a', 'b'):
+        (tmp_path / 'raw' / 'real_videos').mkdir(parents=True, exist_ok=True)
+        (tmp_path / 'raw' / 'real_videos' / f'{name}.mp4').touch()
+    reads = {'a': 2, 'b': 4}
+    def fake_read_frames(video, frame_indices):
+        for i in frame_indices[:reads[os.path.basename(video)[0]]]:
+            yield i, np.full((8, 8, 3), i, dtype=np.uint8)
+    monkeypatch.setattr(extract, 'video_frame_count', lambda video: 4)
+    monkeypatch.setattr(extract, 'read_frames', fake_read_frames)
+    
+    extract.extract_frames_to_images(tmp_path / 'raw', tmp_path / 'out', frames_per_video=4, num_workers=2)
+    
+    assert sorted(path.name for path in (tmp_path / 'out' / 'Real').iterdir()) == [
+        'real_a_frame_0000.jpg', 'real_a_frame_0001.jpg',
+        'real_b_frame_0002.jpg', 'real_b_frame_0003.jpg', 'real_b_frame_0004.jpg', 'real_b_frame_0005.jpg'
+    ]
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -2,8 +2,11 @@ import cv2
 import numpy as np
 import mss
 import mss.tools
-from face_detection import detect_bounding_box
-from deepfake_detection import predict
+import threading
+import time
+from collections import deque
+from deepfake_detection import detector, summarize_frame_scores
+from frame_buffer import FrameRingBuffer
 
 def select_region_manual(monitor):
     """Manual region selection when GUI is not available"""
@@ -92,107 +95,218 @@ def select_screen_region():
             print("\nFalling back to manual region input...")
             return select_region_manual(monitor)
 
-def analyze_frames_and_classify(sct, region, num_frames=30):
+def score_frames(frames):
+    """
+    Score the first face of each frame with the shared batched detector API
+    
+    Returns:
+        List with one fake probability per frame (None if no face was scored)
+    """
+    scores = []
+    for result in detector.score_frames(frames, max_faces_per_frame=1):
+        scores.append(result['faces'][0]['fake_probability'] if result['faces'] else None)
+    return scores
+
+class CapturePipeline:
+    """
+    Producer/consumer screen analysis pipeline
+    
+    A capture thread grabs the screen region into a ring buffer of
+    preallocated frames (dropping the oldest pending frame when inference
+    falls behind) while worker threads score batches of frames from the buffer.
+    """
+    
+    def __init__(self, region, num_workers=1, buffer_size=8, batch_size=4, capture_fps=30):
+        """
+        Args:
+            region: mss region dict to capture
+            num_workers: Number of inference worker threads
+            buffer_size: Number of frames waiting for inference before the oldest is dropped
+            batch_size: Maximum number of frames scored per model pass
+            capture_fps: Capture rate limit (None = as fast as possible)
+        """
+        self.region = region
+        self.num_workers = num_workers
+        self.batch_size = batch_size
+        self.capture_interval = 1.0 / capture_fps if capture_fps else 0.0
+        # One batch of extra slots per worker so frames being scored are never overwritten
+        self.buffer = FrameRingBuffer(buffer_size + num_workers * batch_size, region['height'], region['width'])
+        self.captured = 0
+        self.analyzed = 0
+        self.started_at = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._on_result = None
+    
+    def start(self, on_result):
+        """
+        Start capture and inference threads
+        
+        Args:
+            on_result: Called as on_result(frame_index, fake_probability) from
+                worker threads; fake_probability is None when no face was found
+        """
+        self._on_result = on_result
+        self.started_at = time.time()
+        self._threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        for i in range(self.num_workers):
+            self._threads.append(threading.Thread(target=self._inference_loop, name=f"inference-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self):
+        """Stop all threads"""
+        self._stop.set()
+        self.buffer.close()
+        for thread in self._threads:
+            thread.join(timeout=5)
+    
+    def stats(self):
+        """Capture/inference accounting"""
+        elapsed = max(time.time() - self.started_at, 1e-6) if self.started_at else 1e-6
+        return {
+            'captured': self.captured,
+            'analyzed': self.analyzed,
+            'dropped': self.buffer.dropped,
+            'capture_fps': self.captured / elapsed,
+            'inference_fps': self.analyzed / elapsed,
+            'elapsed': elapsed
+        }
+    
+    def _capture_loop(self):
+        # mss handles are per-thread, so the capture thread owns its own
+        with mss.mss() as sct:
+            while not self._stop.is_set():
+                tick = time.time()
+                screenshot = sct.grab(self.region)
+                # BGRA -> BGR by dropping alpha while copying into the ring slot
+                bgra = np.asarray(screenshot)
+                self.buffer.put(bgra[:, :, :3], meta=self.captured, drop_oldest=True)
+                self.captured += 1
+                
+                sleep_for = self.capture_interval - (time.time() - tick)
+                if sleep_for > 0:
+                    self._stop.wait(sleep_for)
+    
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            item = self.buffer.get(timeout=0.5)
+            if item is None:
+                continue
+            # Drain whatever else is pending into the same batch
+            batch = [item]
+            while len(batch) < self.batch_size:
+                item = self.buffer.get(timeout=0)
+                if item is None:
+                    break
+                batch.append(item)
+            
+            try:
+                scores = score_frames([frame for _, frame, _ in batch])
+            finally:
+                for slot, _, _ in batch:
+                    self.buffer.release(slot)
+            
+            with self._lock:
+                for (_, _, frame_index), fake_probability in zip(batch, scores):
+                    self.analyzed += 1
+                    self._on_result(frame_index, fake_probability)
+
+def analyze_frames_and_classify(region, num_frames=30, num_workers=1):
     """
     Capture and analyze a specified number of frames to classify the video
     
+    Capture runs concurrently with inference; frames captured while all
+    workers are busy replace older pending frames.
+    
     Args:
-        sct: mss screen capture object
         region: screen region to capture
         num_frames: number of frames to analyze (default: 30)
+        num_workers: number of inference worker threads
     
     Returns:
         tuple: (final_classification, confidence, fake_percentage)
     """
-    predictions = []
     confidences = []
-    frames_with_faces = 0
+    done = threading.Event()
+    pipeline = CapturePipeline(region, num_workers=num_workers)
     
-    print(f"\nAnalyzing {num_frames} frames...")
+    def on_result(frame_index, fake_probability):
+        if done.is_set():
+            return
+        if fake_probability is not None:
+            confidences.append(fake_probability)
+            # Debug output for first few frames to understand model behavior
+            if len(confidences) <= 5:
+                print(f"  Frame {frame_index + 1}: Fake={fake_probability:.3f}, Real={1 - fake_probability:.3f}")
+        progress = int(pipeline.analyzed / num_frames * 100)
+        print(f"Progress: {progress}% ({pipeline.analyzed}/{num_frames} frames)", end='\r')
+        if pipeline.analyzed >= num_frames:
+            done.set()
     
-    for i in range(num_frames):
-        # Capture the selected screen region
-        screenshot = sct.grab(region)
-        frame = np.array(screenshot)
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
-        
-        # Detect faces
-        faces = detect_bounding_box(frame)
-        
-        if len(faces) > 0:
-            frames_with_faces += 1
-            # Get prediction and confidence from the frame
-            from deepfake_detection import mtcnn, model, DEVICE
-            import torch
-            import torch.nn.functional as F
-            from PIL import Image
-            
-            for (x, y, w, h) in faces:
-                face_region = frame[y:y + h, x:x + w]
-                input_face = Image.fromarray(cv2.cvtColor(face_region, cv2.COLOR_BGR2RGB))
-                input_face = mtcnn(input_face)
-                
-                if input_face is not None:
-                    input_face = input_face.unsqueeze(0)
-                    # EfficientNet-B0 expects 224x224 input
-                    input_face = F.interpolate(input_face, size=(224, 224), mode="bilinear", align_corners=False)
-                    input_face = input_face.to(DEVICE).to(torch.float32) / 255.0
-                    
-                    # Normalize using ImageNet statistics (EfficientNet pretrained on ImageNet)
-                    mean = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1).to(DEVICE)
-                    std = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1).to(DEVICE)
-                    input_face = (input_face - mean) / std
-                    
-                    with torch.no_grad():
-                        # Get raw logit output
-                        raw_output = model(input_face).squeeze(0)
-                        # Apply sigmoid to get probability
-                        output = torch.sigmoid(raw_output)
-                        
-                        # Output represents FAKE probability
-                        fake_confidence = output.item()
-                        real_confidence = 1.0 - fake_confidence
-                        
-                        # Debug output for first few frames to understand model behavior
-                        if i < 5:
-                            print(f"  Frame {i+1}: Logit={raw_output.item():.3f}, Fake={fake_confidence:.3f}, Real={real_confidence:.3f}")
-                        
-                        # Classify based on fake confidence
-                        prediction = "Fake" if fake_confidence >= 0.5 else "Real"
-                        
-                        predictions.append(prediction)
-                        confidences.append(fake_confidence)
-                        break  # Only analyze first face per frame
-        
-        # Show progress
-        progress = int((i + 1) / num_frames * 100)
-        print(f"Progress: {progress}% ({i + 1}/{num_frames} frames)", end='\r')
+    print(f"\nAnalyzing {num_frames} frames...")
+    pipeline.start(on_result)
+    try:
+        done.wait()
+    finally:
+        pipeline.stop()
     
     print()  # New line after progress
+    stats = pipeline.stats()
+    print(f"Captured {stats['captured']} frames ({stats['capture_fps']:.1f} FPS), "
+          f"analyzed {stats['analyzed']} ({stats['inference_fps']:.1f} FPS), dropped {stats['dropped']}")
+    
+    return summarize_frame_scores(confidences)
+
+def run_live_detection(region, num_workers=1, window=30, report_interval=1.0):
+    """
+    Continuously analyze the region until Ctrl+C, printing a rolling verdict
     
-    if len(predictions) == 0:
-        return None, 0.0, 0.0
+    Args:
+        region: screen region to capture
+        num_workers: number of inference worker threads
+        window: number of most recent face predictions in the rolling verdict
+        report_interval: seconds between status lines
+    """
+    recent = deque(maxlen=window)
+    pipeline = CapturePipeline(region, num_workers=num_workers)
     
-    # Calculate statistics
-    fake_count = predictions.count("Fake")
-    real_count = predictions.count("Real")
-    fake_percentage = (fake_count / len(predictions)) * 100
-    avg_confidence = sum(confidences) / len(confidences)
+    def on_result(frame_index, fake_probability):
+        if fake_probability is not None:
+            recent.append(fake_probability)
     
-    # Classify video based on majority voting
-    final_classification = "FAKE" if fake_count > real_count else "REAL"
+    print("\nLive detection running - press Ctrl+C to stop\n")
+    pipeline.start(on_result)
+    try:
+        while True:
+            time.sleep(report_interval)
+            verdict, confidence, fake_percentage = summarize_frame_scores(list(recent))
+            stats = pipeline.stats()
+            verdict_text = f"{verdict} ({fake_percentage:.0f}% fake, avg {confidence * 100:.0f}%)" if verdict else "no faces"
+            print(f"Verdict: {verdict_text} | capture {stats['capture_fps']:.1f} FPS | "
+                  f"inference {stats['inference_fps']:.1f} FPS | dropped {stats['dropped']}    ", end='\r')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
     
-    return final_classification, avg_confidence, fake_percentage
+    stats = pipeline.stats()
+    print("\n" + "=" * 50)
+    print(f"Captured: {stats['captured']} frames ({stats['capture_fps']:.1f} FPS)")
+    print(f"Analyzed: {stats['analyzed']} frames ({stats['inference_fps']:.1f} FPS)")
+    print(f"Dropped:  {stats['dropped']} frames")
+    print("=" * 50)
 
 def main():
     print("=== Screen Video Deepfake Detection ===")
     print("This tool will capture frames from a selected screen region")
     print("and classify the video as fake or real.\n")
     
-    # Get number of frames to analyze
+    # Get number of frames to analyze (0 = continuous live mode)
     try:
-        num_frames = int(input("Enter number of frames to analyze (default 30): ") or "30")
-        if num_frames <= 0:
+        num_frames = int(input("Enter number of frames to analyze (default 30, 0 = live mode): ") or "30")
+        if num_frames < 0:
             print("Invalid number. Using default: 30")
             num_frames = 30
     except ValueError:
@@ -204,29 +318,33 @@ def main():
     if region is None:
         return
     
+    if num_frames == 0:
+        input("Press ENTER to start live analysis...")
+        run_live_detection(region)
+        return
+    
     print(f"\nWill analyze {num_frames} frames from the selected region.")
     input("Press ENTER to start analysis...")
     
-    with mss.mss() as sct:
-        result, confidence, fake_percentage = analyze_frames_and_classify(sct, region, num_frames)
+    result, confidence, fake_percentage = analyze_frames_and_classify(region, num_frames)
+    
+    if result is None:
+        print("\n❌ No faces detected in the captured frames!")
+        print("Make sure a video with visible faces is playing in the selected region.")
+    else:
+        print("\n" + "=" * 50)
+        print("ANALYSIS COMPLETE")
+        print("=" * 50)
+        print(f"Classification: {result}")
+        print(f"Average Fake Confidence: {confidence * 100:.2f}%")
+        print(f"Fake Detection Rate: {fake_percentage:.2f}%")
+        print(f"Real Detection Rate: {100 - fake_percentage:.2f}%")
+        print("=" * 50)
         
-        if result is None:
-            print("\n❌ No faces detected in the captured frames!")
-            print("Make sure a video with visible faces is playing in the selected region.")
+        if result == "FAKE":
+            print("\n⚠️  WARNING: This video is classified as a DEEPFAKE!")
         else:
-            print("\n" + "=" * 50)
-            print("ANALYSIS COMPLETE")
-            print("=" * 50)
-            print(f"Classification: {result}")
-            print(f"Average Fake Confidence: {confidence * 100:.2f}%")
-            print(f"Fake Detection Rate: {fake_percentage:.2f}%")
-            print(f"Real Detection Rate: {100 - fake_percentage:.2f}%")
-            print("=" * 50)
-            
-            if result == "FAKE":
-                print("\n⚠️  WARNING: This video is classified as a DEEPFAKE!")
-            else:
-                print("\n✓ This video appears to be REAL.")
+            print("\n✓ This video appears to be REAL.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,114 @@
+"""
+Video I/O Helpers
+Lightweight frame sampling shared by the offline tools (no torch import)
+"""
+
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def is_video(path):
+    return Path(path).suffix.lower() in VIDEO_EXTENSIONS
+
+
+def is_image(path):
+    return Path(path).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def sample_frame_indices(total_frames, num_frames):
+    """Evenly spaced, unique frame indices over a video"""
+    if total_frames <= 0 or num_frames <= 0:
+        return []
+    return sorted(set(np.linspace(0, total_frames - 1, min(num_frames, total_frames), dtype=int).tolist()))
+
+
+def read_frames(video_path, frame_indices):
+    """
+    Decode the requested frames in a single forward pass
+
+    Frames that are not wanted are skipped with grab(), which demuxes
+    without converting the picture; only wanted frames are retrieve()d.
+    This avoids the keyframe seek + re-decode that CAP_PROP_POS_FRAMES
+    costs for every sampled frame.
+
+    Yields:
+        (frame_index, BGR frame)
+    """
+    wanted = sorted(set(int(i) for i in frame_indices))
+    if not wanted:
+        return
+
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        position = 0
+        for target in wanted:
+            while position < target:
+                if not cap.grab():
+                    return
+                position += 1
+            if not cap.grab():
+                return
+            position += 1
+            ok, frame = cap.retrieve()
+            if ok:
+                yield target, frame
+    finally:
+        cap.release()
+
+
+def read_frame(video_path, frame_index):
+    """
+    Decode a single frame by seeking (random access, e.g. from a DataLoader)
+
+    Returns:
+        BGR frame, or None if it could not be decoded
+    """
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        if frame_index > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_index))
+        ok, frame = cap.read()
+        return frame if ok else None
+    finally:
+        cap.release()
+
+
+def video_frame_count(video_path):
+    """Frame count reported by the container (may be approximate)"""
+    cap = cv2.VideoCapture(str(video_path))
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+
+def sample_video_frames(video_path, num_frames, max_side=None):
+    """
+    Decode num_frames evenly spaced frames from a video
+
+    Args:
+        video_path: Path to the video
+        num_frames: Number of frames to sample
+        max_side: Downscale frames whose longest side exceeds this
+
+    Returns:
+        List of (frame_index, BGR frame)
+    """
+    indices = sample_frame_indices(video_frame_count(video_path), num_frames)
+    return [(idx, limit_size(frame, max_side)) for idx, frame in read_frames(video_path, indices)]
+
+
+def limit_size(frame, max_side):
+    """Downscale frame so its longest side is at most max_side"""
+    if max_side is None:
+        return frame
+    h, w = frame.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1.0:
+        return frame
+    return cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)